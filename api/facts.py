@@ -0,0 +1,390 @@
+# api/facts.py
+"""
+Builds the typed fact rows (SalesFact, CounterFact) out of the raw Import.data JSON
+(any schema version, read through api.import_data.import_records).
+Called right after imports are stored (upload view, seed command) and by the
+backfill_facts command for imports created before the fact tables existed.
+The EmployeeStats and the daily/period rollup rows depending on the new facts
+are refreshed at the same time.
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+from api.formulas.rollups import period_end, period_start
+from api.import_data import import_records
+from api.parsing import parse_amount, parse_count, parse_rate
+from api.report_cache import invalidate_reports
+from api.models import BranchDailyRollup, BranchPeriodRollup, CounterFact, Employee, EmployeePeriodRollup, \
+    EmployeeStats, SalesFact
+
+# Same logger as the tasks, the facts are mostly built by the import jobs
+logger = logging.getLogger('procrastinate')
+
+
+def _import_day(import_obj):
+    # import_date is a date once loaded, but new instances may still hold the YYYY-MM-DD string
+    if isinstance(import_obj.import_date, str):
+        return datetime.strptime(import_obj.import_date, "%Y-%m-%d").date()
+    return import_obj.import_date
+
+
+def _parse_cell(parser, value, import_obj, key):
+    try:
+        parsed = parser(value)
+    except (InvalidOperation, ValueError, TypeError):
+        logger.warning(f"Invalid '{key}' value '{value}' skipped in import {import_obj.id} ({import_obj.import_date})")
+        return None
+    return parsed
+
+
+# build_sales_facts: Converts a 'sales_data' import into unsaved SalesFact rows.
+# employee_ids is the set of existing employee IDs; rows for unknown employees are kept with employee=None.
+# Output: list of SalesFact (empty if the import data is malformed).
+def build_sales_facts(import_obj, employee_ids):
+    try:
+        fact_date = _import_day(import_obj)
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid import_date '{import_obj.import_date}' on import {import_obj.id}")
+        return []
+
+    data = import_records(import_obj)
+    if not isinstance(data, list):
+        logger.warning(f"Import data for {import_obj.import_date} branch {import_obj.branch_id} is not a list.")
+        return []
+
+    facts = []
+    for employee_data in data:
+        if not isinstance(employee_data, dict):
+            continue
+
+        employee_id = None
+        emp_id_value = employee_data.get('Dipendente')
+        if emp_id_value is not None:
+            try:
+                employee_id = int(emp_id_value)
+            except (ValueError, TypeError):
+                employee_id = None
+            if employee_id not in employee_ids:
+                employee_id = None
+
+        qty = _parse_cell(parse_count, employee_data.get('Qta. Vend.'), import_obj, 'Qta. Vend.')
+        receipts = _parse_cell(parse_count, employee_data.get('Sco.'), import_obj, 'Sco.')
+        amount = _parse_cell(parse_amount, employee_data.get('Importo'), import_obj, 'Importo')
+
+        facts.append(SalesFact(
+            source_id=import_obj.id,
+            branch_id=import_obj.branch_id,
+            date=fact_date,
+            employee_id=employee_id,
+            qty=qty or 0,
+            receipts=receipts or 0,
+            amount=amount if amount is not None else Decimal("0.00"),
+        ))
+
+    return facts
+
+
+# build_counter_facts: Converts a 'counter_data' import into unsaved CounterFact rows.
+# Output: list with one CounterFact (empty if the import data is malformed).
+def build_counter_facts(import_obj):
+    try:
+        fact_date = _import_day(import_obj)
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid import_date '{import_obj.import_date}' on import {import_obj.id}")
+        return []
+
+    data = import_records(import_obj)
+    # Counter data is a list containing ONE dictionary
+    if not (isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict)):
+        logger.warning(f"Unexpected counter data structure for branch {import_obj.branch_id} on {import_obj.import_date}")
+        return []
+
+    counter_data = data[0]
+    entrances = _parse_cell(parse_count, counter_data.get('(Ing) Ingressi'), import_obj, '(Ing) Ingressi')
+    external_traffic = _parse_cell(parse_count, counter_data.get('(Est) Traffico Esterno'), import_obj, '(Est) Traffico Esterno')
+    attraction_rate = _parse_cell(parse_rate, counter_data.get('(TA) Tasso di Attrazione'), import_obj, '(TA) Tasso di Attrazione')
+
+    return [CounterFact(
+        source_id=import_obj.id,
+        branch_id=import_obj.branch_id,
+        date=fact_date,
+        entrances=entrances or 0,
+        external_traffic=external_traffic or 0,
+        attraction_rate=attraction_rate,
+    )]
+
+
+def _referenced_employee_ids(imports):
+    referenced = set()
+    for import_obj in imports:
+        data = import_records(import_obj)
+        if isinstance(data, list):
+            for employee_data in data:
+                if isinstance(employee_data, dict) and employee_data.get('Dipendente') is not None:
+                    try:
+                        referenced.add(int(employee_data['Dipendente']))
+                    except (ValueError, TypeError):
+                        pass
+    return set(Employee.objects.filter(id__in=referenced).values_list('id', flat=True))
+
+
+# delete_import_facts: Drops the fact rows of imports whose data is about to be replaced.
+# Output: (employee_ids, branch_dates) the dropped facts covered, to be refreshed by create_import_facts.
+def delete_import_facts(imports):
+    stale_sales_qs = SalesFact.objects.filter(source__in=imports)
+    stale_counter_qs = CounterFact.objects.filter(source__in=imports)
+
+    stale_employee_ids = set(stale_sales_qs.filter(employee__isnull=False).values_list('employee_id', flat=True))
+    stale_branch_dates = set(stale_sales_qs.values_list('branch_id', 'date')) \
+        | set(stale_counter_qs.values_list('branch_id', 'date'))
+
+    stale_sales_qs.delete()
+    stale_counter_qs.delete()
+    return stale_employee_ids, stale_branch_dates
+
+
+# create_import_facts: Builds and stores the fact rows for already saved Import objects.
+# Run it inside the same transaction that created the imports. stale_employee_ids/stale_branch_dates
+# (from delete_import_facts) are refreshed together with the ones of the new facts.
+# Output: int (number of fact rows created).
+def create_import_facts(imports, batch_size=1000, stale_employee_ids=(), stale_branch_dates=()):
+    sales_imports = [import_obj for import_obj in imports if import_obj.import_type == "sales_data"]
+    counter_imports = [import_obj for import_obj in imports if import_obj.import_type == "counter_data"]
+
+    sales_facts = []
+    if sales_imports:
+        employee_ids = _referenced_employee_ids(sales_imports)
+        for import_obj in sales_imports:
+            sales_facts.extend(build_sales_facts(import_obj, employee_ids))
+
+    counter_facts = []
+    for import_obj in counter_imports:
+        counter_facts.extend(build_counter_facts(import_obj))
+
+    SalesFact.objects.bulk_create(sales_facts, batch_size=batch_size)
+    CounterFact.objects.bulk_create(counter_facts, batch_size=batch_size)
+
+    touched_employee_ids = {fact.employee_id for fact in sales_facts if fact.employee_id is not None}
+    touched_employee_ids |= set(stale_employee_ids)
+    if touched_employee_ids:
+        refresh_employee_stats(touched_employee_ids)
+
+    touched_branch_dates = {(fact.branch_id, fact.date) for fact in sales_facts + counter_facts}
+    touched_branch_dates |= set(stale_branch_dates)
+    if touched_branch_dates:
+        refresh_branch_rollups(touched_branch_dates)
+        refresh_period_rollups(touched_branch_dates)
+        _invalidate_cached_reports_on_commit(touched_branch_dates)
+
+    return len(sales_facts) + len(counter_facts)
+
+
+def _invalidate_cached_reports_on_commit(branch_dates):
+    dates_by_branch = {}
+    for branch_id, date in branch_dates:
+        dates_by_branch.setdefault(branch_id, set()).add(date)
+
+    def invalidate():
+        for branch_id, dates in dates_by_branch.items():
+            invalidate_reports(branch_id, dates)
+
+    # Readers must not cache the old figures again before the new facts are visible
+    transaction.on_commit(invalidate)
+
+
+# refresh_employee_stats: Recomputes the EmployeeStats rows of the given employees (all employees if None)
+# with one GROUP BY over their SalesFact rows. Employees without facts get zeroed stats.
+# Output: int (number of EmployeeStats rows written).
+def refresh_employee_stats(employee_ids=None):
+    facts_qs = SalesFact.objects.filter(employee__isnull=False)
+    employees_qs = Employee.objects.all()
+    if employee_ids is not None:
+        facts_qs = facts_qs.filter(employee_id__in=employee_ids)
+        employees_qs = employees_qs.filter(id__in=employee_ids)
+
+    totals = {
+        row['employee_id']: row
+        for row in facts_qs.values('employee_id').annotate(
+            working_days=Count('date', distinct=True),
+            total_receipts=Sum('receipts'),
+            total_sales=Sum('amount'),
+            total_qty=Sum('qty'),
+        )
+    }
+
+    stats = []
+    for employee_id in employees_qs.values_list('id', flat=True):
+        row = totals.get(employee_id)
+        if row is None or row['working_days'] == 0:
+            stats.append(EmployeeStats(employee_id=employee_id))
+            continue
+
+        working_days = row['working_days']
+        stats.append(EmployeeStats(
+            employee_id=employee_id,
+            working_days=working_days,
+            total_receipts=row['total_receipts'],
+            total_sales=row['total_sales'],
+            total_qty=row['total_qty'],
+            medium_receipts_number=int(row['total_receipts'] / working_days),
+            medium_sales=round(float(row['total_sales']) / working_days, 2),
+        ))
+
+    EmployeeStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['employee'],
+        update_fields=['working_days', 'total_receipts', 'total_sales', 'total_qty',
+                       'medium_receipts_number', 'medium_sales'],
+    )
+    return len(stats)
+
+
+# refresh_branch_rollups: Recomputes the BranchDailyRollup rows of the given (branch_id, date) pairs
+# (every day with facts if None) with one GROUP BY per fact table.
+# Output: int (number of BranchDailyRollup rows written).
+def refresh_branch_rollups(branch_dates=None):
+    sales_qs = SalesFact.objects.all()
+    counter_qs = CounterFact.objects.all()
+    if branch_dates is not None:
+        branch_ids = {branch_id for branch_id, _ in branch_dates}
+        dates = {date for _, date in branch_dates}
+        # Superset of the pairs, narrowed down below
+        sales_qs = sales_qs.filter(branch_id__in=branch_ids, date__in=dates)
+        counter_qs = counter_qs.filter(branch_id__in=branch_ids, date__in=dates)
+
+    daily_sales = {
+        (row['branch_id'], row['date']): row
+        for row in sales_qs.values('branch_id', 'date').annotate(sales=Sum('amount'), receipts=Sum('receipts'))
+    }
+    daily_entrances = {
+        (row['branch_id'], row['date']): row['entrances']
+        for row in counter_qs.values('branch_id', 'date').annotate(entrances=Sum('entrances'))
+    }
+
+    if branch_dates is None:
+        branch_dates = set(daily_sales) | set(daily_entrances)
+
+    rollups = []
+    for branch_id, date in branch_dates:
+        sales_row = daily_sales.get((branch_id, date))
+        sales = sales_row['sales'] if sales_row else Decimal("0.00")
+        receipts = sales_row['receipts'] if sales_row else 0
+        entrances = daily_entrances.get((branch_id, date), 0)
+
+        rollups.append(BranchDailyRollup(
+            branch_id=branch_id,
+            date=date,
+            sales=sales,
+            receipts=receipts,
+            entrances=entrances,
+            conversion_rate=max(receipts / entrances * 100.0, 0.0) if entrances > 0 else 0.0,
+        ))
+
+    BranchDailyRollup.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['branch', 'date'],
+        update_fields=['sales', 'receipts', 'entrances', 'conversion_rate'],
+    )
+    return len(rollups)
+
+
+PERIOD_TRUNCS = {"week": TruncWeek, "month": TruncMonth, "year": TruncYear}
+
+
+def _touched_buckets(branch_dates, period):
+    # (branch_id, bucket_start) pairs of the given period containing the dates,
+    # plus the date span to scan for each branch
+    buckets = {(branch_id, period_start(period, date)) for branch_id, date in branch_dates}
+    spans = {}
+    for branch_id, bucket_start in buckets:
+        span_start, span_end = spans.get(branch_id, (bucket_start, period_end(period, bucket_start)))
+        spans[branch_id] = (min(span_start, bucket_start), max(span_end, period_end(period, bucket_start)))
+    return buckets, spans
+
+
+def _rows_in_spans(queryset, spans):
+    rows = queryset.none()
+    for branch_id, (span_start, span_end) in spans.items():
+        rows |= queryset.filter(branch_id=branch_id, date__range=(span_start, span_end))
+    return rows
+
+
+# refresh_period_rollups: Recomputes the weekly/monthly/yearly BranchPeriodRollup and EmployeePeriodRollup
+# buckets containing the given (branch_id, date) pairs (all of them if None) with one GROUP BY per period and table.
+# Must run after refresh_branch_rollups, branch buckets are sums of the daily rollups.
+# Output: int (number of rollup rows written).
+def refresh_period_rollups(branch_dates=None):
+    if branch_dates is None:
+        # Full rebuild: drop everything so buckets without data anymore don't linger
+        BranchPeriodRollup.objects.all().delete()
+        EmployeePeriodRollup.objects.all().delete()
+
+    written = 0
+    for period, trunc in PERIOD_TRUNCS.items():
+        daily_qs = BranchDailyRollup.objects.all()
+        facts_qs = SalesFact.objects.filter(employee__isnull=False)
+        buckets = None
+        if branch_dates is not None:
+            buckets, spans = _touched_buckets(branch_dates, period)
+            daily_qs = _rows_in_spans(daily_qs, spans)
+            facts_qs = _rows_in_spans(facts_qs, spans)
+
+        branch_rows = daily_qs.annotate(bucket=trunc('date')).values('branch_id', 'bucket').annotate(
+            sales_total=Sum('sales'), receipts_total=Sum('receipts'), entrances_total=Sum('entrances'))
+        branch_rollups = {}
+        for row in branch_rows:
+            key = (row['branch_id'], row['bucket'])
+            if buckets is None or key in buckets:
+                branch_rollups[key] = BranchPeriodRollup(
+                    branch_id=row['branch_id'], period=period, start=row['bucket'],
+                    sales=row['sales_total'], receipts=row['receipts_total'], entrances=row['entrances_total'],
+                )
+        for branch_id, bucket_start in (buckets or ()):
+            if (branch_id, bucket_start) not in branch_rollups:
+                branch_rollups[(branch_id, bucket_start)] = BranchPeriodRollup(branch_id=branch_id, period=period, start=bucket_start)
+
+        employee_rows = facts_qs.annotate(bucket=trunc('date')).values('employee_id', 'branch_id', 'bucket').annotate(
+            sales_total=Sum('amount'), receipts_total=Sum('receipts'), qty_total=Sum('qty'),
+            working_days=Count('date', distinct=True))
+        employee_rollups = [
+            EmployeePeriodRollup(
+                employee_id=row['employee_id'], branch_id=row['branch_id'], period=period, start=row['bucket'],
+                sales=row['sales_total'], receipts=row['receipts_total'], qty=row['qty_total'],
+                working_days=row['working_days'],
+            )
+            for row in employee_rows
+            if buckets is None or (row['branch_id'], row['bucket']) in buckets
+        ]
+
+        if buckets:
+            # Employees left without facts in a touched bucket (replaced imports) must lose their row
+            stale_filter = Q()
+            for branch_id, bucket_start in buckets:
+                stale_filter |= Q(branch_id=branch_id, start=bucket_start)
+            EmployeePeriodRollup.objects.filter(stale_filter, period=period).delete()
+
+        BranchPeriodRollup.objects.bulk_create(
+            list(branch_rollups.values()),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['branch', 'period', 'start'],
+            update_fields=['sales', 'receipts', 'entrances'],
+        )
+        EmployeePeriodRollup.objects.bulk_create(
+            employee_rollups,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['employee', 'branch', 'period', 'start'],
+            update_fields=['sales', 'receipts', 'qty', 'working_days'],
+        )
+        written += len(branch_rollups) + len(employee_rollups)
+
+    return written
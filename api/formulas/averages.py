@@ -52,6 +52,14 @@ def generate_medium_performance(performance_data):
 
     return medium_performance_data
 
+# generate_medium_performance_totals: Calculates the average daily value of every employee over a range of num_days
+# days from their range totals (see formulas.report_engine.employee_range_totals), no per-day rows needed.
+# Output: dict { "(emp_id) First Last": average_value_float, ... }
+def generate_medium_performance_totals(totals, plane, num_days):
+    if num_days == 0:
+        return {key: 0.0 for key in totals}
+    return {key: round(float(employee_totals[plane]) / num_days, 2) for key, employee_totals in totals.items()}
+
 # You can create aliases if you want to keep the old names for backward compatibility
 # or specific use cases, although using the generic one is cleaner.
 generate_medium_sales = generate_medium_performance
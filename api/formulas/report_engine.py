@@ -0,0 +1,237 @@
+# formulas/report_engine.py
+"""
+Batched branch report engine.
+
+Loads the sales and counter facts of a branch for a whole date range with one
+query each and returns dense day-indexed series (index 0 = start date), so that
+daily reports never fall back to per-day lookups. Employee reports use the same
+idea with an employee x day matrix.
+
+Loaders are memoized per request (api.request_cache), so the charts of one
+response share a single load of the same branch and range.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Avg, Sum
+
+from api.formulas.rollups import get_employee_totals_date_range
+from api.models import Branch, CounterFact, Employee, SalesFact
+from api.request_cache import request_cached
+
+
+@request_cached
+def _load_branch(branch_id):
+    try:
+        return Branch.objects.get(id=branch_id)
+    except (Branch.DoesNotExist, ValueError, TypeError):
+        return None
+
+
+# parse_report_range: Validates a "YYYY-MM-DD" range.
+# Output: (start_date_obj, end_date_obj) or None if the format is wrong or start > end.
+def parse_report_range(start_date, end_date):
+    try:
+        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        print("REPORT Error: Date format error. Please use YYYY-MM-DD.")
+        return None
+
+    if start_date_obj > end_date_obj:
+        print("REPORT Error: Start date cannot be after end date.")
+        return None
+
+    return start_date_obj, end_date_obj
+
+
+# load_branch_series: Loads the daily sales and/or counter figures of a branch over a date range.
+# Output: dict {
+#     "labels": ["YYYY-MM-DD", ...],
+#     "sales": [Decimal, ...], "receipts": [float, ...],                                  (if sales=True)
+#     "entrances": [int, ...], "external_traffic": [int, ...], "attraction_rate": [float, ...]  (if counter=True)
+# } with one entry per day, or None if the branch does not exist or the dates are invalid.
+@request_cached
+def load_branch_series(branch_id, start_date, end_date, sales=True, counter=True):
+    branch = _load_branch(branch_id)
+    if branch is None:
+        print(f"REPORT: No branch found with ID {branch_id}")
+        return None
+
+    date_range = parse_report_range(start_date, end_date)
+    if date_range is None:
+        return None
+    start_date_obj, end_date_obj = date_range
+
+    num_days = (end_date_obj - start_date_obj).days + 1
+    series = {
+        "labels": [(start_date_obj + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(num_days)],
+    }
+
+    if sales:
+        series["sales"] = [Decimal("0.00")] * num_days
+        series["receipts"] = [0.0] * num_days
+
+        daily_sales = SalesFact.objects.filter(
+            branch=branch,
+            date__range=(start_date_obj, end_date_obj),
+        ).values('date').annotate(amount=Sum('amount'), receipts=Sum('receipts'))
+
+        for row in daily_sales:
+            day_index = (row['date'] - start_date_obj).days
+            series["sales"][day_index] = row['amount'].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            series["receipts"][day_index] = float(row['receipts'])
+
+    if counter:
+        series["entrances"] = [0] * num_days
+        series["external_traffic"] = [0] * num_days
+        series["attraction_rate"] = [0.0] * num_days
+
+        daily_counter = CounterFact.objects.filter(
+            branch=branch,
+            date__range=(start_date_obj, end_date_obj),
+        ).values('date').annotate(
+            entrances=Sum('entrances'),
+            external_traffic=Sum('external_traffic'),
+            attraction_rate=Avg('attraction_rate'),
+        )
+
+        for row in daily_counter:
+            day_index = (row['date'] - start_date_obj).days
+            series["entrances"][day_index] = row['entrances']
+            series["external_traffic"][day_index] = row['external_traffic']
+            if row['attraction_rate'] is not None:
+                series["attraction_rate"][day_index] = float(row['attraction_rate'])
+
+    return series
+
+
+# conversion_rate_series: Computes the daily conversion rate ((receipts / entrances) * 100) from two aligned series.
+# Output: list of floats, 0.0 on days without entrances.
+def conversion_rate_series(receipts, entrances):
+    conversion_rates = []
+    for receipts_daily, entrances_daily in zip(receipts, entrances):
+        if entrances_daily > 0:
+            conversion_rates.append(max(float(receipts_daily) / float(entrances_daily) * 100.0, 0.0))
+        else:
+            conversion_rates.append(0.0)
+    return conversion_rates
+
+
+# Metrics compute_branch_metrics can return, grouped by the fact table they come from
+SALES_METRICS = ("sales", "receipts")
+COUNTER_METRICS = ("entrances", "external_traffic", "attraction_rate")
+BRANCH_METRICS = SALES_METRICS + COUNTER_METRICS + ("conversion_rate",)
+
+
+# compute_branch_metrics: Computes several daily branch metrics over a date range in one pass.
+# Only the fact tables needed by the requested metrics are queried (at most one query each).
+# Output: dict { "labels": ["YYYY-MM-DD", ...], "<metric>": [value per day], ... }
+#         or None if the branch, the dates or a metric name is invalid.
+def compute_branch_metrics(branch_id, start_date, end_date, metrics=BRANCH_METRICS):
+    unknown_metrics = [metric for metric in metrics if metric not in BRANCH_METRICS]
+    if unknown_metrics:
+        print(f"REPORT Error: Unknown metrics {unknown_metrics}")
+        return None
+
+    needs_sales = any(metric in SALES_METRICS for metric in metrics) or "conversion_rate" in metrics
+    needs_counter = any(metric in COUNTER_METRICS for metric in metrics) or "conversion_rate" in metrics
+
+    series = load_branch_series(branch_id, start_date, end_date, sales=needs_sales, counter=needs_counter)
+    if series is None:
+        return None
+
+    result = {"labels": series["labels"]}
+    for metric in metrics:
+        if metric == "conversion_rate":
+            result[metric] = conversion_rate_series(series["receipts"], series["entrances"])
+        else:
+            result[metric] = series[metric]
+    return result
+
+
+# Planes of the employee matrix and the zero value of their cells
+EMPLOYEE_PLANES = {"sales": 0.0, "receipts": 0.0, "qty": 0}
+
+
+# build_employee_matrix: Builds the employee x day matrix of a branch over a date range with one GROUP BY query.
+# Output: dict {
+#     "labels": ["YYYY-MM-DD", ...],
+#     "employees": ["(emp_id) First Last", ...] sorted by key, "employee_ids": [emp_id, ...] in the same order,
+#     "sales": [[float per day] per employee], "receipts": [[float ...] ...], "qty": [[int ...] ...]
+# } (rows follow "employees", columns follow "labels"), or None if the branch, the dates or the employees are missing.
+@request_cached
+def build_employee_matrix(branch_id, start_date, end_date):
+    branch = _load_branch(branch_id)
+    if branch is None:
+        print(f"REPORT Employees: No branch found with ID {branch_id}")
+        return None
+
+    date_range = parse_report_range(start_date, end_date)
+    if date_range is None:
+        return None
+    start_date_obj, end_date_obj = date_range
+
+    employees = list(Employee.objects.filter(branch=branch).values_list('id', 'first_name', 'last_name'))
+    if not employees:
+        print(f"REPORT Employees: No employees found for branch {branch_id}")
+        return None
+
+    # Rows sorted by display key, as the reports always were
+    employee_keys = sorted((f"({emp_id}) {first_name} {last_name}", emp_id) for emp_id, first_name, last_name in employees)
+    row_index = {emp_id: row for row, (_, emp_id) in enumerate(employee_keys)}
+
+    num_days = (end_date_obj - start_date_obj).days + 1
+    matrix = {
+        "labels": [(start_date_obj + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(num_days)],
+        "employees": [key for key, _ in employee_keys],
+        "employee_ids": [emp_id for _, emp_id in employee_keys],
+    }
+    for plane, zero in EMPLOYEE_PLANES.items():
+        matrix[plane] = [[zero] * num_days for _ in employee_keys]
+
+    # All three planes are filled from the same rows
+    daily_totals = SalesFact.objects.filter(
+        branch=branch,
+        date__range=(start_date_obj, end_date_obj),
+        employee_id__in=row_index.keys(),
+    ).values('employee_id', 'date').annotate(amount=Sum('amount'), receipts=Sum('receipts'), qty=Sum('qty'))
+
+    for row in daily_totals:
+        employee_row = row_index[row['employee_id']]
+        day_index = (row['date'] - start_date_obj).days
+        matrix["sales"][employee_row][day_index] = float(row['amount'])
+        matrix["receipts"][employee_row][day_index] = float(row['receipts'])
+        matrix["qty"][employee_row][day_index] = row['qty']
+
+    return matrix
+
+
+# employee_plane_report: Extracts one plane of an employee matrix in the performance report format.
+# Output: dict { "(emp_id) First Last": [daily_value, ...], ... }, empty dict if matrix is None.
+def employee_plane_report(matrix, plane):
+    if matrix is None:
+        return {}
+    return dict(zip(matrix["employees"], matrix[plane]))
+
+
+# employee_range_totals: Range totals of the employees of the employee matrix of a branch, read from the employee
+# period rollups (sales facts only at the edges of the range) instead of summing the matrix rows.
+# Output: dict { "(emp_id) First Last": {"sales": float, "receipts": float, "qty": int}, ... }
+#         in matrix order, empty dict if the matrix can't be built.
+@request_cached
+def employee_range_totals(branch_id, start_date, end_date):
+    matrix = build_employee_matrix(branch_id, start_date, end_date)
+    if matrix is None:
+        return {}
+
+    range_totals = get_employee_totals_date_range(branch_id, start_date, end_date)
+    totals = {}
+    for key, emp_id in zip(matrix["employees"], matrix["employee_ids"]):
+        employee_totals = range_totals.get(emp_id, {})
+        totals[key] = {
+            "sales": float(employee_totals.get("sales", 0)),
+            "receipts": float(employee_totals.get("receipts", 0)),
+            "qty": employee_totals.get("qty", 0),
+        }
+    return totals
@@ -0,0 +1,147 @@
+# formulas/rollups.py
+"""
+Range KPIs read from the precomputed rollup tables instead of the fact rows.
+
+A requested range is covered by plan_rollup_range with the coarsest buckets that
+fit (years, then months, then weeks) and daily rows only at the edges, so a year
+long total reads one yearly row instead of 365 daily ones.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Q, Sum
+
+from api.models import BranchDailyRollup, BranchPeriodRollup, EmployeePeriodRollup, SalesFact
+
+# Coarsest first, the order the planner tries them in
+PLANNER_PERIODS = ("year", "month", "week")
+
+
+# period_start: Returns the first day of the bucket of the given period containing date (weeks start on Monday).
+def period_start(period, date):
+    if period == "year":
+        return date.replace(month=1, day=1)
+    if period == "month":
+        return date.replace(day=1)
+    if period == "week":
+        return date - timedelta(days=date.weekday())
+    raise ValueError(f"Unknown rollup period '{period}'")
+
+
+# period_end: Returns the last day of the bucket of the given period starting on start.
+def period_end(period, start):
+    if period == "year":
+        return start.replace(month=12, day=31)
+    if period == "month":
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    if period == "week":
+        return start + timedelta(days=6)
+    raise ValueError(f"Unknown rollup period '{period}'")
+
+
+# plan_rollup_range: Covers [start_date, end_date] with whole year/month/week buckets and daily edges.
+# Output: list of (period, start, end) tuples in date order, period being "year", "month", "week" or "day"
+# ("day" segments can span several days and are read from the daily data).
+def plan_rollup_range(start_date, end_date, periods=PLANNER_PERIODS):
+    if start_date > end_date:
+        return []
+    if not periods:
+        return [("day", start_date, end_date)]
+
+    period, finer_periods = periods[0], periods[1:]
+
+    # First bucket of this period starting inside the range
+    first_start = period_start(period, start_date)
+    if first_start < start_date:
+        first_start = period_start(period, period_end(period, first_start) + timedelta(days=1))
+
+    buckets = []
+    bucket_start = first_start
+    while period_end(period, bucket_start) <= end_date:
+        buckets.append((period, bucket_start, period_end(period, bucket_start)))
+        bucket_start = period_end(period, bucket_start) + timedelta(days=1)
+
+    if not buckets:
+        return plan_rollup_range(start_date, end_date, finer_periods)
+
+    # Edges are covered by the finer periods
+    return (plan_rollup_range(start_date, buckets[0][1] - timedelta(days=1), finer_periods)
+            + buckets
+            + plan_rollup_range(buckets[-1][2] + timedelta(days=1), end_date, finer_periods))
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def _plan_filters(plan, date_field):
+    # One OR-ed filter for the period buckets, one for the daily edges
+    bucket_filter = Q()
+    day_filter = Q()
+    for period, start, end in plan:
+        if period == "day":
+            day_filter |= Q(**{f"{date_field}__range": (start, end)})
+        else:
+            bucket_filter |= Q(period=period, start=start)
+    return bucket_filter, day_filter
+
+
+# get_branch_totals_date_range: Sums the sales, receipts and entrances of a branch over a date range,
+# reading at most one query of period rollups and one of daily rollups.
+# Output: dict { "sales": Decimal, "receipts": int, "entrances": int } (zeros if no data).
+def get_branch_totals_date_range(branch_id, start_date, end_date):
+    totals = {"sales": Decimal("0.00"), "receipts": 0, "entrances": 0}
+
+    plan = plan_rollup_range(_to_date(start_date), _to_date(end_date))
+    bucket_filter, day_filter = _plan_filters(plan, "date")
+
+    partials = []
+    if bucket_filter:
+        partials.append(BranchPeriodRollup.objects.filter(bucket_filter, branch_id=branch_id).aggregate(
+            sales=Sum('sales'), receipts=Sum('receipts'), entrances=Sum('entrances')))
+    if day_filter:
+        partials.append(BranchDailyRollup.objects.filter(day_filter, branch_id=branch_id).aggregate(
+            sales=Sum('sales'), receipts=Sum('receipts'), entrances=Sum('entrances')))
+
+    for partial in partials:
+        for key in totals:
+            totals[key] += partial[key] or 0
+
+    totals["sales"] = totals["sales"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return totals
+
+
+# get_employee_totals_date_range: Sums the sales figures of every employee of a branch over a date range,
+# reading at most one query of period rollups and one of sales facts.
+# Output: dict { employee_id: { "sales": Decimal, "receipts": int, "qty": int, "working_days": int }, ... }
+def get_employee_totals_date_range(branch_id, start_date, end_date):
+    plan = plan_rollup_range(_to_date(start_date), _to_date(end_date))
+    bucket_filter, day_filter = _plan_filters(plan, "date")
+
+    rows = []
+    if bucket_filter:
+        rows.extend(EmployeePeriodRollup.objects.filter(bucket_filter, branch_id=branch_id).values('employee_id').annotate(
+            sales_total=Sum('sales'), receipts_total=Sum('receipts'), qty_total=Sum('qty'), days_total=Sum('working_days')))
+    if day_filter:
+        daily_rows = SalesFact.objects.filter(day_filter, branch_id=branch_id, employee__isnull=False).values(
+            'employee_id', 'date').annotate(sales_total=Sum('amount'), receipts_total=Sum('receipts'), qty_total=Sum('qty'))
+        for row in daily_rows:
+            row['days_total'] = 1
+            rows.append(row)
+
+    totals = {}
+    for row in rows:
+        employee_totals = totals.setdefault(row['employee_id'], {
+            "sales": Decimal("0.00"), "receipts": 0, "qty": 0, "working_days": 0,
+        })
+        employee_totals["sales"] += row['sales_total']
+        employee_totals["receipts"] += row['receipts_total']
+        employee_totals["qty"] += row['qty_total']
+        employee_totals["working_days"] += row['days_total']
+
+    for employee_totals in totals.values():
+        employee_totals["sales"] = employee_totals["sales"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return totals
@@ -1,8 +1,8 @@
-from api.models import Import, Branch, Employee
+from api.models import Branch, Employee, SalesFact
 
 
 def get_total_working_days_dipendente(employee_id):
-    # get all the import 'sales_data' type from employee respective branch
+    # count the days the employee appears in the 'sales_data' imports of their branch
     try:
         employee = Employee.objects.get(id=employee_id)
         branch = employee.branch
@@ -13,15 +13,8 @@ def get_total_working_days_dipendente(employee_id):
         print(f"No branch found for employee with ID {employee_id}")
         return None
 
-    import_objs = Import.objects.filter(branch=branch, import_type="sales_data")
-    total_working_days = 0
-
-    for import_obj in import_objs:
-        data = import_obj.data
-        for employee_data in data:
-            if employee_data['Dipendente'] == employee_id:
-                total_working_days += 1
-                continue
+    total_working_days = SalesFact.objects.filter(
+        employee=employee, branch=branch
+    ).values('date').distinct().count()
 
     return total_working_days
-
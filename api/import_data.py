@@ -0,0 +1,90 @@
+# api/import_data.py
+"""
+Storage formats of Import.data, told apart by Import.schema_version.
+
+SCHEMA_ROWS (1): the export records as uploaded, one dict per row repeating the
+column names, amounts as locale strings:
+    [{"Dipendente": 4, "Qta. Vend.": "8.00", "Importo": "140,72", ...}, ...]
+
+SCHEMA_COLUMNAR (2): one array per column with the numerics already parsed
+(values that don't parse are kept as they are):
+    {"Dipendente": [4, 1], "Qta. Vend.": [8, 127], "Importo": [140.72, 1843.55], ...}
+
+Readers go through import_records, which returns the records whatever the format.
+New imports are stored columnar if settings.IMPORT_DATA_COLUMNAR is set; the
+compact_imports command converts the existing ones.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+from api.parsing import parse_amount, parse_column, parse_count, parse_decimal, parse_rate
+
+SCHEMA_ROWS = 1
+SCHEMA_COLUMNAR = 2
+
+
+# Parsers of the known export columns, the others are stored as they are
+COLUMN_PARSERS = {
+    "Dipendente": parse_count,
+    "Qta. Vend.": parse_count,
+    "Sco.": parse_count,
+    "Importo": parse_amount,
+    "Sco. Medio": parse_decimal,
+    "Qta Media": parse_decimal,
+    "(Ing) Ingressi": parse_count,
+    "(Est) Traffico Esterno": parse_count,
+    "(TA) Tasso di Attrazione": parse_rate,
+}
+
+
+def _keep_invalid(value):
+    # Kept as uploaded, the facts builder reports it
+    return value
+
+
+def _compact_column(column, values):
+    parser = COLUMN_PARSERS.get(column)
+    if parser is None:
+        return values
+    return [
+        float(value) if isinstance(value, Decimal) else value
+        for value in parse_column(parser, values, invalid=_keep_invalid)
+    ]
+
+
+# compact_records: Converts the records of an import to the columnar format.
+# Output: dict { column: [value, ...] }, or None if the data isn't a list of records.
+def compact_records(records):
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        return None
+
+    column_names = list(dict.fromkeys(key for record in records for key in record))
+    return {
+        column: _compact_column(column, [record.get(column) for record in records])
+        for column in column_names
+    }
+
+
+# expand_columns: Converts columnar data back to a list of records.
+def expand_columns(columns):
+    column_names = list(columns)
+    return [dict(zip(column_names, values)) for values in zip(*columns.values())]
+
+
+# import_records: Accessor of Import.data for every schema version.
+# Output: list of dicts (one per export row), or the raw data if it is malformed.
+def import_records(import_obj):
+    if import_obj.schema_version == SCHEMA_COLUMNAR and isinstance(import_obj.data, dict):
+        return expand_columns(import_obj.data)
+    return import_obj.data
+
+
+# encode_import_data: Storage format of the records of a new import, columnar if settings.IMPORT_DATA_COLUMNAR.
+# Output: (data, schema_version)
+def encode_import_data(records):
+    if getattr(settings, "IMPORT_DATA_COLUMNAR", False):
+        columns = compact_records(records)
+        if columns is not None:
+            return columns, SCHEMA_COLUMNAR
+    return records, SCHEMA_ROWS
@@ -0,0 +1,401 @@
+# api/importers.py
+"""
+Import pipeline of the sales/counter exports uploaded through uploadImportData.
+
+Uploads can be XLSX workbooks or CSV exports (plain or gzipped), the format is
+detected from the file content (upload_format). Workbooks are read in openpyxl
+read-only mode and CSV files with the csv module, both consumed one row at a time
+so memory stays bounded by the converted data instead of the whole file.
+Each converter turns the row stream of one (brand, import type) layout into
+{raw_date: [record, ...]}; the records are stored in Import.data through
+api.import_data.encode_import_data.
+
+Uploads are processed by the async_process_import task (api.tasks) through
+process_import_job, which keeps the ImportJob progress counters up to date.
+In insert mode any day already imported rejects the whole file; in upsert mode
+those days are replaced, in bulk and in the same transaction as the new ones.
+"""
+import csv
+import gzip
+import io
+import re
+from datetime import datetime
+from pathlib import Path
+
+from django.db import transaction
+from openpyxl.reader.excel import load_workbook
+
+from api.facts import create_import_facts, delete_import_facts
+from api.import_data import encode_import_data
+from api.models import Employee, Import, ImportJob
+
+SALES_COLUMNS = 7  # Dipendente, Data, Qta. Vend., Sco., Importo, Sco. Medio, Qta Media
+COUNTER_COLUMNS = 4  # Data, Ingressi, Traffico Esterno, Tasso di Attrazione
+
+# Summary rows of the original marines sales export
+ORIGINAL_TOTAL_ROWS = ["Totale generale", "Totali "]
+
+# typeSelect values of the upload form
+IMPORT_TYPES = {0: "sales_data", 1: "counter_data"}
+
+# ImportJob.rows_parsed is saved every PROGRESS_EVERY rows
+PROGRESS_EVERY = 500
+
+# Supported upload formats -> file suffix of the stored upload
+IMPORT_FORMATS = {"xlsx": ".xlsx", "csv": ".csv", "csv.gz": ".csv.gz"}
+
+XLSX_MAGIC = b"PK\x03\x04"
+GZIP_MAGIC = b"\x1f\x8b"
+CSV_DELIMITERS = ";,\t"
+CSV_INTEGER = re.compile(r"^-?\d+$")
+
+
+def _read_magic(uploaded_file):
+    if isinstance(uploaded_file, (str, Path)):
+        with open(uploaded_file, 'rb') as f:
+            return f.read(4)
+    position = uploaded_file.tell()
+    magic = uploaded_file.read(4)
+    uploaded_file.seek(position)
+    return magic
+
+
+# upload_format: Detects the format of an upload (path or binary file object) from its first bytes.
+# Output: "xlsx", "csv.gz" or "csv" (anything that isn't a zip or gzip archive is read as text)
+def upload_format(uploaded_file):
+    magic = _read_magic(uploaded_file)
+    if magic.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if magic.startswith(GZIP_MAGIC):
+        return "csv.gz"
+    return "csv"
+
+
+# iter_xlsx_rows: Streams the data rows (header skipped) of the active sheet of an uploaded workbook.
+# Rows are padded/truncated to `width` values; fully empty rows are skipped.
+# Output: generator of tuples
+def iter_xlsx_rows(uploaded_file, width):
+    workbook = load_workbook(filename=uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active  # You can specify sheet name if needed
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            if all(value is None for value in row):
+                continue
+            row = tuple(row[:width])
+            yield row + (None,) * (width - len(row))
+    finally:
+        # Read-only workbooks keep the file open until closed
+        workbook.close()
+
+
+def _csv_cell(value):
+    # Same value types as the workbook cells of the exports: empty -> None, integers -> int,
+    # everything else (dates, "1.234,56" amounts...) stays a string for the facts parsers
+    value = value.strip()
+    if value == "":
+        return None
+    if CSV_INTEGER.match(value):
+        return int(value)
+    return value
+
+
+# iter_csv_rows: Streams the data rows (header skipped) of an uploaded CSV file, gzipped or not.
+# The delimiter (';', ',' or tab) is sniffed from the header. Same row shape as iter_xlsx_rows.
+# Output: generator of tuples
+def iter_csv_rows(uploaded_file, width, compressed=False):
+    opened = isinstance(uploaded_file, (str, Path))
+    raw = open(uploaded_file, 'rb') if opened else uploaded_file
+    binary = gzip.GzipFile(fileobj=raw) if compressed else raw
+    text = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+    try:
+        header = text.readline()
+        try:
+            dialect = csv.Sniffer().sniff(header, delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(text, dialect):
+            row = tuple(_csv_cell(value) for value in row[:width])
+            if all(value is None for value in row):
+                continue
+            yield row + (None,) * (width - len(row))
+    finally:
+        # Leave the caller's file object open, only close what was opened here
+        text.detach()
+        if opened:
+            raw.close()
+
+
+# iter_upload_rows: Streams the data rows of an upload of any supported format (see upload_format).
+# Output: generator of tuples
+def iter_upload_rows(uploaded_file, width):
+    file_format = upload_format(uploaded_file)
+    if file_format == "xlsx":
+        return iter_xlsx_rows(uploaded_file, width)
+    return iter_csv_rows(uploaded_file, width, compressed=file_format == "csv.gz")
+
+
+# convert_equivalenza_counter_rows: 'mar-19.11.24' dated counter rows -> {"YYYY-MM-DD": [record]}
+# The last row of a date wins.
+def convert_equivalenza_counter_rows(rows):
+    data_dict = {}
+    for row in rows:
+        date = row[0]
+        record = {
+            "(Ing) Ingressi": row[1] or 0,
+            "(Est) Traffico Esterno": row[2] or 0,
+            "(TA) Tasso di Attrazione": row[3] or 0,
+        }
+
+        # mar-19.11.24 to YYYY-MM-DD
+        date = date.split("-")[1]
+        date = datetime.strptime(date, "%d.%m.%y").strftime("%Y-%m-%d")
+
+        data_dict[date] = [record]
+    return data_dict
+
+
+# convert_equivalenza_sales_rows: one row per employee per day -> {"dd/mm/YYYY": [record, ...]}
+def convert_equivalenza_sales_rows(rows):
+    data_dict = {}
+    for row in rows:
+        date = row[1]
+        record = {
+            "Dipendente": row[0],
+            "Qta. Vend.": row[2],
+            "Sco.": row[3],
+            "Importo": row[4],
+            "Sco. Medio": row[5],
+            "Qta Media": row[6]
+        }
+
+        # If the date is already a key, append the new record to its list
+        data_dict.setdefault(date, []).append(record)
+    return data_dict
+
+
+# convert_original_counter_rows: counter rows -> {raw_date: [record]}
+def convert_original_counter_rows(rows):
+    data_dict = {}
+    for row in rows:
+        date = row[0]
+        record = {
+            "(Ing) Ingressi": row[1],
+            "(Est) Traffico Esterno": row[2],
+            "(TA) Tasso di Attrazione": row[3],
+        }
+
+        data_dict[date] = [record]
+    return data_dict
+
+
+# convert_original_sales_rows: one row per day (no employees) -> {"dd/mm/YYYY": [record]}
+# The export summary rows and undated rows are dropped.
+def convert_original_sales_rows(rows):
+    data_dict = {}
+    for row in rows:
+        date = row[1]
+        if date in ORIGINAL_TOTAL_ROWS or date is None:
+            continue
+
+        record = {
+            "Qta. Vend.": row[2],
+            "Sco.": row[3],
+            "Importo": row[4],
+            "Sco. Medio": row[5],
+            "Qta Media": row[6]
+        }
+
+        data_dict[date] = [record]
+    return data_dict
+
+
+def _track_rows(rows, job):
+    rows_parsed = 0
+    for rows_parsed, row in enumerate(rows, 1):
+        if job is not None and rows_parsed % PROGRESS_EVERY == 0:
+            job.update_progress(rows_parsed=rows_parsed)
+        yield row
+    if job is not None:
+        job.update_progress(rows_parsed=rows_parsed)
+
+
+# store_imports: Saves the {"YYYY-MM-DD": data} days of a branch/type and their facts in one transaction.
+# With replace (upsert mode) already imported days are updated instead of created.
+# Output: (int, int) number of imports created and replaced
+def store_imports(branch_obj, import_type, data_by_date, job=None, replace=False, batch_size=None):
+    with transaction.atomic():
+        import_bulk_update_list = []
+        if replace:
+            # Lock the days being replaced so a concurrent upsert waits for this one
+            existing_imports = Import.objects.select_for_update().filter(
+                branch=branch_obj, import_type=import_type, import_date__in=list(data_by_date))
+            for import_obj in existing_imports:
+                import_obj.data, import_obj.schema_version = encode_import_data(data_by_date[import_obj.import_date.isoformat()])
+                import_bulk_update_list.append(import_obj)
+
+        updated_dates = {import_obj.import_date.isoformat() for import_obj in import_bulk_update_list}
+        import_bulk_create_list = []
+        for date, data in data_by_date.items():
+            if date not in updated_dates:
+                data, schema_version = encode_import_data(data)
+                import_bulk_create_list.append(Import(import_date=date, data=data, schema_version=schema_version,
+                                                      branch=branch_obj, import_type=import_type))
+
+        stale_employee_ids, stale_branch_dates = set(), set()
+        if import_bulk_update_list:
+            Import.objects.bulk_update(import_bulk_update_list, ['data', 'schema_version'], batch_size=batch_size or 500)
+            stale_employee_ids, stale_branch_dates = delete_import_facts(import_bulk_update_list)
+        Import.objects.bulk_create(import_bulk_create_list, batch_size=batch_size)
+        create_import_facts(import_bulk_create_list + import_bulk_update_list, batch_size=batch_size or 1000,
+                            stale_employee_ids=stale_employee_ids, stale_branch_dates=stale_branch_dates)
+
+    if job is not None:
+        job.update_progress(imports_created=len(import_bulk_create_list), imports_replaced=len(import_bulk_update_list))
+    return len(import_bulk_create_list), len(import_bulk_update_list)
+
+
+def _normalize_dates(data_dict, date_format, errors):
+    # {raw_date: data} -> {"YYYY-MM-DD": data}, unparsable dates are reported in errors
+    data_by_date = {}
+    for date, data in data_dict.items():
+        try:
+            data_by_date[datetime.strptime(date, date_format).strftime('%Y-%m-%d')] = data
+        except (TypeError, ValueError):
+            errors.append(f"Invalid date {date}")
+    return data_by_date
+
+
+def _existing_import_dates(branch_obj, import_type):
+    # One query for every date already imported for the branch/type, as YYYY-MM-DD like the parsed days
+    import_dates = Import.objects.filter(branch=branch_obj, import_type=import_type).values_list('import_date', flat=True)
+    return {import_date.isoformat() for import_date in import_dates}
+
+
+def _employee_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# validate_days: Checks every day of an upload against the existing imports (and employees for equivalenza sales)
+# with one query for the imported dates and one for the referenced employees.
+# Already imported days are collisions unless replace is set (upsert mode).
+# Output: list of error strings (empty if the upload can be stored)
+def validate_days(branch_obj, import_type, data_by_date, job=None, check_employees=False, replace=False):
+    errors = []
+    existing_dates = set() if replace else _existing_import_dates(branch_obj, import_type)
+
+    employee_branches = {}
+    if check_employees:
+        referenced_ids = {
+            _employee_id(record.get('Dipendente'))
+            for records in data_by_date.values() for record in records
+        }
+        employee_branches = dict(Employee.objects.filter(
+            id__in=[employee_id for employee_id in referenced_ids if isinstance(employee_id, int)]
+        ).values_list('id', 'branch_id'))
+
+    for days_validated, (date, records) in enumerate(data_by_date.items(), 1):
+        if job is not None and days_validated % PROGRESS_EVERY == 0:
+            job.update_progress(days_validated=days_validated)
+
+        if check_employees:
+            employees_day_id_list = [_employee_id(record.get('Dipendente')) for record in records]
+            employees_day_found = {employee_id for employee_id in employees_day_id_list if employee_id in employee_branches}
+
+            if len(employees_day_found) != len(employees_day_id_list):
+                errors.append(f"Employees on {date} not found")
+                continue
+
+            day_branches = {employee_branches[employee_id] for employee_id in employees_day_found}
+            if day_branches != {branch_obj.id}:
+                errors.append(f"Branch on {date} from different branch")
+                continue
+
+        if date in existing_dates:
+            errors.append(f"Collision on {date}")
+            continue
+
+    if job is not None:
+        job.update_progress(days_validated=len(data_by_date))
+    return errors
+
+
+def _parse_equivalenza_counter(uploaded_file, job, errors):
+    # Counter dates are already converted to YYYY-MM-DD
+    return convert_equivalenza_counter_rows(_track_rows(iter_upload_rows(uploaded_file, COUNTER_COLUMNS), job))
+
+
+def _parse_equivalenza_sales(uploaded_file, job, errors):
+    data_dict = convert_equivalenza_sales_rows(_track_rows(iter_upload_rows(uploaded_file, SALES_COLUMNS), job))
+    return _normalize_dates(data_dict, '%d/%m/%Y', errors)
+
+
+def _parse_original_sales(uploaded_file, job, errors):
+    data_dict = convert_original_sales_rows(_track_rows(iter_upload_rows(uploaded_file, SALES_COLUMNS), job))
+    return _normalize_dates(data_dict, '%d/%m/%Y', errors)
+
+
+# (brand, import type) -> parser; the original counter export is converted but has never been stored
+PARSERS = {
+    ("equivalenza", "counter_data"): _parse_equivalenza_counter,
+    ("equivalenza", "sales_data"): _parse_equivalenza_sales,
+    ("original", "sales_data"): _parse_original_sales,
+}
+
+# Layouts whose rows reference employees, checked by validate_days
+EMPLOYEE_IMPORTS = {("equivalenza", "sales_data")}
+
+
+# parse_export: Converts an export (path or binary file object) of a brand/import type without touching the database,
+# so it can run in a worker process.
+# Output: ({"YYYY-MM-DD": [record, ...]}, [error, ...]), data is None if the layout can't be imported
+def parse_export(uploaded_file, brand, import_type, job=None):
+    parser = PARSERS.get((brand, import_type))
+    if parser is None:
+        return None, ["No typeSelect"]
+    errors = []
+    data_by_date = parser(uploaded_file, job, errors)
+    return data_by_date, errors
+
+
+# run_import: Converts, validates and stores an uploaded export for a branch.
+# uploaded_file is a path or a binary file object; job (optional ImportJob) receives the progress counters.
+# mode is ImportJob.MODE_INSERT (already imported days are collisions) or ImportJob.MODE_UPSERT (they are replaced).
+# Output: dict { "status": "success" | "error", "errors": [str, ...] }
+def run_import(branch_obj, import_type, uploaded_file, job=None, mode=ImportJob.MODE_INSERT):
+    if mode not in ImportJob.MODES:
+        return {"status": "error", "errors": [f"Invalid mode {mode}"]}
+    replace = mode == ImportJob.MODE_UPSERT
+
+    brand = branch_obj.get_brand()
+    data_by_date, errors = parse_export(uploaded_file, brand, import_type, job)
+    if data_by_date is None:
+        return {"status": "error", "errors": errors}
+
+    errors += validate_days(branch_obj, import_type, data_by_date, job,
+                            check_employees=(brand, import_type) in EMPLOYEE_IMPORTS, replace=replace)
+    if errors:
+        return {"status": "error", "errors": errors}
+
+    store_imports(branch_obj, import_type, data_by_date, job, replace)
+    return {"status": "success", "errors": []}
+
+
+# process_import_job: Runs a queued ImportJob and stores its outcome.
+# The uploaded export is cleared from the job when it finishes, whatever the outcome.
+# Output: dict (the run_import result)
+def process_import_job(job):
+    try:
+        job.update_progress(status=ImportJob.STATUS_RUNNING)
+        try:
+            result = run_import(job.branch, job.import_type, io.BytesIO(bytes(job.upload or b"")), job, job.mode)
+        except Exception as e:
+            result = {"status": "error", "errors": [f"Import failed: {e}"]}
+
+        status = ImportJob.STATUS_SUCCESS if result["status"] == "success" else ImportJob.STATUS_ERROR
+        job.update_progress(status=status, errors=result["errors"])
+    finally:
+        job.update_progress(upload=None)
+    return result
@@ -0,0 +1,63 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.facts import create_import_facts, refresh_branch_rollups, refresh_employee_stats, \
+    refresh_period_rollups
+from api.models import Import, SalesFact, CounterFact
+
+# import_type -> (fact model, related_name on Import)
+FACT_TABLES = {
+    "sales_data": (SalesFact, "sales_facts"),
+    "counter_data": (CounterFact, "counter_facts"),
+}
+
+
+class Command(BaseCommand):
+    help = "Builds the sales/counter fact rows for imports stored before the fact tables existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, default=None, help="Only backfill this branch ID")
+        parser.add_argument('--type', choices=list(FACT_TABLES), default=None, help="Only backfill this import type")
+        parser.add_argument('--rebuild', action='store_true', help="Drop and rebuild the existing fact rows")
+        parser.add_argument('--batch-size', type=int, default=500, help="Imports processed per transaction")
+
+    def handle(self, *args, **options):
+        import_types = [options['type']] if options['type'] else list(FACT_TABLES)
+
+        for import_type in import_types:
+            fact_model, related_name = FACT_TABLES[import_type]
+
+            import_objs_qs = Import.objects.filter(import_type=import_type)
+            if options['branch']:
+                import_objs_qs = import_objs_qs.filter(branch_id=options['branch'])
+
+            if options['rebuild']:
+                deleted, _ = fact_model.objects.filter(source__in=import_objs_qs).delete()
+                print(f"Deleted {deleted} {import_type} fact rows.")
+            else:
+                import_objs_qs = import_objs_qs.filter(**{f"{related_name}__isnull": True})
+
+            self.backfill(import_type, import_objs_qs, options['batch_size'])
+
+        if "sales_data" in import_types:
+            # Also covers employees whose facts predate the EmployeeStats table
+            written = refresh_employee_stats()
+            print(f"Refreshed the stats of {written} employees.")
+
+        written = refresh_branch_rollups()
+        print(f"Refreshed {written} branch daily rollups.")
+
+        written = refresh_period_rollups()
+        print(f"Refreshed {written} weekly/monthly/yearly rollups.")
+
+    def backfill(self, import_type, import_objs_qs, batch_size):
+        import_ids = list(import_objs_qs.order_by('id').values_list('id', flat=True))
+
+        total_facts = 0
+        for i in range(0, len(import_ids), batch_size):
+            batch = list(Import.objects.filter(id__in=import_ids[i:i + batch_size]))
+            with transaction.atomic():
+                total_facts += create_import_facts(batch)
+            print(f"Processed {min(i + batch_size, len(import_ids))}/{len(import_ids)} {import_type} imports.")
+
+        print(f"Backfill completed: {total_facts} {import_type} fact rows created.")
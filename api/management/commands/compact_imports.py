@@ -0,0 +1,55 @@
+import json
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.import_data import SCHEMA_COLUMNAR, SCHEMA_ROWS, compact_records, expand_columns
+from api.models import Import
+
+
+class Command(BaseCommand):
+    help = "Converts the stored Import.data to the columnar format (or back with --expand)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, default=None, help="Only convert this branch ID")
+        parser.add_argument('--type', choices=["sales_data", "counter_data"], default=None, help="Only convert this import type")
+        parser.add_argument('--expand', action='store_true', help="Convert columnar imports back to the row format")
+        parser.add_argument('--batch-size', type=int, default=500, help="Imports converted per transaction")
+
+    def handle(self, *args, **options):
+        source_version, target_version = (SCHEMA_COLUMNAR, SCHEMA_ROWS) if options['expand'] else (SCHEMA_ROWS, SCHEMA_COLUMNAR)
+
+        import_objs_qs = Import.objects.filter(schema_version=source_version)
+        if options['branch']:
+            import_objs_qs = import_objs_qs.filter(branch_id=options['branch'])
+        if options['type']:
+            import_objs_qs = import_objs_qs.filter(import_type=options['type'])
+
+        import_ids = list(import_objs_qs.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+
+        converted = skipped = size_before = size_after = 0
+        for i in range(0, len(import_ids), batch_size):
+            batch = []
+            for import_obj in Import.objects.filter(id__in=import_ids[i:i + batch_size]):
+                if options['expand']:
+                    data = expand_columns(import_obj.data) if isinstance(import_obj.data, dict) else None
+                else:
+                    data = compact_records(import_obj.data)
+                if data is None:
+                    print(f"COMPACT_IMPORTS Warning: Unexpected data on import {import_obj.id} ({import_obj.import_date}), skipped")
+                    skipped += 1
+                    continue
+
+                size_before += len(json.dumps(import_obj.data))
+                size_after += len(json.dumps(data))
+                import_obj.data = data
+                import_obj.schema_version = target_version
+                batch.append(import_obj)
+
+            with transaction.atomic():
+                Import.objects.bulk_update(batch, ['data', 'schema_version'])
+            converted += len(batch)
+            print(f"Processed {min(i + batch_size, len(import_ids))}/{len(import_ids)} imports.")
+
+        print(f"Converted {converted} imports ({skipped} skipped), data size {size_before} -> {size_after} bytes.")
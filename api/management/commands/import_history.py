@@ -0,0 +1,113 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.core.management import BaseCommand, CommandError
+
+from api.importers import EMPLOYEE_IMPORTS, IMPORT_FORMATS, parse_export, store_imports, validate_days
+from api.models import Branch
+
+
+def export_files(directory, branch_ids=None):
+    # <directory>/<branch id>/<export> -> [(branch_id, path), ...]
+    files = []
+    for branch_dir in sorted(Path(directory).iterdir()):
+        if not branch_dir.is_dir() or not branch_dir.name.isdigit():
+            continue
+        branch_id = int(branch_dir.name)
+        if branch_ids and branch_id not in branch_ids:
+            continue
+        for path in sorted(branch_dir.iterdir()):
+            if path.is_file() and path.name.endswith(tuple(IMPORT_FORMATS.values())):
+                files.append((branch_id, path))
+    return files
+
+
+def export_type(path):
+    return "counter_data" if "counter" in path.name.lower() else "sales_data"
+
+
+def _init_worker():
+    # Spawned workers (non fork platforms) start without the Django apps loaded
+    django.setup()
+
+
+def _parse_file(path, brand, import_type):
+    started = time.perf_counter()
+    data_by_date, errors = parse_export(path, brand, import_type)
+    return data_by_date, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ("Imports the historical exports of many branches: <directory>/<branch id>/*.xlsx|.csv|.csv.gz "
+            "(files named counter* are counter data, the others sales data). Files are parsed in a process pool.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory with one sub directory of exports per branch ID")
+        parser.add_argument('--branch', type=int, action='append', default=None, help="Only import this branch ID (repeatable)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Parser processes")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk_create batch")
+        parser.add_argument('--upsert', action='store_true', help="Replace already imported days instead of skipping the file")
+
+    def handle(self, *args, **options):
+        if not Path(options['directory']).is_dir():
+            raise CommandError(f"{options['directory']} is not a directory")
+
+        files = export_files(options['directory'], options['branch'])
+        branches = Branch.objects.in_bulk({branch_id for branch_id, _ in files})
+        print(f"Found {len(files)} exports for {len(branches)} branches.")
+
+        started = time.perf_counter()
+        total_created = total_replaced = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            futures = {}
+            for branch_id, path in files:
+                branch_obj = branches.get(branch_id)
+                if branch_obj is None:
+                    print(f"IMPORT_HISTORY Error: Branch {branch_id} not found, {path.name} skipped")
+                    continue
+                future = executor.submit(_parse_file, path, branch_obj.get_brand(), export_type(path))
+                futures[future] = (branch_obj, path)
+
+            # Written by this process as the files are parsed, in completion order
+            for future in as_completed(futures):
+                branch_obj, path = futures[future]
+                created, replaced = self.store_file(branch_obj, path, future, options)
+                total_created += created
+                total_replaced += replaced
+
+        print(f"History import completed in {time.perf_counter() - started:.2f}s: "
+              f"{total_created} imports created, {total_replaced} replaced.")
+
+    def store_file(self, branch_obj, path, future, options):
+        import_type = export_type(path)
+        label = f"{branch_obj.id}/{path.name}"
+        try:
+            data_by_date, errors, parse_seconds = future.result()
+        except Exception as e:
+            print(f"IMPORT_HISTORY Error: {label} could not be parsed: {e}")
+            return 0, 0
+
+        if data_by_date is None:
+            print(f"IMPORT_HISTORY Error: {label} skipped: {', '.join(errors)}")
+            return 0, 0
+
+        errors += validate_days(branch_obj, import_type, data_by_date,
+                                check_employees=(branch_obj.get_brand(), import_type) in EMPLOYEE_IMPORTS,
+                                replace=options['upsert'])
+        if errors:
+            print(f"IMPORT_HISTORY Error: {label} skipped, {len(errors)} errors: {', '.join(errors[:5])}")
+            return 0, 0
+
+        store_started = time.perf_counter()
+        created, replaced = store_imports(branch_obj, import_type, data_by_date, replace=options['upsert'],
+                                          batch_size=options['batch_size'])
+        store_seconds = time.perf_counter() - store_started
+
+        rows = sum(len(records) for records in data_by_date.values())
+        print(f"{label} ({import_type}): parsed {rows} rows in {parse_seconds:.2f}s "
+              f"({rows / max(parse_seconds, 1e-6):.0f} rows/s), stored {len(data_by_date)} days in {store_seconds:.2f}s "
+              f"({len(data_by_date) / max(store_seconds, 1e-6):.0f} days/s, {created} created, {replaced} replaced)")
+        return created, replaced
@@ -2,15 +2,25 @@ from datetime import datetime
 from pathlib import Path
 from django.core.management import BaseCommand
 from django.http import JsonResponse
-from openpyxl import load_workbook
 from django.core.management import call_command
 
 
-from api.models import Employee,Branch, Import, Schedule, Target
+from api.importers import COUNTER_COLUMNS, IMPORT_FORMATS, SALES_COLUMNS, convert_equivalenza_counter_rows, \
+    convert_equivalenza_sales_rows, iter_upload_rows, store_imports
+from api.models import Employee,Branch, Schedule, Target
 
 current_directory = Path(__file__).resolve().parent.parent.parent.parent
 
 
+def find_export(file_name):
+    # utils_files/<file_name> with the first supported extension found, faster formats first
+    for suffix in (IMPORT_FORMATS["csv.gz"], IMPORT_FORMATS["csv"], IMPORT_FORMATS["xlsx"]):
+        import_data_file = current_directory / 'utils_files' / f"{file_name}{suffix}"
+        if import_data_file.exists():
+            return import_data_file
+    raise FileNotFoundError(f"No export found for {file_name} in utils_files")
+
+
 class Command(BaseCommand):
     help = "Assigns all weapons to users, without duplicates, until finished"
 
@@ -88,110 +98,36 @@ class Command(BaseCommand):
             print(f"Employee '{employee['first_name']}' created successfully.")
 
 
-        files = ['Dati-Biella-2023.xlsx', 'Dati-Biella-2024.xlsx', 'Dati-Biella-2025.xlsx']
-        # Specify the path to the local file
+        # Exports are looked up as .csv.gz, .csv or .xlsx (first found)
+        files = ['Dati-Biella-2023', 'Dati-Biella-2024', 'Dati-Biella-2025']
         for file_name in files:
-            import_data_file = current_directory / 'utils_files' / file_name
-
-            # Load the workbook from the local file
-            workbook = load_workbook(filename=import_data_file)
-
-            # Access the sheet
-            sheet = workbook.active  # You can specify sheet name if needed
-
-            # Initialize the dictionary to hold the data
-            data_dict = {}
-
-            # Iterate through the rows, skipping the header
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-                date = row[1]  # assuming the date is in the second column
-                record = {
-                    "Dipendente": row[0],
-                    "Qta. Vend.": row[2],
-                    "Sco.": row[3],
-                    "Importo": row[4],
-                    "Sco. Medio": row[5],
-                    "Qta Media": row[6]
-                }
-
-                # If the date is already a key, append the new record to its list
-                if date in data_dict:
-                    data_dict[date].append(record)
-                else:
-                    # Otherwise, create a new list with the record
-                    data_dict[date] = [record]
-
-            import_qs = Import.objects.none()
-
-            errors = []
-            selected_branch = 1
+            import_data_file = find_export(file_name)
+
+            data_dict = convert_equivalenza_sales_rows(iter_upload_rows(import_data_file, SALES_COLUMNS))
+
             selected_type = 'sales_data'
 
-            import_bulk_create_list = []
+            data_by_date = {}
             for date, data in data_dict.items():
                 date_obj = datetime.strptime(date, '%d/%m/%Y')
-                date_str = date_obj.strftime('%Y-%m-%d')
-                i = Import(import_date=date_str, data=data, branch=branch_obj, import_type=selected_type)
-                import_bulk_create_list.append(i)
+                data_by_date[date_obj.strftime('%Y-%m-%d')] = data
 
-            Import.objects.bulk_create(import_bulk_create_list)
-            print(f"Import data created successfully for  {file_name}.")
+            # Same path as the uploads: stored in the configured Import.data format, with their facts
+            store_imports(branch_obj, selected_type, data_by_date)
+            print(f"Import data created successfully for  {import_data_file.name}.")
 
-        files = ['counter_biella_2023.xlsx', 'counter_biella_2024.xlsx', 'counter_biella_2025.xlsx']
+        files = ['counter_biella_2023', 'counter_biella_2024', 'counter_biella_2025']
         for file_name in files:
-            import_data_file = current_directory / 'utils_files' / file_name
+            import_data_file = find_export(file_name)
 
-            # Load the workbook from the local file
-            workbook = load_workbook(filename=import_data_file)
+            # mar-19.11.24 dates are converted to YYYY-MM-DD, the last row of a date wins
+            data_dict = convert_equivalenza_counter_rows(iter_upload_rows(import_data_file, COUNTER_COLUMNS))
 
-            # Access the sheet
-            sheet = workbook.active  # You can specify sheet name if needed
-
-            # Initialize the dictionary to hold the data
-            data_dict = {}
-            import_qs = Import.objects.none()
-
-            errors = []
-            selected_branch = 1
             selected_type = 'counter_data'
 
-            # Iterate through the rows, skipping the header
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-                date = row[0]  # assuming the date is in the second column
-                record = {
-                    "(Ing) Ingressi": row[1] or 0,
-                    "(Est) Traffico Esterno": row[2] or 0,
-                    "(TA) Tasso di Attrazione": row[3] or 0,
-                }
-
-                # mar-19.11.24 to YYYY/MM/DD
-                date = date.split("-")[1]
-                date = datetime.strptime(date, "%d.%m.%y").strftime("%Y-%m-%d")
-
-                # If the date is already a key, overwrite the current record
-                if date in data_dict:
-
-                    data_dict[date] = record
-                else:
-                    # Otherwise, create a new list with the record
-                    data_dict[date] = [record]
-
-                data_dict[date] = [record]
-
-            for date, records in data_dict.items():
-                if Import.objects.filter(branch=branch_obj, import_date=date,
-                                         import_type=selected_type).exists():
-                    errors.append(f"Collision on {date}")
-                    continue
-
-            import_bulk_create_list = []
-            for date, data in data_dict.items():
-                i = Import(import_date=date, data=data, branch=branch_obj, import_type=selected_type)
-                import_bulk_create_list.append(i)
-
-            Import.objects.bulk_create(import_bulk_create_list)
+            store_imports(branch_obj, selected_type, data_dict)
 
-            print(f"Import data created successfully for  {file_name}.")
+            print(f"Import data created successfully for  {import_data_file.name}.")
 
         
         selected_branch = 1
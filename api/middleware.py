@@ -0,0 +1,24 @@
+from api.request_cache import activate_request_cache, deactivate_request_cache
+
+
+class RequestCacheMiddleware:
+    """
+    Activates the request scoped formula cache (api.request_cache) for every request.
+    The hit/miss counters are available as request.request_cache.stats() and are
+    returned in the X-Request-Cache response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache, token = activate_request_cache()
+        request.request_cache = cache
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate_request_cache(token)
+
+        stats = cache.stats()
+        response["X-Request-Cache"] = f"hits={stats['hits']}; misses={stats['misses']}"
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('qty', models.IntegerField(default=0)),
+                ('receipts', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.branch')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_facts', to='api.employee')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_facts', to='api.import')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'date'], name='api_salesfa_branch__d9cccf_idx'), models.Index(fields=['employee', 'date'], name='api_salesfa_employe_7a40b9_idx')],
+            },
+        ),
+    ]
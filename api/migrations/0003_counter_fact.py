@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_sales_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entrances', models.IntegerField(default=0)),
+                ('external_traffic', models.IntegerField(default=0)),
+                ('attraction_rate', models.DecimalField(blank=True, decimal_places=4, max_digits=9, null=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.branch')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_facts', to='api.import')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'date'], name='api_counter_branch__fc16a4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_counter_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('working_days', models.IntegerField(default=0)),
+                ('total_receipts', models.IntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_qty', models.IntegerField(default=0)),
+                ('medium_receipts_number', models.IntegerField(default=0)),
+                ('medium_sales', models.FloatField(default=0.0)),
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.employee')),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_employee_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipts', models.IntegerField(default=0)),
+                ('entrances', models.IntegerField(default=0)),
+                ('conversion_rate', models.FloatField(default=0.0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'date'), name='unique_branch_daily_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_branch_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchPeriodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month'), ('year', 'Year')], max_length=10)),
+                ('start', models.DateField()),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipts', models.IntegerField(default=0)),
+                ('entrances', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_rollups', to='api.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'period', 'start'), name='unique_branch_period_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmployeePeriodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month'), ('year', 'Year')], max_length=10)),
+                ('start', models.DateField()),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('receipts', models.IntegerField(default=0)),
+                ('qty', models.IntegerField(default=0)),
+                ('working_days', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.branch')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_rollups', to='api.employee')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'branch', 'period', 'start'), name='unique_employee_period_rollup')],
+            },
+        ),
+    ]
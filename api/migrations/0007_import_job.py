@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 09:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_period_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_type', models.CharField(default='', max_length=100)),
+                ('file_path', models.CharField(default='', max_length=500)),
+                ('status', models.CharField(default='queued', max_length=20)),
+                ('rows_parsed', models.IntegerField(default=0)),
+                ('days_validated', models.IntegerField(default=0)),
+                ('imports_created', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.branch')),
+            ],
+        ),
+    ]
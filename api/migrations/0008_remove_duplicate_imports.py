@@ -0,0 +1,130 @@
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+PERIOD_TRUNCS = {"week": TruncWeek, "month": TruncMonth, "year": TruncYear}
+
+
+def _refresh_employee_stats(apps, employee_ids):
+    SalesFact = apps.get_model('api', 'SalesFact')
+    EmployeeStats = apps.get_model('api', 'EmployeeStats')
+
+    for employee_id in employee_ids:
+        row = SalesFact.objects.filter(employee_id=employee_id).aggregate(
+            working_days=Count('date', distinct=True), total_receipts=Sum('receipts'),
+            total_sales=Sum('amount'), total_qty=Sum('qty'))
+        working_days = row['working_days']
+        EmployeeStats.objects.update_or_create(employee_id=employee_id, defaults={
+            'working_days': working_days,
+            'total_receipts': row['total_receipts'] or 0,
+            'total_sales': row['total_sales'] or 0,
+            'total_qty': row['total_qty'] or 0,
+            'medium_receipts_number': int(row['total_receipts'] / working_days) if working_days else 0,
+            'medium_sales': round(float(row['total_sales']) / working_days, 2) if working_days else 0.0,
+        })
+
+
+def _rebuild_branch_rollups(apps, branch_ids):
+    SalesFact = apps.get_model('api', 'SalesFact')
+    CounterFact = apps.get_model('api', 'CounterFact')
+    BranchDailyRollup = apps.get_model('api', 'BranchDailyRollup')
+
+    daily_sales = {
+        (row['branch_id'], row['date']): row
+        for row in SalesFact.objects.filter(branch_id__in=branch_ids).values('branch_id', 'date').annotate(
+            sales=Sum('amount'), receipts=Sum('receipts'))
+    }
+    daily_entrances = {
+        (row['branch_id'], row['date']): row['entrances']
+        for row in CounterFact.objects.filter(branch_id__in=branch_ids).values('branch_id', 'date').annotate(
+            entrances=Sum('entrances'))
+    }
+
+    rollups = []
+    for branch_id, date in set(daily_sales) | set(daily_entrances):
+        sales_row = daily_sales.get((branch_id, date))
+        receipts = sales_row['receipts'] if sales_row else 0
+        entrances = daily_entrances.get((branch_id, date), 0)
+        rollups.append(BranchDailyRollup(
+            branch_id=branch_id, date=date, sales=sales_row['sales'] if sales_row else 0, receipts=receipts,
+            entrances=entrances, conversion_rate=max(receipts / entrances * 100.0, 0.0) if entrances > 0 else 0.0,
+        ))
+
+    BranchDailyRollup.objects.filter(branch_id__in=branch_ids).delete()
+    BranchDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+def _rebuild_period_rollups(apps, branch_ids):
+    SalesFact = apps.get_model('api', 'SalesFact')
+    BranchDailyRollup = apps.get_model('api', 'BranchDailyRollup')
+    BranchPeriodRollup = apps.get_model('api', 'BranchPeriodRollup')
+    EmployeePeriodRollup = apps.get_model('api', 'EmployeePeriodRollup')
+
+    BranchPeriodRollup.objects.filter(branch_id__in=branch_ids).delete()
+    EmployeePeriodRollup.objects.filter(branch_id__in=branch_ids).delete()
+    for period, trunc in PERIOD_TRUNCS.items():
+        branch_rows = BranchDailyRollup.objects.filter(branch_id__in=branch_ids).annotate(bucket=trunc('date')).values(
+            'branch_id', 'bucket').annotate(sales_total=Sum('sales'), receipts_total=Sum('receipts'),
+                                            entrances_total=Sum('entrances'))
+        BranchPeriodRollup.objects.bulk_create([
+            BranchPeriodRollup(branch_id=row['branch_id'], period=period, start=row['bucket'], sales=row['sales_total'],
+                               receipts=row['receipts_total'], entrances=row['entrances_total'])
+            for row in branch_rows
+        ], batch_size=1000)
+
+        employee_rows = SalesFact.objects.filter(branch_id__in=branch_ids, employee__isnull=False).annotate(
+            bucket=trunc('date')).values('employee_id', 'branch_id', 'bucket').annotate(
+            sales_total=Sum('amount'), receipts_total=Sum('receipts'), qty_total=Sum('qty'),
+            working_days=Count('date', distinct=True))
+        EmployeePeriodRollup.objects.bulk_create([
+            EmployeePeriodRollup(employee_id=row['employee_id'], branch_id=row['branch_id'], period=period,
+                                 start=row['bucket'], sales=row['sales_total'], receipts=row['receipts_total'],
+                                 qty=row['qty_total'], working_days=row['working_days'])
+            for row in employee_rows
+        ], batch_size=1000)
+
+
+def remove_duplicate_imports(apps, schema_editor):
+    # Keep the latest import of every (branch, day, type), the one an upsert would have left.
+    # Their facts go with them (CASCADE): the stats of their employees and the rollups of their branches are
+    # rebuilt from the facts left (the same computations as api.facts, on the historical models).
+    Import = apps.get_model('api', 'Import')
+    SalesFact = apps.get_model('api', 'SalesFact')
+    CounterFact = apps.get_model('api', 'CounterFact')
+
+    duplicates = Import.objects.values('branch_id', 'import_date', 'import_type').annotate(
+        count=Count('id'), last_id=Max('id')).filter(count__gt=1)
+
+    stale_employee_ids, stale_branch_ids = set(), set()
+    for row in duplicates:
+        duplicate_imports = Import.objects.filter(
+            branch_id=row['branch_id'], import_date=row['import_date'], import_type=row['import_type'],
+        ).exclude(id=row['last_id'])
+
+        stale_sales_qs = SalesFact.objects.filter(source__in=duplicate_imports)
+        stale_counter_qs = CounterFact.objects.filter(source__in=duplicate_imports)
+        stale_employee_ids |= set(stale_sales_qs.filter(employee__isnull=False).values_list('employee_id', flat=True))
+        if stale_sales_qs.exists() or stale_counter_qs.exists():
+            stale_branch_ids.add(row['branch_id'])
+
+        duplicate_imports.delete()
+
+    if stale_employee_ids:
+        _refresh_employee_stats(apps, stale_employee_ids)
+    if stale_branch_ids:
+        _rebuild_branch_rollups(apps, stale_branch_ids)
+        _rebuild_period_rollups(apps, stale_branch_ids)
+
+
+class Migration(migrations.Migration):
+    # Separate from the unique constraint of 0009_import_upsert: on PostgreSQL the deletes leave deferred
+    # foreign key checks (SalesFact/CounterFact.source) pending until commit, and an ALTER TABLE of
+    # api_import in the same transaction fails with "pending trigger events".
+
+    dependencies = [
+        ('api', '0007_import_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_imports, migrations.RunPython.noop),
+    ]
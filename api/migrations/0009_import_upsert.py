@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_remove_duplicate_imports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(default='insert', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='imports_replaced',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='import',
+            constraint=models.UniqueConstraint(fields=('branch', 'import_date', 'import_type'), name='unique_import_day'),
+        ),
+    ]
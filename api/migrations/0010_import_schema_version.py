@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_import_upsert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='import',
+            name='schema_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from django.db import migrations
+
+# model -> (date fields, time fields), stored as strings until 0012_date_fields
+DATE_COLUMNS = {
+    'Import': (['import_date'], []),
+    'Schedule': (['start_date', 'end_date'], []),
+    'Target': (['start_date', 'end_date'], []),
+    'ScheduleEvent': (['date'], ['start_time', 'end_time']),
+}
+
+
+def _normalize_date(value):
+    # "2025-08-01" or an ISO datetime
+    return datetime.strptime(value.strip()[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def _normalize_time(value):
+    # "9:00", "09:00:00" or an ISO datetime
+    value = value.strip().split("T")[-1]
+    for time_format in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, time_format).strftime("%H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time '{value}'")
+
+
+def normalize_dates(apps, schema_editor):
+    # Rewrites the string dates/times in the canonical format the DateField/TimeField casts of
+    # 0012_date_fields accept. Values that can't be converted stop the migration: fix or delete them first.
+    invalid = []
+    for model_name, (date_fields, time_fields) in DATE_COLUMNS.items():
+        model = apps.get_model('api', model_name)
+        fields = [(field, _normalize_date) for field in date_fields] + [(field, _normalize_time) for field in time_fields]
+
+        changed = []
+        for obj in model.objects.only(*(field for field, _ in fields)).iterator():
+            obj_changed = False
+            for field, normalize in fields:
+                value = getattr(obj, field)
+                try:
+                    normalized = normalize(value)
+                except (TypeError, ValueError, AttributeError):
+                    invalid.append(f"{model_name} #{obj.pk} {field}={value!r}")
+                    continue
+                if normalized != value:
+                    setattr(obj, field, normalized)
+                    obj_changed = True
+            if obj_changed:
+                changed.append(obj)
+
+        model.objects.bulk_update(changed, [field for field, _ in fields], batch_size=500)
+
+    if invalid:
+        raise ValueError("Rows with invalid dates/times: " + ", ".join(invalid))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_import_schema_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_dates, migrations.RunPython.noop),
+    ]
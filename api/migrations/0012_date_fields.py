@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_normalize_dates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='import',
+            name='import_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='end_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='start_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='scheduleevent',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='scheduleevent',
+            name='end_time',
+            field=models.TimeField(),
+        ),
+        migrations.AlterField(
+            model_name='scheduleevent',
+            name='start_time',
+            field=models.TimeField(),
+        ),
+        migrations.AlterField(
+            model_name='target',
+            name='end_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='target',
+            name='start_date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='import',
+            index=models.Index(fields=['branch', 'import_type', 'import_date'], name='api_import_branch__7c0799_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['branch', 'start_date', 'end_date'], name='api_schedul_branch__ddd612_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleevent',
+            index=models.Index(fields=['schedule', 'date'], name='api_schedul_schedul_67f4e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='target',
+            index=models.Index(fields=['branch', 'start_date', 'end_date'], name='api_target_branch__b9fc3f_idx'),
+        ),
+    ]
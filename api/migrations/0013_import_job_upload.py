@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_date_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importjob',
+            name='file_path',
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='upload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
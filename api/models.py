@@ -7,7 +7,7 @@ from django.db import models, transaction
 
 from django.core.exceptions import ValidationError
 
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 
 
 # Create your models here.
@@ -80,8 +80,8 @@ class Schedule(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     title = models.CharField(default="", max_length=100)
     employees = models.JSONField(default=dict, blank=True)
-    start_date = models.CharField(default="", max_length=100)
-    end_date = models.CharField(default="", max_length=100)
+    start_date = models.DateField()
+    end_date = models.DateField()
     shifts_data = models.JSONField(default=dict, blank=True)
     closing_days = models.JSONField(default=dict, blank=True)
     free_days = models.JSONField(default=dict, blank=True)
@@ -90,19 +90,23 @@ class Schedule(models.Model):
 
     processed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Overlap check in clean() and schedule lookups by date
+            models.Index(fields=["branch", "start_date", "end_date"]),
+        ]
+
     def __str__(self):
         return f"SCHEDULE #{self.id}"
 
     def clean(self):
         """
         Validate that there is no overlapping schedule for the same branch.
-        Assumes start_date and end_date are stored in ISO format (YYYY-MM-DD).
+        Runs after clean_fields(), which already converted the YYYY-MM-DD strings to dates.
         """
-        # Parse the start and end dates. If parsing fails, raise a ValidationError.
-        try:
-            start = datetime.strptime(self.start_date, "%Y-%m-%d").date()
-            end = datetime.strptime(self.end_date, "%Y-%m-%d").date()
-        except ValueError:
+        start = self.start_date
+        end = self.end_date
+        if not isinstance(start, date) or not isinstance(end, date):
             raise ValidationError("Formato data non valido. Utilizzare YYYY-MM-DD sia per la data di inizio che di fine.")
 
         # Check that the start date is not after the end date.
@@ -114,8 +118,8 @@ class Schedule(models.Model):
         #     schedule1.start_date <= schedule2.end_date and schedule1.end_date >= schedule2.start_date
         overlapping_schedules = Schedule.objects.filter(
             branch=self.branch,
-            start_date__lte=self.end_date,
-            end_date__gte=self.start_date,
+            start_date__lte=end,
+            end_date__gte=start,
         )
         # Exclude this schedule (in case of updates)
         if self.pk:
@@ -211,6 +215,10 @@ class Schedule(models.Model):
 
         # Create the dictionary for the main Schedule data
         backup_data = {field: getattr(self, field) for field in fields_to_backup_schedule}
+        # Dates are restored from their YYYY-MM-DD strings
+        for field in ('start_date', 'end_date'):
+            if hasattr(backup_data[field], 'isoformat'):
+                backup_data[field] = backup_data[field].isoformat()
 
         # --- Backup Related ScheduleEvent objects ---
         related_events_data = []
@@ -441,14 +449,16 @@ class Schedule(models.Model):
 
     def get_settings(self):
         employees_data=[]
-        employees_scontrino_medio = []
-        all_employees = Employee.objects.filter(branch=self.branch)
+        # Lifetime averages come from the EmployeeStats rollup, joined in the same query
+        all_employees = Employee.objects.filter(branch=self.branch).select_related('stats')
         for employee_obj in all_employees :
             try:
-                emp_medium_receipt_number = employee_obj.get_total_medium_receipts_number()
-                emp_medium_receipt_value = employee_obj.get_total_medium_sales()
-            except Employee.DoesNotExist:
-                employees_scontrino_medio.append(None)
+                emp_medium_receipt_number = employee_obj.stats.medium_receipts_number
+                emp_medium_receipt_value = employee_obj.stats.medium_sales
+            except EmployeeStats.DoesNotExist:
+                # No sales imported yet for this employee
+                emp_medium_receipt_number = 0
+                emp_medium_receipt_value = 0.0
             employees_data.append({
                 "id": employee_obj.id,
                 'fullName': employee_obj.get_full_name(),
@@ -478,22 +488,219 @@ class Schedule(models.Model):
 
 class Import(models.Model):
 
-    import_date = models.CharField(default="", max_length=100)
+    import_date = models.DateField()
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     import_type = models.CharField(max_length=100, default="")
     data = models.JSONField(default=dict)
+    schema_version = models.PositiveSmallIntegerField(default=1)  # storage format of data, see api.import_data
+
+    class Meta:
+        constraints = [
+            # One import per day and type, re-sent days are replaced (upsert mode)
+            models.UniqueConstraint(fields=["branch", "import_date", "import_type"], name="unique_import_day"),
+        ]
+        indexes = [
+            # Range scans of one branch/type (history calendar, collision checks)
+            models.Index(fields=["branch", "import_type", "import_date"]),
+        ]
 
     def __str__(self):
         return f"IMPORT #{self.id}"
 
 
+class ImportJob(models.Model):
+    """
+    An uploaded export waiting for / being processed by the async_process_import task.
+    The counters are updated while the file is processed so the client can poll them.
+    The export itself is kept in the row (upload), so the worker doesn't need to share
+    a filesystem with the web processes; it is cleared once the job has finished.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCESS = "success"
+    STATUS_ERROR = "error"
+
+    # insert: any already imported day rejects the file, upsert: already imported days are replaced
+    MODE_INSERT = "insert"
+    MODE_UPSERT = "upsert"
+    MODES = [MODE_INSERT, MODE_UPSERT]
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    import_type = models.CharField(max_length=100, default="")
+    mode = models.CharField(max_length=20, default=MODE_INSERT)
+    upload = models.BinaryField(null=True, blank=True)
+    status = models.CharField(max_length=20, default=STATUS_QUEUED)
+    rows_parsed = models.IntegerField(default=0)
+    days_validated = models.IntegerField(default=0)
+    imports_created = models.IntegerField(default=0)
+    imports_replaced = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"IMPORT JOB #{self.id}"
+
+    def update_progress(self, **counters):
+        for field, value in counters.items():
+            setattr(self, field, value)
+        self.save(update_fields=list(counters) + ['updated_at'])
+
+
+class SalesFact(models.Model):
+    """
+    One typed row of a 'sales_data' import (one per employee per day for equivalenza,
+    one per day for original). Built from Import.data when the import is stored so that
+    the sales/receipts formulas can run as SQL aggregates instead of re-parsing JSON.
+    """
+
+    source = models.ForeignKey(Import, on_delete=models.CASCADE, related_name="sales_facts")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
+    employee = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, blank=True, related_name="sales_facts")
+    qty = models.IntegerField(default=0)
+    receipts = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["branch", "date"]),
+            models.Index(fields=["employee", "date"]),
+        ]
+
+    def __str__(self):
+        return f"SALES FACT #{self.id}"
+
+
+class CounterFact(models.Model):
+    """
+    Typed people counter totals of a 'counter_data' import (one row per day).
+    attraction_rate is NULL when the export has no value, so averages skip that day.
+    """
+
+    source = models.ForeignKey(Import, on_delete=models.CASCADE, related_name="counter_facts")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
+    entrances = models.IntegerField(default=0)
+    external_traffic = models.IntegerField(default=0)
+    attraction_rate = models.DecimalField(max_digits=9, decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["branch", "date"]),
+        ]
+
+    def __str__(self):
+        return f"COUNTER FACT #{self.id}"
+
+
+class EmployeeStats(models.Model):
+    """
+    Lifetime sales figures of an employee, kept up to date from the SalesFact rows
+    (api.facts.refresh_employee_stats) so the schedule settings don't have to
+    aggregate the whole sales history of every employee.
+    """
+
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, related_name="stats")
+    working_days = models.IntegerField(default=0)
+    total_receipts = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_qty = models.IntegerField(default=0)
+    medium_receipts_number = models.IntegerField(default=0)  # receipts per working day
+    medium_sales = models.FloatField(default=0.0)  # sales per working day
+
+    def __str__(self):
+        return f"EMPLOYEE STATS #{self.employee_id}"
+
+
+class BranchDailyRollup(models.Model):
+    """
+    Daily totals of a branch (sales, receipts, entrances, conversion rate), rebuilt for
+    the touched days whenever sales/counter facts are stored (api.facts.refresh_branch_rollups).
+    Range KPIs like the dashboard ones are plain sums over this table.
+    """
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name="daily_rollups")
+    date = models.DateField()
+    sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipts = models.IntegerField(default=0)
+    entrances = models.IntegerField(default=0)
+    conversion_rate = models.FloatField(default=0.0)  # receipts / entrances * 100
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["branch", "date"], name="unique_branch_daily_rollup"),
+        ]
+
+    def __str__(self):
+        return f"BRANCH ROLLUP #{self.branch_id} {self.date}"
+
+
+ROLLUP_PERIODS = (
+    ("week", "Week"),  # starts on Monday
+    ("month", "Month"),
+    ("year", "Year"),
+)
+
+
+class BranchPeriodRollup(models.Model):
+    """
+    Weekly/monthly/yearly totals of a branch, aggregated from BranchDailyRollup.
+    start is the first day of the bucket; see api.formulas.rollups for the range planner.
+    """
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name="period_rollups")
+    period = models.CharField(max_length=10, choices=ROLLUP_PERIODS)
+    start = models.DateField()
+    sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipts = models.IntegerField(default=0)
+    entrances = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["branch", "period", "start"], name="unique_branch_period_rollup"),
+        ]
+
+    def __str__(self):
+        return f"BRANCH ROLLUP #{self.branch_id} {self.period} {self.start}"
+
+
+class EmployeePeriodRollup(models.Model):
+    """
+    Weekly/monthly/yearly sales figures of an employee in a branch, aggregated from SalesFact.
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="period_rollups")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    period = models.CharField(max_length=10, choices=ROLLUP_PERIODS)
+    start = models.DateField()
+    sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    receipts = models.IntegerField(default=0)
+    qty = models.IntegerField(default=0)
+    working_days = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["employee", "branch", "period", "start"], name="unique_employee_period_rollup"),
+        ]
+
+    def __str__(self):
+        return f"EMPLOYEE ROLLUP #{self.employee_id} {self.period} {self.start}"
+
+
 class Target(models.Model):
 
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
-    start_date = models.CharField(default="", max_length=100)
-    end_date = models.CharField(default="", max_length=100)
+    start_date = models.DateField()
+    end_date = models.DateField()
     sales_target = models.FloatField(default=0.0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["branch", "start_date", "end_date"]),
+        ]
+
     def __str__(self):
         return f"TARGET #{self.id}"
 
@@ -509,18 +716,23 @@ class ScheduleEvent(models.Model):
 
     schedule = models.ForeignKey('Schedule', on_delete=models.CASCADE, related_name="events")
     employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name="schedule_events")
-    date = models.CharField(default="", max_length=100)
-    start_time = models.CharField(default="", max_length=100)
-    end_time = models.CharField(default="", max_length=100)
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
     color = models.CharField(default="", max_length=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["schedule", "date"]),
+        ]
+
     def format_json(self):
         data= {
             'id': self.id,
             'employeeId': self.employee.id,
-            'date': self.date,
-            'startTime': self.start_time,
-            'endTime': self.end_time,
+            'date': self.date.isoformat(),
+            'startTime': self.start_time.strftime("%H:%M"),
+            'endTime': self.end_time.strftime("%H:%M"),
             'color': self.color,
         }
         return data
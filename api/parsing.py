@@ -0,0 +1,89 @@
+# api/parsing.py
+"""
+Number parsing of the export cells, shared by the importers, the columnar
+Import.data encoder (api.import_data) and the fact builders (api.facts).
+
+Cells are parsed once, when the facts are built, so the formulas only ever read
+typed columns. Numeric cells (workbook numbers, columnar data) take a fast path
+with no string handling; string cells go through an LRU cache, since exports
+repeat the same few thousand values ("1,00", "8.00", "35,18"...) all over.
+"""
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+NUMERIC_TYPES = (int, float, Decimal)
+
+RATE_QUANTUM = Decimal("0.0001")
+
+# Distinct cell strings kept per parser
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _mixed_decimal(value_str):
+    # Italian locale only if there is a ',', "8.00" is a plain decimal
+    value_str = value_str.strip()
+    if "," in value_str:
+        value_str = value_str.replace(".", "").replace(",", ".")
+    return Decimal(value_str)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _rate_decimal(value_str):
+    return Decimal(value_str.strip().replace('%', '').replace(',', '.')).quantize(RATE_QUANTUM)
+
+
+# parse_amount: Converts an export money cell ("1.234,56", "35,18", "1234.56", 35.18) to Decimal.
+# '.' is a thousands separator only when the string also has a ',', otherwise it is the decimal point.
+# Output: Decimal, or None if the cell is empty. Raises InvalidOperation on garbage.
+def parse_amount(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, NUMERIC_TYPES):
+        return Decimal(str(value))
+    return _mixed_decimal(str(value))
+
+
+# parse_decimal: Converts an export average cell ("41,9", "2.96", 2.96) to Decimal.
+# Same rules as the money cells.
+parse_decimal = parse_amount
+
+
+# parse_count: Converts an export counter cell ("8.00", "1.234,00", 8) to int.
+# Output: int, or None if the cell is empty. Raises InvalidOperation on garbage and on fractional
+# counts ("8,5"), which would otherwise be truncated silently.
+def parse_count(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, NUMERIC_TYPES):
+        count = int(value)
+        if count != value:
+            raise InvalidOperation(f"Fractional count {value}")
+        return count
+    count = _mixed_decimal(str(value))
+    if count != count.to_integral_value():
+        raise InvalidOperation(f"Fractional count {value}")
+    return int(count)
+
+
+# parse_rate: Converts an attraction rate cell ("2,54", "2.54%", 2.54) to Decimal with 4 decimals.
+# Output: Decimal, or None if the cell is empty. Raises InvalidOperation on garbage.
+def parse_rate(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, NUMERIC_TYPES):
+        return Decimal(str(value)).quantize(RATE_QUANTUM)
+    return _rate_decimal(str(value))
+
+
+# parse_column: Parses a whole column of cells with one of the parsers above.
+# Cells that don't parse are replaced by invalid(value), None if no callback is given.
+# Output: list
+def parse_column(parser, values, invalid=None):
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(parser(value))
+        except (InvalidOperation, ValueError, TypeError):
+            parsed.append(invalid(value) if invalid is not None else None)
+    return parsed
@@ -0,0 +1,117 @@
+# api/report_cache.py
+"""
+Cross request cache of the report endpoints, stored in Django's cache. The cache must
+be shared by every process (settings.CACHES, a database table by default): imports
+invalidate it from the procrastinate worker, the reports are served by the gunicorn
+workers.
+
+Entries are keyed on (endpoint, branch_id, start, end, chart) and on version numbers:
+one for the branch and one per (branch, month) the range spans. An import bumps the
+versions of the months of its days, so only the reports whose range contains one of
+them are never read again; edits that affect every report of a branch (targets,
+employees) bump the branch version. Stale entries expire on their own
+(REPORT_CACHE_TIMEOUT). No index of the cached keys is kept, so concurrent writers
+can't lose each other's keys.
+"""
+import hashlib
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+REPORT_CACHE_TIMEOUT = getattr(settings, "REPORT_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+def _report_key(versions, endpoint, branch_id, start_date, end_date, chart):
+    # One digest for the versions of the branch and of every month spanned, whatever the range length
+    digest = hashlib.sha1(":".join(str(version) for version in versions).encode()).hexdigest()
+    return f"report:{branch_id}:{digest}:{endpoint}:{start_date}:{end_date}:{chart}"
+
+
+def _version_key(branch_id):
+    return f"report_version:{branch_id}"
+
+
+def _month_version_key(branch_id, day):
+    return f"report_version:{branch_id}:{day.year}-{day.month:02d}"
+
+
+def _months(start, end):
+    # First day of every month from start to end
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _initial_version():
+    # Time based, so a version key evicted from the cache never comes back with an old value
+    return time.time_ns() // 1000
+
+
+def _range_versions(branch_id, start, end):
+    keys = [_version_key(branch_id)] + [_month_version_key(branch_id, month) for month in _months(start, end)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), None)
+        versions.update(cache.get_many(missing))
+    # A version evicted again in between only makes this entry unreachable
+    return [versions.get(key, _initial_version()) for key in keys]
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # No version yet (or evicted): any new one is newer than the cached reports
+        cache.set(key, _initial_version(), None)
+        return cache.get(key)
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    if isinstance(value, date):
+        return value
+    raise TypeError(f"Not a date: {value!r}")
+
+
+# cached_json_response: Returns the cached JSON body of a report, or builds it with build()
+# (a view callable returning a JsonResponse) and caches it if the status is 200.
+# Output: HttpResponse / JsonResponse
+def cached_json_response(endpoint, branch_id, start_date, end_date, chart, build):
+    try:
+        start, end = _to_date(start_date), _to_date(end_date)
+    except (TypeError, ValueError):
+        # Not a valid date range, don't cache it
+        return build()
+
+    key = _report_key(_range_versions(branch_id, start, end), endpoint, branch_id, start_date, end_date, chart)
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type="application/json")
+
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.content, REPORT_CACHE_TIMEOUT)
+    return response
+
+
+# invalidate_branch_reports: Evicts every cached report of a branch (target or employee edits).
+# Output: int (the new branch version).
+def invalidate_branch_reports(branch_id):
+    return _bump_version(_version_key(branch_id))
+
+
+# invalidate_reports: Evicts the cached reports of a branch whose range contains a month of the given dates
+# (new or replaced data for those days). Reports of the other months stay cached.
+# Output: int (number of months invalidated).
+def invalidate_reports(branch_id, dates):
+    months = {_to_date(day).replace(day=1) for day in dates}
+    for month in months:
+        _bump_version(_month_version_key(branch_id, month))
+    return len(months)
@@ -0,0 +1,72 @@
+# api/request_cache.py
+"""
+Request scoped memoization for the report formulas.
+
+RequestCacheMiddleware activates a RequestCache for the life of each request;
+functions decorated with @request_cached then compute each distinct call once per
+request (same branch, same range...) and serve the repeats from memory. Outside
+of an active cache (management commands, tasks, shell) they run normally.
+
+Cached values are shared between the callers of the same request: don't mutate them.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+_current_cache = ContextVar("request_cache", default=None)
+
+
+class RequestCache:
+    def __init__(self):
+        self.store = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        if key in self.store:
+            self.hits += 1
+            return self.store[key]
+        self.misses += 1
+        value = compute()
+        self.store[key] = value
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.store)}
+
+
+# activate_request_cache: Starts a new cache for the current context.
+# Output: (RequestCache, token) - pass the token to deactivate_request_cache.
+def activate_request_cache():
+    cache = RequestCache()
+    token = _current_cache.set(cache)
+    return cache, token
+
+
+def deactivate_request_cache(token):
+    _current_cache.reset(token)
+
+
+# get_request_cache: Output: the active RequestCache, or None outside of a cached request.
+def get_request_cache():
+    return _current_cache.get()
+
+
+# request_cached: Decorator memoizing a function per request, keyed by its name and (hashable) arguments.
+def request_cached(func):
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _current_cache.get()
+        if cache is None:
+            return func(*args, **kwargs)
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # Unhashable arguments (lists...), not worth caching
+            return func(*args, **kwargs)
+        return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+    return wrapper
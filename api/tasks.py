@@ -4,7 +4,7 @@ from datetime import timedelta, datetime
 from procrastinate.contrib.django import app
 import logging
 
-from api.models import Schedule
+from api.models import ImportJob, Schedule
 
 logger = logging.getLogger('procrastinate')
 
@@ -34,6 +34,26 @@ def async_create_schedule(schedule_id):
         logging.error(f"Error creating schedule: {e}")
         return 1
 
+
+@app.task()
+def async_process_import(job_id):
+    from api.importers import process_import_job
+    logging.info(f"Processing import job {job_id}...")
+
+    try:
+        job = ImportJob.objects.select_related('branch').get(id=job_id)
+    except ImportJob.DoesNotExist:
+        logging.error(f"Import job with ID {job_id} does not exist.")
+        return 1
+
+    if job.status != ImportJob.STATUS_QUEUED:
+        logging.error(f"Import job with ID {job_id} has already been processed.")
+        return 1
+
+    result = process_import_job(job)
+    logging.info(f"Import job {job_id} finished: {result['status']} ({job.imports_created} imports created)")
+    return 0 if result["status"] == "success" else 1
+
 import logging
 from datetime import datetime, timedelta
 
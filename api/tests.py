@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import tempfile
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+
+from api.facts import build_counter_facts, build_sales_facts, create_import_facts, refresh_branch_rollups, \
+    refresh_employee_stats
+from api.formulas.counter import generate_branch_report_conversion_rate, generate_branch_tasso_attrazione_report, \
+    generate_ingressi_branch_report, get_conversion_rate_single_date, get_number_ingressi_date_range, \
+    get_number_ingressi_single_date, get_tasso_attrazione_date_range, get_tasso_attrazione_single_date, \
+    get_traffico_esterno_date_range, get_traffico_esterno_single_date
+from api.formulas.receipts import generate_branch_report_scontrini, generate_report_performance_scontrini, \
+    get_scontrini_dipendente_date_range, get_scontrini_dipendente_single_date, get_total_scontrini_date_range, \
+    get_total_scontrini_single_date
+from api.formulas.report_engine import build_employee_matrix, compute_branch_metrics, employee_plane_report, \
+    employee_range_totals, load_branch_series
+from api.formulas.rollups import get_branch_totals_date_range, get_employee_totals_date_range, plan_rollup_range
+from api.formulas.sales import generate_branch_report_sales, generate_report_performance_sales, \
+    get_branch_single_day_sales, get_number_sales_performance_employee_date_range, \
+    get_number_sales_performance_single_date, get_sales_dipendente_single_date, get_total_sales_date_range, \
+    get_total_sales_dipendente, get_total_sales_single_date
+from api.import_data import SCHEMA_COLUMNAR, SCHEMA_ROWS, compact_records, expand_columns, import_records
+from api.importers import SALES_COLUMNS, iter_csv_rows, iter_upload_rows, process_import_job, store_imports, \
+    upload_format, validate_days
+from api.models import Branch, BranchDailyRollup, CounterFact, Employee, EmployeeStats, Import, ImportJob, SalesFact, \
+    Schedule, ScheduleEvent, Target
+from api.parsing import parse_amount, parse_column, parse_count, parse_decimal, parse_rate
+from api.report_cache import cached_json_response, invalidate_reports
+from api.request_cache import activate_request_cache, deactivate_request_cache, get_request_cache, request_cached
+from api.views.v2.dashboard import build_dashboard
+from api.views.v2.report_branch import build_branch_page
+from orario_creation import initialize_database, schema_lock
+from orario_creation.bridge import drop_roster_data, insert_roster_data
+from orario_creation.roster import start_planning
+from orario_creation.solver import solve_schedule
+
+
+def _employee(employee_id, **limits):
+    return {
+        'id': employee_id,
+        'max_hours_per_day': limits.get('max_hours_per_day', 8),
+        'max_services_per_week': limits.get('max_services_per_week', 0),
+        'max_hours_per_week': limits.get('max_hours_per_week', 0),
+        'max_hours_per_month': limits.get('max_hours_per_month', 0),
+    }
+
+
+class SolveScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.schedule_data = {
+            'employees': {str(employee_id): _employee(employee_id) for employee_id in (1, 2, 3, 4)},
+            'shifts_data': {
+                'M': {'start': '09:00', 'end': '13:00', 'minEmployees': 1},
+                'P': {'start': '13:00', 'end': '17:00', 'minEmployees': 2},
+            },
+            'particular_days': {},
+            'free_days': [],
+        }
+
+    def _assignments(self, services_data):
+        # [(date, shift, employee_id), ...]
+        return [
+            (date_str, service['service_name'], employee_id)
+            for date_str, services in services_data.items()
+            for service in services
+            for employee_id in service['employees']
+        ]
+
+    def test_required_services_covered_every_day(self):
+        self.schedule_data['particular_days'] = {'2025-08-05': [1, 'M']}
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 4), date(2025, 8, 10))
+
+        coverage = Counter((date_str, shift) for date_str, shift, _ in self._assignments(services_data))
+        for day in range(4, 11):
+            date_str = f"2025-08-{day:02d}"
+            self.assertEqual(coverage[(date_str, 'M')], 2 if date_str == '2025-08-05' else 1)
+            self.assertEqual(coverage[(date_str, 'P')], 2)
+
+    def test_no_double_booking(self):
+        self.schedule_data['shifts_data']['G'] = {'start': '10:00', 'end': '12:00', 'minEmployees': 1}
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 4), date(2025, 8, 10))
+
+        intervals = {'M': (9, 13), 'P': (13, 17), 'G': (10, 12)}
+        shifts_by_day = {}
+        for date_str, shift, employee_id in self._assignments(services_data):
+            shifts_by_day.setdefault((date_str, employee_id), []).append(intervals[shift])
+
+        for (date_str, employee_id), day_intervals in shifts_by_day.items():
+            day_intervals.sort()
+            for (_, end), (start, _) in zip(day_intervals, day_intervals[1:]):
+                self.assertLessEqual(end, start, f"employee {employee_id} double-booked on {date_str}")
+
+    def test_free_days_respected(self):
+        self.schedule_data['free_days'] = [
+            {'employee_id': 1, 'dates': ['2025-08-04', '2025-08-05']},
+            {'employee_id': '2', 'dates': ['2025-08-05']},
+            {'employee_id': 3, 'dates': None},
+        ]
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 4), date(2025, 8, 6))
+
+        assignments = self._assignments(services_data)
+        for date_str, _, employee_id in assignments:
+            self.assertNotIn((employee_id, date_str), {(1, '2025-08-04'), (1, '2025-08-05'), (2, '2025-08-05')})
+        # Still covered by the two employees left
+        self.assertEqual({employee_id for date_str, _, employee_id in assignments if date_str == '2025-08-05'}, {3, 4})
+        self.assertEqual(Counter(date_str for date_str, _, _ in assignments)['2025-08-05'], 3)
+
+    def test_date_range_inclusive(self):
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 30), date(2025, 9, 2))
+        self.assertEqual(sorted(services_data), ['2025-08-30', '2025-08-31', '2025-09-01', '2025-09-02'])
+
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 30), date(2025, 8, 30))
+        self.assertEqual(list(services_data), ['2025-08-30'])
+
+    def test_employee_limits_respected(self):
+        self.schedule_data['employees'] = {
+            '1': _employee(1, max_hours_per_day=4, max_services_per_week=2),
+            '2': _employee(2, max_hours_per_day=4),
+        }
+        self.schedule_data['shifts_data']['P']['minEmployees'] = 1
+        services_data = solve_schedule(self.schedule_data, date(2025, 8, 4), date(2025, 8, 10))
+
+        per_employee_day = Counter((employee_id, date_str) for date_str, _, employee_id in self._assignments(services_data))
+        self.assertTrue(all(count == 1 for count in per_employee_day.values()))
+        self.assertEqual(sum(count for (employee_id, _), count in per_employee_day.items() if employee_id == 1), 2)
+
+
+class ParseAmountTests(SimpleTestCase):
+    def test_italian_thousands_and_decimals(self):
+        self.assertEqual(parse_amount("1.234,56"), Decimal("1234.56"))
+        self.assertEqual(parse_amount("1.234.567,00"), Decimal("1234567.00"))
+        self.assertEqual(parse_amount("35,18"), Decimal("35.18"))
+
+    def test_dot_decimal_point(self):
+        self.assertEqual(parse_amount("1234.56"), Decimal("1234.56"))
+        self.assertEqual(parse_amount(" 8.00 "), Decimal("8.00"))
+
+    def test_numbers_and_empty_cells(self):
+        self.assertEqual(parse_amount(35.18), Decimal("35.18"))
+        self.assertEqual(parse_amount(12), Decimal("12"))
+        self.assertIsNone(parse_amount(None))
+        self.assertIsNone(parse_amount(""))
+
+
+class ParsingTests(SimpleTestCase):
+    def test_parse_decimal(self):
+        self.assertIs(parse_decimal, parse_amount)
+        self.assertEqual(parse_decimal("41,9"), Decimal("41.9"))
+        self.assertEqual(parse_decimal("2.96"), Decimal("2.96"))
+        self.assertEqual(parse_decimal("1.234,5"), Decimal("1234.5"))
+        self.assertEqual(parse_decimal(2.96), Decimal("2.96"))
+        self.assertIsNone(parse_decimal(""))
+
+    def test_parse_count(self):
+        self.assertEqual(parse_count("8.00"), 8)
+        self.assertEqual(parse_count("1.234,00"), 1234)
+        self.assertEqual(parse_count(" 12 "), 12)
+        self.assertEqual(parse_count(8.0), 8)
+        self.assertIsNone(parse_count(None))
+
+    def test_fractional_count_raises(self):
+        for value in ("8,5", "8.50", 8.5, Decimal("0.1")):
+            with self.assertRaises(InvalidOperation, msg=repr(value)):
+                parse_count(value)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("2,54"), Decimal("2.5400"))
+        self.assertEqual(parse_rate("2.54%"), Decimal("2.5400"))
+        self.assertEqual(parse_rate(2.54321), Decimal("2.5432"))
+        self.assertEqual(parse_rate(8), Decimal("8.0000"))
+        self.assertEqual(parse_rate(Decimal("6.67")), Decimal("6.6700"))
+        self.assertIsNone(parse_rate(""))
+
+    def test_garbage_raises(self):
+        for parser in (parse_amount, parse_decimal, parse_count, parse_rate):
+            with self.assertRaises(InvalidOperation):
+                parser("n/d")
+
+    def test_parse_column(self):
+        self.assertEqual(parse_column(parse_count, ["8.00", None, "n/d", 3]), [8, None, None, 3])
+        self.assertEqual(parse_column(parse_amount, ["35,18", "n/d"], invalid=lambda value: f"<{value}>"),
+                         [Decimal("35.18"), "<n/d>"])
+
+
+class ImportUploadTests(TestCase):
+    export = b"Dipendente;Data;Qta. Vend.;Sco.;Importo;Sco. Medio;Qta Media\n"
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+
+    def _upload(self):
+        upload = SimpleUploadedFile("export.csv", self.export)
+        return self.client.post(reverse('upload_import_data'), {'file': upload, 'branchId': self.branch.id, 'typeSelect': 0})
+
+    def test_job_clears_upload_when_it_fails(self):
+        job = ImportJob.objects.create(branch=self.branch, import_type="sales_data", upload=b"garbage")
+
+        with mock.patch('api.importers.run_import', side_effect=RuntimeError("boom")):
+            result = process_import_job(job)
+
+        self.assertEqual(result["status"], "error")
+        job = ImportJob.objects.get(id=job.id)
+        self.assertEqual(job.status, ImportJob.STATUS_ERROR)
+        self.assertIsNone(job.upload)
+
+    def test_job_reads_and_clears_upload_when_it_succeeds(self):
+        job = ImportJob.objects.create(branch=self.branch, import_type="sales_data", upload=self.export)
+
+        with mock.patch('api.importers.run_import', return_value={"status": "success", "errors": []}) as run_import:
+            process_import_job(ImportJob.objects.get(id=job.id))
+
+        self.assertEqual(run_import.call_args.args[2].read(), self.export)
+        job = ImportJob.objects.get(id=job.id)
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCESS)
+        self.assertIsNone(job.upload)
+
+    def test_view_reports_defer_failure(self):
+        with mock.patch('api.views.v2.imports.async_process_import.defer', side_effect=RuntimeError("queue down")):
+            response = self._upload()
+
+        self.assertEqual(response.json(), {"status": "error", "errors": ["Could not queue the import"]})
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, ImportJob.STATUS_ERROR)
+        self.assertIsNone(job.upload)
+
+    def test_view_reports_job_create_failure(self):
+        with mock.patch('api.views.v2.imports.ImportJob.objects.create', side_effect=RuntimeError("db down")):
+            response = self._upload()
+
+        self.assertEqual(response.json(), {"status": "error", "errors": ["Could not queue the import"]})
+
+    def test_view_queues_the_upload_for_the_worker(self):
+        with mock.patch('api.views.v2.imports.async_process_import.defer') as defer:
+            response = self._upload()
+
+        job = ImportJob.objects.get()
+        self.assertEqual(response.json()["jobId"], job.id)
+        defer.assert_called_once_with(job_id=job.id)
+        self.assertEqual(bytes(job.upload), self.export)
+
+
+class StartPlanningTests(SimpleTestCase):
+    def setUp(self):
+        self.schedule = mock.Mock(start_date="2025-08-01", end_date="2025-08-31")
+
+    def _session(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=200, raise_for_status=mock.Mock())
+        session.post.return_value = response
+        return session
+
+    def test_failed_autoplan_raises(self):
+        session = self._session(500)
+        with self.assertLogs('procrastinate', level='ERROR'):
+            with self.assertRaises(requests.HTTPError):
+                start_planning(session, 7, self.schedule)
+
+    def test_autoplan_posts_the_roster_range(self):
+        session = self._session(200)
+        start_planning(session, 7, self.schedule)
+
+        data = session.post.call_args.kwargs['data']
+        self.assertEqual(data, {"action": "autoplan_services", "roster": 7, "start_date": "2025-08-01", "end_date": "2025-08-31"})
+
+
+class _FakeMasterPlanDatabase:
+    """In-memory stand-in for the MasterPlan tables touched by orario_creation.bridge."""
+
+    # Column of the INSERT values the bridge reads the generated ids back with
+    KEY_COLUMNS = {"Role": 0, "User": 1}
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return _FakeMasterPlanCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class _FakeMasterPlanCursor:
+    def __init__(self, database):
+        self.database = database
+        self.lastrowid = None
+        self.result = []
+
+    def execute(self, query, params=()):
+        words = query.split()
+        if words[0] == "INSERT":
+            row_id = self.database.next_id
+            self.database.next_id += 1
+            self.database.rows.setdefault(words[2], {})[row_id] = tuple(params)
+            self.lastrowid = row_id
+        elif words[0] == "SELECT":
+            # SELECT id, {column} FROM {table} WHERE {column} IN (...)
+            table = words[4]
+            key_column = self.database.KEY_COLUMNS[table]
+            self.result = [(row_id, row[key_column]) for row_id, row in self.database.rows.get(table, {}).items()
+                           if row[key_column] in params]
+        elif words[0] == "DELETE":
+            # DELETE FROM {table} WHERE id IN (...)
+            for row_id in params:
+                self.database.rows.get(words[2], {}).pop(row_id, None)
+
+    def executemany(self, query, seq_params):
+        for params in seq_params:
+            self.execute(query, params)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class MasterPlanBridgeTests(SimpleTestCase):
+    def setUp(self):
+        self.database = _FakeMasterPlanDatabase()
+        self.employees = {str(employee_id): _employee(employee_id) for employee_id in (4, 9)}
+        self.services = [("M", 1, "2025-08-01", "2025-08-31", "09:00", "13:00")]
+
+    def test_insert_maps_employees_to_their_rows(self):
+        roster_data = insert_roster_data(self.database, "Roster 1", self.employees, self.services)
+
+        roles, users = self.database.rows["Role"], self.database.rows["User"]
+        self.assertEqual(set(roster_data["role_ids"]), {4, 9})
+        self.assertEqual(set(roster_data["user_ids"]), {4, 9})
+        for employee_id in (4, 9):
+            key = f"r{roster_data['roster_id']}_{employee_id}"
+            self.assertEqual(roles[roster_data["role_ids"][employee_id]][0], key)
+            # login is the roster key, firstname the employee id
+            self.assertEqual(users[roster_data["user_ids"][employee_id]][1:3], (key, employee_id))
+        self.assertIn((roster_data["user_ids"][9], roster_data["roster_id"]), self.database.rows["UserToRoster"].values())
+        self.assertIn((roster_data["user_ids"][4], roster_data["role_ids"][4]), self.database.rows["UserToRole"].values())
+        self.assertEqual(self.database.commits, 1)
+
+    def test_insert_rolls_back_on_failure(self):
+        cursor = _FakeMasterPlanCursor(self.database)
+        cursor.executemany = mock.Mock(side_effect=RuntimeError("lost connection"))
+        with mock.patch.object(self.database, "cursor", return_value=cursor):
+            with self.assertRaises(RuntimeError):
+                insert_roster_data(self.database, "Roster 1", self.employees, self.services)
+
+        self.assertEqual((self.database.commits, self.database.rollbacks), (0, 1))
+
+    def test_drop_only_removes_its_roster(self):
+        first = insert_roster_data(self.database, "Roster 1", self.employees, self.services)
+        second = insert_roster_data(self.database, "Roster 2", self.employees, self.services)
+
+        drop_roster_data(self.database, first)
+
+        self.assertEqual(set(self.database.rows["Roster"]), {second["roster_id"]})
+        self.assertEqual(set(self.database.rows["User"]), set(second["user_ids"].values()))
+        self.assertEqual(set(self.database.rows["Role"]), set(second["role_ids"].values()))
+
+
+class InitializeDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        self.conn = mock.Mock()
+        self.cursor = self.conn.cursor.return_value
+        # GET_LOCK, then RELEASE_LOCK
+        self.cursor.fetchone.side_effect = [(1,), (1,)]
+        for patcher in (
+            mock.patch('orario_creation.connections.mysql_connection', return_value=self.conn),
+            mock.patch('orario_creation.schema_script', return_value=("abc123", ["CREATE TABLE Roster (id INT)"])),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _executed(self):
+        return [call.args[0] for call in self.cursor.execute.call_args_list]
+
+    def test_matching_checksum_skips_the_build(self):
+        with mock.patch('orario_creation._template_checksum', return_value="abc123"), \
+                mock.patch('orario_creation._build_schema') as build_schema:
+            self.assertEqual(initialize_database(), (self.conn, self.cursor))
+
+        build_schema.assert_not_called()
+        self.assertEqual(self._executed(), ["SELECT GET_LOCK(%s, %s)", "SELECT RELEASE_LOCK(%s)"])
+
+    def test_changed_checksum_rebuilds_the_schema(self):
+        with mock.patch('orario_creation._template_checksum', return_value="old"), \
+                mock.patch('orario_creation._build_schema') as build_schema:
+            initialize_database()
+
+        build_schema.assert_called_once_with(self.conn, self.cursor, "abc123", ["CREATE TABLE Roster (id INT)"])
+        self.assertEqual(self._executed()[-1], "SELECT RELEASE_LOCK(%s)")
+
+    def test_lock_timeout_gives_the_connection_back(self):
+        self.cursor.fetchone.side_effect = [(0,)]
+        with mock.patch('orario_creation._build_schema') as build_schema:
+            with self.assertRaises(TimeoutError):
+                initialize_database()
+
+        build_schema.assert_not_called()
+        self.conn.close.assert_called_once_with()
+
+    def test_rebuild_refused_while_rosters_exist(self):
+        # GET_LOCK, the Roster table exists, 2 rosters, RELEASE_LOCK
+        self.cursor.fetchone.side_effect = [(1,), (1,), (2,), (1,)]
+        with mock.patch('orario_creation._template_checksum', return_value="old"):
+            with self.assertRaises(RuntimeError):
+                initialize_database()
+
+        self.assertFalse([query for query in self._executed() if query.startswith("DROP")])
+        self.assertEqual(self._executed()[-1], "SELECT RELEASE_LOCK(%s)")
+        self.conn.close.assert_called_once_with()
+
+    def test_schema_lock_released_on_errors(self):
+        with self.assertRaises(RuntimeError):
+            with schema_lock(self.cursor):
+                raise RuntimeError("insert failed")
+
+        self.assertEqual(self._executed(), ["SELECT GET_LOCK(%s, %s)", "SELECT RELEASE_LOCK(%s)"])
+
+
+SALES_HEADER = ["Dipendente", "Data", "Qta. Vend.", "Sco.", "Importo", "Sco. Medio", "Qta Media"]
+
+
+def _csv_export(rows, delimiter=";"):
+    return "\n".join(delimiter.join(str(value) for value in row) for row in [SALES_HEADER] + rows).encode("utf-8")
+
+
+def _xlsx_export(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in [SALES_HEADER] + rows:
+        sheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+class UploadReaderTests(SimpleTestCase):
+    rows = [[4, "01/08/2025", 8, 3, "1.234,56", "411,52", "2,67"], [9, "01/08/2025", 1, 1, "35,18", "35,18", "1,00"]]
+    expected = [(4, "01/08/2025", 8, 3, "1.234,56", "411,52", "2,67"), (9, "01/08/2025", 1, 1, "35,18", "35,18", "1,00")]
+
+    def test_upload_format(self):
+        self.assertEqual(upload_format(_xlsx_export(self.rows)), "xlsx")
+        self.assertEqual(upload_format(io.BytesIO(gzip.compress(_csv_export(self.rows)))), "csv.gz")
+        self.assertEqual(upload_format(io.BytesIO(_csv_export(self.rows))), "csv")
+
+    def test_upload_format_keeps_the_file_position(self):
+        upload = io.BytesIO(_csv_export(self.rows))
+        upload_format(upload)
+        self.assertEqual(upload.tell(), 0)
+
+    def test_csv_delimiter_sniffed_from_header(self):
+        for delimiter in (";", "\t"):
+            rows = list(iter_csv_rows(io.BytesIO(_csv_export(self.rows, delimiter)), SALES_COLUMNS))
+            self.assertEqual(rows, self.expected, repr(delimiter))
+
+        # Comma separated exports can't hold Italian amounts unquoted
+        comma_rows = [[4, "01/08/2025", 8, 3, "1234.56", "411.52", "2.67"]]
+        rows = list(iter_csv_rows(io.BytesIO(_csv_export(comma_rows, ",")), SALES_COLUMNS))
+        self.assertEqual(rows, [(4, "01/08/2025", 8, 3, "1234.56", "411.52", "2.67")])
+
+    def test_csv_rows_padded_and_blank_rows_skipped(self):
+        upload = io.BytesIO("\ufeff".encode("utf-8") + _csv_export([[4, "01/08/2025", 8], ["", "", ""]]))
+        self.assertEqual(list(iter_csv_rows(upload, SALES_COLUMNS)), [(4, "01/08/2025", 8, None, None, None, None)])
+
+    def test_every_format_streams_the_same_rows(self):
+        uploads = [
+            _xlsx_export(self.rows),
+            io.BytesIO(_csv_export(self.rows)),
+            io.BytesIO(gzip.compress(_csv_export(self.rows))),
+        ]
+        for upload in uploads:
+            self.assertEqual(list(iter_upload_rows(upload, SALES_COLUMNS)), self.expected)
+
+
+def _sales_record(employee_id, amount="100,00"):
+    return {"Dipendente": employee_id, "Qta. Vend.": 2, "Sco.": 1, "Importo": amount, "Sco. Medio": amount, "Qta Media": "2,00"}
+
+
+class ValidateDaysTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.other_branch = Branch.objects.create(name="Siderno", extra_data={"brand": "original"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        self.other_employee = Employee.objects.create(first_name="Vanessa", last_name="1", branch=self.other_branch)
+        Import.objects.create(import_date="2025-08-01", branch=self.branch, import_type="sales_data",
+                              data=[_sales_record(self.employee.id)])
+
+    def test_new_days_are_valid(self):
+        data_by_date = {"2025-08-02": [_sales_record(self.employee.id)], "2025-08-03": [_sales_record(str(self.employee.id))]}
+        self.assertEqual(validate_days(self.branch, "sales_data", data_by_date, check_employees=True), [])
+
+    def test_collisions_unless_replacing(self):
+        data_by_date = {"2025-08-01": [_sales_record(self.employee.id)], "2025-08-02": [_sales_record(self.employee.id)]}
+        self.assertEqual(validate_days(self.branch, "sales_data", data_by_date), ["Collision on 2025-08-01"])
+        self.assertEqual(validate_days(self.branch, "sales_data", data_by_date, replace=True), [])
+        # Other types and branches don't collide
+        self.assertEqual(validate_days(self.branch, "counter_data", data_by_date), [])
+        self.assertEqual(validate_days(self.other_branch, "sales_data", data_by_date), [])
+
+    def test_unknown_and_foreign_employees(self):
+        data_by_date = {
+            "2025-08-02": [_sales_record(self.employee.id), _sales_record(999)],
+            "2025-08-03": [_sales_record("Totale")],
+            "2025-08-04": [_sales_record(self.employee.id), _sales_record(self.other_employee.id)],
+        }
+        self.assertEqual(validate_days(self.branch, "sales_data", data_by_date, check_employees=True), [
+            "Employees on 2025-08-02 not found",
+            "Employees on 2025-08-03 not found",
+            "Branch on 2025-08-04 from different branch",
+        ])
+
+    def test_lookups_do_not_grow_with_the_days(self):
+        data_by_date = {f"2025-09-{day:02d}": [_sales_record(self.employee.id)] for day in range(1, 31)}
+        # One query for the imported dates, one for the employees
+        with self.assertNumQueries(2):
+            validate_days(self.branch, "sales_data", data_by_date, check_employees=True)
+
+
+class StoreImportsTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        store_imports(self.branch, "sales_data", {
+            "2025-08-01": [_sales_record(self.employee.id, "100,00")],
+            "2025-08-02": [_sales_record(self.employee.id, "50,00")],
+        })
+
+    def _amounts(self):
+        return dict(SalesFact.objects.filter(branch=self.branch).values_list('date', 'amount'))
+
+    def test_insert_stores_imports_and_facts(self):
+        self.assertEqual(Import.objects.filter(branch=self.branch).count(), 2)
+        self.assertEqual(self._amounts(), {date(2025, 8, 1): Decimal("100.00"), date(2025, 8, 2): Decimal("50.00")})
+        self.assertEqual(EmployeeStats.objects.get(employee=self.employee).total_sales, Decimal("150.00"))
+
+    def test_upsert_replaces_days_in_place(self):
+        import_id = Import.objects.get(import_date="2025-08-02").id
+        job = ImportJob.objects.create(branch=self.branch, import_type="sales_data", mode=ImportJob.MODE_UPSERT)
+
+        created, replaced = store_imports(self.branch, "sales_data", {
+            "2025-08-02": [_sales_record(self.employee.id, "75,00")],
+            "2025-08-03": [_sales_record(self.employee.id, "10,00")],
+        }, job=job, replace=True)
+
+        self.assertEqual((created, replaced), (1, 1))
+        self.assertEqual((job.imports_created, job.imports_replaced), (1, 1))
+        # Same row updated, its old facts replaced
+        self.assertEqual(Import.objects.get(import_date="2025-08-02").id, import_id)
+        self.assertEqual(Import.objects.filter(branch=self.branch).count(), 3)
+        self.assertEqual(self._amounts(), {
+            date(2025, 8, 1): Decimal("100.00"), date(2025, 8, 2): Decimal("75.00"), date(2025, 8, 3): Decimal("10.00"),
+        })
+        self.assertEqual(EmployeeStats.objects.get(employee=self.employee).total_sales, Decimal("185.00"))
+
+    @override_settings(IMPORT_DATA_COLUMNAR=True)
+    def test_upsert_stores_replaced_days_in_the_current_format(self):
+        store_imports(self.branch, "sales_data", {"2025-08-02": [_sales_record(self.employee.id, "75,00")]}, replace=True)
+
+        versions = dict(Import.objects.filter(branch=self.branch).values_list('import_date', 'schema_version'))
+        self.assertEqual(versions, {date(2025, 8, 1): SCHEMA_ROWS, date(2025, 8, 2): SCHEMA_COLUMNAR})
+        self.assertEqual(self._amounts()[date(2025, 8, 2)], Decimal("75.00"))
+
+
+class ColumnarImportDataTests(SimpleTestCase):
+    records = [
+        {"Dipendente": "4", "Qta. Vend.": "8.00", "Sco.": 3, "Importo": "1.234,56", "Sco. Medio": "411,52", "Qta Media": "2,67"},
+        {"Dipendente": 9, "Qta. Vend.": 1, "Sco.": "1,00", "Importo": "n/d", "Sco. Medio": 35.18, "Qta Media": None},
+    ]
+
+    def test_compact_parses_each_column(self):
+        self.assertEqual(compact_records(self.records), {
+            "Dipendente": [4, 9],
+            "Qta. Vend.": [8, 1],
+            "Sco.": [3, 1],
+            # Invalid cells are kept as uploaded for the facts builder to report
+            "Importo": [1234.56, "n/d"],
+            "Sco. Medio": [411.52, 35.18],
+            "Qta Media": [2.67, None],
+        })
+
+    def test_round_trip_keeps_records_and_facts(self):
+        rows_import = Import(id=1, import_date=date(2025, 8, 1), branch_id=1, data=self.records, schema_version=SCHEMA_ROWS)
+        columnar_import = Import(id=2, import_date=date(2025, 8, 1), branch_id=1, data=compact_records(self.records),
+                                 schema_version=SCHEMA_COLUMNAR)
+
+        expanded = import_records(columnar_import)
+        self.assertEqual(expanded, expand_columns(compact_records(self.records)))
+        self.assertEqual([list(record) for record in expanded], [list(record) for record in self.records])
+
+        def facts(import_obj):
+            return [(fact.employee_id, fact.qty, fact.receipts, fact.amount) for fact in build_sales_facts(import_obj, {4, 9})]
+
+        with self.assertLogs('procrastinate', level='WARNING'):
+            self.assertEqual(facts(rows_import), facts(columnar_import))
+
+    def test_compact_rejects_malformed_data(self):
+        self.assertIsNone(compact_records({"Dipendente": 4}))
+        self.assertIsNone(compact_records([{"Dipendente": 4}, "Totale"]))
+        self.assertEqual(expand_columns(compact_records([])), [])
+
+
+class CompactImportsCommandTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        store_imports(self.branch, "sales_data", {
+            "2025-08-01": [_sales_record(self.employee.id, "1.100,00")],
+            "2025-08-02": [_sales_record(self.employee.id, "50,00")],
+        })
+        store_imports(self.branch, "counter_data", {
+            "2025-08-01": [{"(Ing) Ingressi": 120, "(Est) Traffico Esterno": "1.500,00", "(TA) Tasso di Attrazione": "8,00"}],
+        })
+        self.malformed = Import.objects.create(import_date="2025-08-03", branch=self.branch, import_type="sales_data",
+                                               data={"unexpected": True})
+
+    def _call(self, *args):
+        with redirect_stdout(io.StringIO()):
+            call_command('compact_imports', *args)
+
+    def _versions(self):
+        return dict(Import.objects.values_list('id', 'schema_version'))
+
+    def test_compacts_and_expands_back(self):
+        original = {import_obj.id: import_obj.data for import_obj in Import.objects.all()}
+
+        self._call('--batch-size', '1')
+        versions = self._versions()
+        self.assertEqual(versions.pop(self.malformed.id), SCHEMA_ROWS)
+        self.assertEqual(set(versions.values()), {SCHEMA_COLUMNAR})
+        sales_import = Import.objects.get(import_type="sales_data", import_date="2025-08-01")
+        self.assertEqual(sales_import.data["Importo"], [1100.0])
+        self.assertEqual(import_records(sales_import)[0]["Dipendente"], self.employee.id)
+
+        self._call('--expand')
+        self.assertEqual(set(self._versions().values()), {SCHEMA_ROWS})
+        for import_obj in Import.objects.exclude(id=self.malformed.id):
+            self.assertEqual([list(record) for record in import_obj.data],
+                             [list(record) for record in original[import_obj.id]])
+        self.assertEqual(Import.objects.get(id=self.malformed.id).data, {"unexpected": True})
+
+    def test_filters(self):
+        self._call('--type', 'counter_data')
+        self.assertEqual(set(Import.objects.filter(import_type="sales_data").values_list('schema_version', flat=True)),
+                         {SCHEMA_ROWS})
+        self.assertEqual(Import.objects.get(import_type="counter_data").schema_version, SCHEMA_COLUMNAR)
+
+        self._call('--branch', str(self.branch.id + 1))
+        self.assertEqual(set(Import.objects.filter(import_type="sales_data").values_list('schema_version', flat=True)),
+                         {SCHEMA_ROWS})
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        self.builds = Counter()
+
+    def _report(self, start_date, end_date, chart=None):
+        def build():
+            self.builds[(start_date, end_date, chart)] += 1
+            return JsonResponse({"builds": self.builds[(start_date, end_date, chart)]})
+
+        response = cached_json_response("test_report", self.branch.id, start_date, end_date, chart, build)
+        return json.loads(response.content)["builds"]
+
+    def test_hit(self):
+        self.assertEqual(self._report("2025-08-01", "2025-08-31"), 1)
+        self.assertEqual(self._report("2025-08-01", "2025-08-31"), 1)
+        # Other charts and ranges are other entries
+        self.assertEqual(self._report("2025-08-01", "2025-08-31", 1), 1)
+        self.assertEqual(self.builds[("2025-08-01", "2025-08-31", None)], 1)
+
+    def test_errors_and_invalid_ranges_not_cached(self):
+        def build():
+            self.builds["error"] += 1
+            return JsonResponse({"status": "error"}, status=400)
+
+        for _ in range(2):
+            cached_json_response("test_report", self.branch.id, "2025-08-01", "2025-08-31", None, build)
+            cached_json_response("test_report", self.branch.id, "not a date", "2025-08-31", None, build)
+        self.assertEqual(self.builds["error"], 4)
+
+    def test_import_evicts_only_the_ranges_containing_it(self):
+        self._report("2025-07-01", "2025-08-31")
+        self._report("2025-08-10", "2025-08-12")
+        self._report("2024-01-01", "2024-12-31")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            store_imports(self.branch, "sales_data", {"2025-08-20": [_sales_record(self.employee.id)]})
+
+        self.assertEqual(self._report("2025-07-01", "2025-08-31"), 2)
+        # Same month: evicted too, months are the invalidation unit
+        self.assertEqual(self._report("2025-08-10", "2025-08-12"), 2)
+        self.assertEqual(self._report("2024-01-01", "2024-12-31"), 1)
+
+    def test_other_branches_untouched(self):
+        other_branch = Branch.objects.create(name="Siderno", extra_data={"brand": "original"})
+        cached_json_response("test_report", other_branch.id, "2025-08-01", "2025-08-31", None,
+                             lambda: JsonResponse({"builds": 1}))
+
+        invalidate_reports(self.branch.id, {date(2025, 8, 20)})
+
+        response = cached_json_response("test_report", other_branch.id, "2025-08-01", "2025-08-31", None,
+                                        lambda: JsonResponse({"builds": 2}))
+        self.assertEqual(json.loads(response.content)["builds"], 1)
+
+    def test_target_edit_evicts_the_branch(self):
+        Target.objects.create(branch=self.branch, start_date="2025-08-01", end_date="2025-08-31", sales_target=1000)
+        self._report("2024-01-01", "2024-12-31")
+
+        response = self.client.post(reverse('target_grid'), json.dumps({"branchId": self.branch.id, "targetValue": 2000}),
+                                    content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._report("2024-01-01", "2024-12-31"), 2)
+
+    def test_employee_edit_evicts_the_branch(self):
+        self._report("2024-01-01", "2024-12-31")
+        employee_info = {"name": "Elisa", "surname": "2", "genre": 0, "role": 0, "class": 0, "contract": 0,
+                         "contractStart": "", "contractEnd": "", "telNumber": "", "email": "", "birthDate": "",
+                         "monthlyHour": 160, "hourlyCost": 10.0}
+
+        response = self.client.post(reverse('UPDATE_EMPLOYEE', args=[self.branch.id, self.employee.id]),
+                                    json.dumps({"employeeInfo": employee_info}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._report("2024-01-01", "2024-12-31"), 2)
+
+
+class PlanRollupRangeTests(SimpleTestCase):
+    def test_empty_and_single_day(self):
+        self.assertEqual(plan_rollup_range(date(2025, 8, 2), date(2025, 8, 1)), [])
+        self.assertEqual(plan_rollup_range(date(2025, 8, 1), date(2025, 8, 1)), [("day", date(2025, 8, 1), date(2025, 8, 1))])
+
+    def test_whole_buckets(self):
+        self.assertEqual(plan_rollup_range(date(2024, 1, 1), date(2024, 12, 31)), [("year", date(2024, 1, 1), date(2024, 12, 31))])
+        # Leap February
+        self.assertEqual(plan_rollup_range(date(2024, 2, 1), date(2024, 2, 29)), [("month", date(2024, 2, 1), date(2024, 2, 29))])
+        self.assertEqual(plan_rollup_range(date(2025, 8, 4), date(2025, 8, 10)), [("week", date(2025, 8, 4), date(2025, 8, 10))])
+
+    def test_edges_use_finer_periods(self):
+        self.assertEqual(plan_rollup_range(date(2025, 7, 28), date(2025, 9, 10)), [
+            ("day", date(2025, 7, 28), date(2025, 7, 31)),  # The week of 07-28 ends in August
+            ("month", date(2025, 8, 1), date(2025, 8, 31)),
+            ("week", date(2025, 9, 1), date(2025, 9, 7)),
+            ("day", date(2025, 9, 8), date(2025, 9, 10)),
+        ])
+        # Weeks crossing the new year don't fit the edges of a yearly bucket
+        self.assertEqual(plan_rollup_range(date(2024, 12, 30), date(2026, 1, 4)), [
+            ("day", date(2024, 12, 30), date(2024, 12, 31)),
+            ("year", date(2025, 1, 1), date(2025, 12, 31)),
+            ("day", date(2026, 1, 1), date(2026, 1, 4)),
+        ])
+
+    def test_segments_tile_the_range(self):
+        for start_date, end_date in [(date(2023, 3, 17), date(2025, 11, 2)), (date(2025, 1, 31), date(2025, 3, 1)),
+                                     (date(2024, 2, 26), date(2024, 3, 3)), (date(2025, 12, 29), date(2026, 2, 1))]:
+            plan = plan_rollup_range(start_date, end_date)
+            self.assertEqual(plan[0][1], start_date)
+            self.assertEqual(plan[-1][2], end_date)
+            for (_, _, previous_end), (_, next_start, _) in zip(plan, plan[1:]):
+                self.assertEqual(next_start, previous_end + timedelta(days=1))
+
+
+def _counter_record(entrances):
+    return {"(Ing) Ingressi": entrances, "(Est) Traffico Esterno": entrances * 10, "(TA) Tasso di Attrazione": "10,00%"}
+
+
+class RollupTotalsTests(TestCase):
+    ranges = [
+        ("2024-12-30", "2025-02-03"),
+        ("2025-01-01", "2025-01-31"),
+        ("2024-01-01", "2025-12-31"),
+        ("2025-01-06", "2025-01-19"),
+        ("2025-01-13", "2025-01-19"),
+        ("2025-01-15", "2025-01-15"),
+    ]
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.elisa = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        self.vanessa = Employee.objects.create(first_name="Vanessa", last_name="1", branch=self.branch)
+        sales_days, counter_days = {}, {}
+        for index, day in enumerate(["2024-12-30", "2024-12-31", "2025-01-01", "2025-01-15", "2025-01-31",
+                                     "2025-02-01", "2025-02-03"]):
+            sales_days[day] = [_sales_record(self.elisa.id, f"{100 + index},50")]
+            counter_days[day] = [_counter_record(40 + index)]
+        # Vanessa only works in the week of 01-13
+        sales_days["2025-01-15"].append(_sales_record(self.vanessa.id, "80,25"))
+        store_imports(self.branch, "sales_data", sales_days)
+        store_imports(self.branch, "counter_data", counter_days)
+
+    def _assert_totals_match_facts(self):
+        for start_date, end_date in self.ranges:
+            with self.subTest(start_date=start_date, end_date=end_date):
+                sales = SalesFact.objects.filter(branch=self.branch, date__range=(start_date, end_date))
+                expected = sales.aggregate(sales=Sum('amount'), receipts=Sum('receipts'))
+                expected["entrances"] = CounterFact.objects.filter(
+                    branch=self.branch, date__range=(start_date, end_date)).aggregate(entrances=Sum('entrances'))["entrances"]
+                self.assertEqual(get_branch_totals_date_range(self.branch.id, start_date, end_date), {
+                    "sales": expected["sales"] or Decimal("0.00"),
+                    "receipts": expected["receipts"] or 0,
+                    "entrances": expected["entrances"] or 0,
+                })
+
+                expected_employees = {
+                    row['employee_id']: {"sales": row['sales'], "receipts": row['receipts'], "qty": row['qty'],
+                                         "working_days": row['working_days']}
+                    for row in sales.values('employee_id').annotate(
+                        sales=Sum('amount'), receipts=Sum('receipts'), qty=Sum('qty'),
+                        working_days=Count('date', distinct=True))
+                }
+                self.assertEqual(get_employee_totals_date_range(self.branch.id, start_date, end_date), expected_employees)
+
+    def test_totals_after_insert(self):
+        self._assert_totals_match_facts()
+        # Hand-computed: 100,50 + 101,50 on 2024-12-30/31, one receipt on each of the 7 days
+        self.assertEqual(get_branch_totals_date_range(self.branch.id, "2024-12-30", "2024-12-31")["sales"], Decimal("202.00"))
+        self.assertEqual(get_employee_totals_date_range(self.branch.id, "2024-12-30", "2025-02-03")[self.elisa.id]["receipts"], 7)
+
+    def test_totals_after_upsert(self):
+        store_imports(self.branch, "sales_data", {
+            "2025-01-15": [_sales_record(self.elisa.id, "10,00")],
+            "2025-02-04": [_sales_record(self.elisa.id, "20,00")],
+        }, replace=True)
+        store_imports(self.branch, "counter_data", {"2025-01-15": [_counter_record(5)]}, replace=True)
+
+        self._assert_totals_match_facts()
+        # Vanessa's only day was replaced: her weekly/monthly/yearly rows are gone with it
+        self.assertNotIn(self.vanessa.id, get_employee_totals_date_range(self.branch.id, "2024-01-01", "2025-12-31"))
+        self.assertEqual(get_branch_totals_date_range(self.branch.id, "2025-01-13", "2025-01-19"),
+                         {"sales": Decimal("10.00"), "receipts": 1, "entrances": 5})
+
+
+class _FactFixtureTestCase(TestCase):
+    # Two days of raw Import.data the way the exports store it (Italian and dotted numbers, workbook ints,
+    # an unknown employee and a garbage cell), turned into facts by create_import_facts
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.elisa = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        self.vanessa = Employee.objects.create(first_name="Vanessa", last_name="1", branch=self.branch)
+        imports = [
+            Import.objects.create(import_date="2025-03-03", branch=self.branch, import_type="sales_data", data=[
+                {"Dipendente": self.elisa.id, "Qta. Vend.": "3.00", "Sco.": "2.00", "Importo": "1.234,56"},
+                {"Dipendente": str(self.vanessa.id), "Qta. Vend.": 1, "Sco.": 1, "Importo": "45,50"},
+            ]),
+            Import.objects.create(import_date="2025-03-04", branch=self.branch, import_type="sales_data", data=[
+                {"Dipendente": self.elisa.id, "Qta. Vend.": "2,00", "Sco.": "1", "Importo": "99.90"},
+                {"Dipendente": 999, "Qta. Vend.": "1", "Sco.": "1", "Importo": "10,00"},
+                {"Dipendente": self.vanessa.id, "Qta. Vend.": "4", "Sco.": "2", "Importo": "n/d"},
+            ]),
+            Import.objects.create(import_date="2025-03-03", branch=self.branch, import_type="counter_data", data=[
+                {"(Ing) Ingressi": "120", "(Est) Traffico Esterno": "1.500,00", "(TA) Tasso di Attrazione": "8,00%"},
+            ]),
+            Import.objects.create(import_date="2025-03-04", branch=self.branch, import_type="counter_data", data=[
+                {"(Ing) Ingressi": 40, "(Est) Traffico Esterno": 600, "(TA) Tasso di Attrazione": "6,67"},
+            ]),
+        ]
+        with self.assertLogs('procrastinate', level='WARNING') as logs:
+            create_import_facts(imports)
+        self.warnings = logs.output
+
+
+class SalesFactTests(_FactFixtureTestCase):
+    def test_cells_parsed_into_facts(self):
+        facts = SalesFact.objects.filter(branch=self.branch).order_by('date', 'id')
+        self.assertEqual([(fact.date, fact.employee_id, fact.qty, fact.receipts, fact.amount) for fact in facts], [
+            (date(2025, 3, 3), self.elisa.id, 3, 2, Decimal("1234.56")),
+            (date(2025, 3, 3), self.vanessa.id, 1, 1, Decimal("45.50")),
+            (date(2025, 3, 4), self.elisa.id, 2, 1, Decimal("99.90")),
+            (date(2025, 3, 4), None, 1, 1, Decimal("10.00")),  # Unknown employee kept in the branch totals
+            (date(2025, 3, 4), self.vanessa.id, 4, 2, Decimal("0.00")),  # Garbage amount skipped
+        ])
+        self.assertEqual(len(self.warnings), 1)
+        self.assertIn("Invalid 'Importo' value 'n/d'", self.warnings[0])
+
+    def test_fractional_count_reported(self):
+        import_obj = Import(import_date="2025-03-05", branch=self.branch, import_type="sales_data",
+                            data=[{"Dipendente": self.elisa.id, "Qta. Vend.": "2", "Sco.": "1,5", "Importo": "10,00"}])
+        with self.assertLogs('procrastinate', level='WARNING') as logs:
+            facts = build_sales_facts(import_obj, {self.elisa.id})
+        self.assertEqual((facts[0].qty, facts[0].receipts), (2, 0))
+        self.assertIn("Invalid 'Sco.' value '1,5'", logs.output[0])
+
+    def test_malformed_import_has_no_facts(self):
+        import_obj = Import(import_date="2025-03-05", branch=self.branch, import_type="sales_data", data={"Dipendente": 1})
+        with self.assertLogs('procrastinate', level='WARNING'):
+            self.assertEqual(build_sales_facts(import_obj, {self.elisa.id}), [])
+
+    def test_branch_aggregates(self):
+        self.assertEqual(get_total_sales_date_range(self.branch.id, "2025-03-01", "2025-03-31"), Decimal("1389.96"))
+        self.assertEqual(get_total_sales_single_date(self.branch.id, "2025-03-03"), Decimal("1280.06"))
+        self.assertEqual(get_branch_single_day_sales(self.branch.id, "2025-03-04"), Decimal("109.90"))
+        self.assertEqual(generate_branch_report_sales(self.branch.id, "2025-03-02", "2025-03-04"), {
+            "2025-03-02": Decimal("0.00"), "2025-03-03": Decimal("1280.06"), "2025-03-04": Decimal("109.90"),
+        })
+        self.assertEqual(get_total_scontrini_date_range(self.branch.id, "2025-03-01", "2025-03-31"), 7)
+        self.assertEqual(get_total_scontrini_single_date(self.branch.id, "2025-03-04"), 4.0)
+        self.assertEqual(generate_branch_report_scontrini(self.branch.id, "2025-03-02", "2025-03-04"),
+                         {"2025-03-02": 0.0, "2025-03-03": 3.0, "2025-03-04": 4.0})
+
+    def test_employee_aggregates(self):
+        self.assertEqual(get_sales_dipendente_single_date(self.elisa.id, "2025-03-03"), 1234.56)
+        self.assertEqual(get_total_sales_dipendente(self.elisa.id), 1334.46)
+        self.assertEqual(get_scontrini_dipendente_single_date(self.vanessa.id, "2025-03-04"), 2.0)
+        self.assertEqual(get_scontrini_dipendente_date_range(self.elisa.id, "2025-03-01", "2025-03-31"), 3.0)
+        self.assertEqual(get_scontrini_dipendente_date_range(self.vanessa.id, None, None), 3.0)
+        self.assertEqual(get_number_sales_performance_single_date(self.elisa.id, "2025-03-04"), 2)
+        self.assertEqual(get_number_sales_performance_employee_date_range(self.vanessa.id, "2025-03-01", "2025-03-31"), 5)
+        self.assertEqual(generate_report_performance_sales(self.branch.id, "2025-03-03", "2025-03-04"), {
+            f"({self.elisa.id}) Elisa 1": [1234.56, 99.9], f"({self.vanessa.id}) Vanessa 1": [45.5, 0.0],
+        })
+        self.assertEqual(generate_report_performance_scontrini(self.branch.id, "2025-03-03", "2025-03-04"), {
+            f"({self.elisa.id}) Elisa 1": [2.0, 1.0], f"({self.vanessa.id}) Vanessa 1": [1.0, 2.0],
+        })
+
+
+class CounterFactTests(_FactFixtureTestCase):
+    def test_cells_parsed_into_facts(self):
+        facts = CounterFact.objects.filter(branch=self.branch).order_by('date')
+        self.assertEqual([(fact.date, fact.entrances, fact.external_traffic, fact.attraction_rate) for fact in facts], [
+            (date(2025, 3, 3), 120, 1500, Decimal("8.0000")),
+            (date(2025, 3, 4), 40, 600, Decimal("6.6700")),
+        ])
+
+    def test_malformed_import_has_no_facts(self):
+        import_obj = Import(import_date="2025-03-05", branch=self.branch, import_type="counter_data", data=[])
+        with self.assertLogs('procrastinate', level='WARNING'):
+            self.assertEqual(build_counter_facts(import_obj), [])
+
+    def test_aggregates(self):
+        self.assertEqual(get_number_ingressi_single_date(self.branch.id, "2025-03-03"), 120)
+        self.assertEqual(get_traffico_esterno_single_date(self.branch.id, "2025-03-04"), 600)
+        self.assertEqual(get_tasso_attrazione_single_date(self.branch.id, "2025-03-03"), 8.0)
+        self.assertEqual(get_number_ingressi_date_range(self.branch.id, "2025-03-01", "2025-03-31"), 160)
+        self.assertEqual(get_traffico_esterno_date_range(self.branch.id, "2025-03-01", "2025-03-31"), 2100)
+        self.assertAlmostEqual(get_tasso_attrazione_date_range(self.branch.id, "2025-03-01", "2025-03-31"), 7.335)
+        self.assertEqual(get_number_ingressi_single_date(self.branch.id, "2025-03-05"), 0)
+
+    def test_daily_reports(self):
+        self.assertEqual(generate_ingressi_branch_report(self.branch.id, "2025-03-02", "2025-03-04"),
+                         {"2025-03-02": 0, "2025-03-03": 120, "2025-03-04": 40})
+        self.assertEqual(generate_branch_tasso_attrazione_report(self.branch.id, "2025-03-03", "2025-03-04"),
+                         {"2025-03-03": 8.0, "2025-03-04": 6.67})
+        # Receipts over entrances: 3 / 120 and 4 / 40
+        self.assertEqual(generate_branch_report_conversion_rate(self.branch.id, "2025-03-03", "2025-03-04"),
+                         {"2025-03-03": 2.5, "2025-03-04": 10.0})
+        self.assertEqual(get_conversion_rate_single_date(self.branch.id, "2025-03-04"), 10.0)
+
+
+class EmployeeStatsTests(_FactFixtureTestCase):
+    def _stats(self, employee):
+        stats = EmployeeStats.objects.get(employee=employee)
+        return (stats.working_days, stats.total_receipts, stats.total_sales, stats.total_qty,
+                stats.medium_receipts_number, stats.medium_sales)
+
+    def test_stats_built_with_the_facts(self):
+        # 1.234,56 + 99,90 over 2 days, 2 + 1 receipts
+        self.assertEqual(self._stats(self.elisa), (2, 3, Decimal("1334.46"), 5, 1, 667.23))
+        # The garbage amount counts as a working day with 0 sales
+        self.assertEqual(self._stats(self.vanessa), (2, 3, Decimal("45.50"), 5, 1, 22.75))
+
+    def test_refresh_zeroes_employees_without_facts(self):
+        cristina = Employee.objects.create(first_name="Cristina", last_name="1", branch=self.branch)
+        SalesFact.objects.filter(employee=self.vanessa).delete()
+
+        self.assertEqual(refresh_employee_stats([self.vanessa.id, cristina.id]), 2)
+
+        self.assertEqual(self._stats(self.vanessa), (0, 0, Decimal("0.00"), 0, 0, 0.0))
+        self.assertEqual(self._stats(cristina), (0, 0, Decimal("0.00"), 0, 0, 0.0))
+        self.assertEqual(self._stats(self.elisa)[0], 2)
+
+    def test_schedule_settings_read_the_stats(self):
+        Employee.objects.create(first_name="Cristina", last_name="1", branch=self.branch)  # No stats row yet
+        schedule = Schedule.objects.create(
+            branch=self.branch, title="Settimana 11", start_date="2025-03-10", end_date="2025-03-16",
+            shifts_data=[{"id": 1, "name": "Mattina", "start": "09:00", "end": "13:00", "minEmployees": 2, "color": "#fff"}],
+        )
+
+        # One query for the employees and their stats, whatever their number
+        with self.assertNumQueries(1):
+            settings = schedule.get_settings()
+
+        self.assertEqual([(row['fullName'], row['mediumReceiptsNumber'], row['mediumReceiptSale'])
+                          for row in settings['employees']],
+                         [("Elisa 1", 1, 667.23), ("Vanessa 1", 1, 22.75), ("Cristina 1", 0, 0.0)])
+        self.assertEqual(settings['savedShift'],
+                         [{"id": 1, "name": "Mattina", "start": "09:00", "end": "13:00", "minEmployees": 2}])
+
+
+class BranchDailyRollupTests(_FactFixtureTestCase):
+    def _rollups(self):
+        return {rollup.date: (rollup.sales, rollup.receipts, rollup.entrances, rollup.conversion_rate)
+                for rollup in BranchDailyRollup.objects.filter(branch=self.branch)}
+
+    def test_rollups_built_with_the_facts(self):
+        # Receipts over entrances: 3 / 120 and 4 / 40
+        self.assertEqual(self._rollups(), {
+            date(2025, 3, 3): (Decimal("1280.06"), 3, 120, 2.5),
+            date(2025, 3, 4): (Decimal("109.90"), 4, 40, 10.0),
+        })
+
+    def test_refresh_only_touches_the_given_days(self):
+        CounterFact.objects.filter(branch=self.branch).delete()
+
+        self.assertEqual(refresh_branch_rollups({(self.branch.id, date(2025, 3, 4))}), 1)
+
+        self.assertEqual(self._rollups(), {
+            date(2025, 3, 3): (Decimal("1280.06"), 3, 120, 2.5),
+            date(2025, 3, 4): (Decimal("109.90"), 4, 0, 0.0),  # No entrances, no conversion rate
+        })
+
+    def test_dashboard_reads_the_rollups(self):
+        Target.objects.create(branch=self.branch, start_date="2025-03-01", end_date="2025-03-31", sales_target=2000)
+
+        response = build_dashboard(self.branch.id, "2025-02-26", "2025-03-01", "2025-03-04")
+
+        metrics = json.loads(response.content)["metrics"]
+        self.assertEqual((metrics["totalReceipts"], metrics["incomes"], metrics["peopleCount"]), (7, "1389.96", 160))
+        # 1.389,96 of 2.000
+        self.assertEqual(metrics["monthlyTarget"]["reachedIncomePercentage"], 69.5)
+
+
+class BranchSeriesTests(_FactFixtureTestCase):
+    days = ["2025-03-02", "2025-03-03", "2025-03-04", "2025-03-05"]
+
+    def test_series_match_the_per_day_lookups(self):
+        series = load_branch_series(self.branch.id, self.days[0], self.days[-1])
+
+        self.assertEqual(series["labels"], self.days)
+        # The {date: value} reports the per-day loops used to build
+        per_day = {
+            "sales": {day: get_total_sales_single_date(self.branch.id, day) for day in self.days},
+            "receipts": {day: get_total_scontrini_single_date(self.branch.id, day) for day in self.days},
+            "entrances": {day: get_number_ingressi_single_date(self.branch.id, day) for day in self.days},
+            "external_traffic": {day: get_traffico_esterno_single_date(self.branch.id, day) for day in self.days},
+            "attraction_rate": {day: get_tasso_attrazione_single_date(self.branch.id, day) for day in self.days},
+        }
+        for name, report in per_day.items():
+            self.assertEqual(dict(zip(series["labels"], series[name])), report, name)
+        self.assertEqual(series["sales"], [Decimal("0.00"), Decimal("1280.06"), Decimal("109.90"), Decimal("0.00")])
+
+    def test_one_query_per_fact_table(self):
+        # The branch, then the sales and counter facts of the whole range
+        with self.assertNumQueries(3):
+            load_branch_series(self.branch.id, "2025-01-01", "2025-12-31")
+        with self.assertNumQueries(2):
+            series = load_branch_series(self.branch.id, "2025-01-01", "2025-12-31", sales=False)
+        self.assertNotIn("sales", series)
+        self.assertEqual(len(series["entrances"]), 365)
+
+    def test_invalid_input(self):
+        with redirect_stdout(io.StringIO()):
+            self.assertIsNone(load_branch_series(self.branch.id + 100, "2025-03-01", "2025-03-31"))
+            self.assertIsNone(load_branch_series(self.branch.id, "2025-03-31", "2025-03-01"))
+            self.assertIsNone(load_branch_series(self.branch.id, "03/01/2025", "2025-03-31"))
+
+
+class BranchMetricsTests(_FactFixtureTestCase):
+    def test_metrics_match_the_per_day_reports(self):
+        metrics = compute_branch_metrics(self.branch.id, "2025-03-02", "2025-03-04")
+
+        self.assertEqual(dict(zip(metrics["labels"], metrics["receipts"])),
+                         generate_branch_report_scontrini(self.branch.id, "2025-03-02", "2025-03-04"))
+        self.assertEqual(dict(zip(metrics["labels"], metrics["sales"])),
+                         generate_branch_report_sales(self.branch.id, "2025-03-02", "2025-03-04"))
+        self.assertEqual(dict(zip(metrics["labels"], metrics["external_traffic"])),
+                         {day: get_traffico_esterno_single_date(self.branch.id, day) for day in metrics["labels"]})
+        self.assertEqual(metrics["entrances"], [0, 120, 40])
+        self.assertEqual(metrics["conversion_rate"], [0.0, 2.5, 10.0])
+
+    def test_only_the_needed_fact_tables_are_read(self):
+        for metrics, queries in [(["entrances"], 2), (["sales", "receipts"], 2), (["conversion_rate"], 3),
+                                 (["sales", "receipts", "entrances", "conversion_rate"], 3)]:
+            with self.subTest(metrics=metrics), self.assertNumQueries(queries):
+                result = compute_branch_metrics(self.branch.id, "2025-01-01", "2025-12-31", metrics)
+            self.assertEqual(set(result), {"labels", *metrics})
+
+    def test_unknown_metric(self):
+        with redirect_stdout(io.StringIO()):
+            self.assertIsNone(compute_branch_metrics(self.branch.id, "2025-03-01", "2025-03-31", ["sales", "margin"]))
+
+    def test_branch_page_in_one_pass(self):
+        with self.assertNumQueries(3):
+            response = build_branch_page(self.branch, None, "2025-03-03", "2025-03-04")
+
+        data = json.loads(response.content)["data"]
+        self.assertEqual(data["sales"], {"series": [{"name": "Incassi", "data": ["1280.06", "109.90"]}],
+                                         "labels": ["2025-03-03", "2025-03-04"]})
+        self.assertEqual(data["entrances"]["series"], [{"name": "Ingressi", "data": [120, 40]},
+                                                       {"name": "Tasso di Conversione", "data": [2.5, 10.0]}])
+
+
+class EmployeeMatrixTests(_FactFixtureTestCase):
+    def test_matrix_matches_the_per_day_lookups(self):
+        matrix = build_employee_matrix(self.branch.id, "2025-03-02", "2025-03-04")
+
+        self.assertEqual(matrix["employees"], [f"({self.elisa.id}) Elisa 1", f"({self.vanessa.id}) Vanessa 1"])
+        self.assertEqual(matrix["employee_ids"], [self.elisa.id, self.vanessa.id])
+        lookups = {"sales": get_sales_dipendente_single_date, "receipts": get_scontrini_dipendente_single_date,
+                   "qty": get_number_sales_performance_single_date}
+        for plane, lookup in lookups.items():
+            for row, employee_id in enumerate(matrix["employee_ids"]):
+                self.assertEqual(matrix[plane][row], [lookup(employee_id, day) for day in matrix["labels"]], plane)
+        # The unknown employee of 03-04 is in no row
+        self.assertEqual(matrix["receipts"], [[0.0, 2.0, 1.0], [0.0, 1.0, 2.0]])
+
+    def test_one_query_for_every_employee_and_day(self):
+        for _ in range(10):
+            Employee.objects.create(first_name="Extra", last_name="1", branch=self.branch)
+
+        # The branch, its employees, then the grouped facts
+        with self.assertNumQueries(3):
+            matrix = build_employee_matrix(self.branch.id, "2025-01-01", "2025-12-31")
+        self.assertEqual((len(matrix["employees"]), len(matrix["labels"])), (12, 365))
+
+    def test_range_totals_follow_the_matrix_rows(self):
+        self.assertEqual(employee_range_totals(self.branch.id, "2025-03-01", "2025-03-31"), {
+            f"({self.elisa.id}) Elisa 1": {"sales": 1334.46, "receipts": 3.0, "qty": 5},
+            f"({self.vanessa.id}) Vanessa 1": {"sales": 45.5, "receipts": 3.0, "qty": 5},
+        })
+
+    def test_branch_without_employees(self):
+        other_branch = Branch.objects.create(name="Siderno", extra_data={"brand": "original"})
+        with redirect_stdout(io.StringIO()):
+            self.assertIsNone(build_employee_matrix(other_branch.id, "2025-03-01", "2025-03-31"))
+        self.assertEqual(employee_plane_report(None, "sales"), {})
+
+
+
+class RequestCacheTests(_FactFixtureTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+        @request_cached
+        def lookup(*args, **kwargs):
+            self.calls.append((args, kwargs))
+            return len(self.calls)
+
+        self.lookup = lookup
+
+    def test_memoized_only_inside_an_active_cache(self):
+        self.lookup(1)
+        self.lookup(1)
+        self.assertEqual(self.calls.count(((1,), {})), 2)
+
+        request_cache, token = activate_request_cache()
+        try:
+            self.assertIs(get_request_cache(), request_cache)
+            first = self.lookup(2, period="week")
+            self.assertEqual(self.lookup(2, period="week"), first)
+            self.lookup(3)
+            self.lookup([4])  # Unhashable, computed every time
+            self.lookup([4])
+        finally:
+            deactivate_request_cache(token)
+
+        self.assertIsNone(get_request_cache())
+        self.assertEqual(request_cache.stats(), {"hits": 1, "misses": 2, "entries": 2})
+        self.assertEqual(self.calls.count((([4],), {})), 2)
+
+    def test_loaders_shared_within_a_request(self):
+        request_cache, token = activate_request_cache()
+        try:
+            # The branch, its employees and the facts for the matrix, the daily edges for the totals
+            with self.assertNumQueries(4):
+                matrix = build_employee_matrix(self.branch.id, "2025-03-03", "2025-03-04")
+                employee_range_totals(self.branch.id, "2025-03-03", "2025-03-04")
+            with self.assertNumQueries(0):
+                self.assertIs(build_employee_matrix(self.branch.id, "2025-03-03", "2025-03-04"), matrix)
+        finally:
+            deactivate_request_cache(token)
+
+    def test_middleware_reports_hits_and_misses(self):
+        cache.clear()
+        url = reverse('GET_BRANCH_EMPLOYEES_REPORT', args=[self.branch.id])
+        body = json.dumps({"startDate": "03-03-2025", "endDate": "04-03-2025"})
+
+        with redirect_stdout(io.StringIO()):
+            response = self.client.post(url, body, content_type="application/json")
+            cached_response = self.client.post(url, body, content_type="application/json")
+
+        # employee_range_totals reuses the matrix (and its branch) of the report
+        self.assertEqual(response["X-Request-Cache"], "hits=1; misses=3")
+        # Served by the report cache, no loader called at all
+        self.assertEqual(cached_response["X-Request-Cache"], "hits=0; misses=0")
+        self.assertEqual(cached_response.content, response.content)
+
+
+class ImportHistoryCommandTests(TestCase):
+    counter_header = ["Data", "Ingressi", "Traffico Esterno", "Tasso di Attrazione"]
+
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        sales_rows = [[self.employee.id, "03/03/2025", 3, 2, "1.234,56", "617,28", "1,50"],
+                      [self.employee.id, "04/03/2025", 1, 1, "99,90", "99,90", "1,00"]]
+        counter_rows = [["lun-03.03.25", 120, 1500, "8,00"], ["mar-04.03.25", 40, 600, "6,67"]]
+        self._write(self.branch.id, "sales_2025.csv", _csv_export(sales_rows))
+        self._write(self.branch.id, "Counter_2025.csv", "\n".join(
+            ";".join(str(value) for value in row) for row in [self.counter_header] + counter_rows).encode("utf-8"))
+        self._write(self.branch.id + 100, "sales_2025.csv", _csv_export(sales_rows))
+
+    def _write(self, branch_id, name, content):
+        branch_dir = self.directory / str(branch_id)
+        branch_dir.mkdir(exist_ok=True)
+        (branch_dir / name).write_bytes(content)
+
+    def _call(self, *args):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            call_command('import_history', str(self.directory), '--workers', '1', *args)
+        return output.getvalue()
+
+    def _amounts(self):
+        return dict(SalesFact.objects.filter(branch=self.branch).values_list('date', 'amount'))
+
+    def test_imports_every_branch_directory(self):
+        output = self._call()
+
+        self.assertIn(f"Branch {self.branch.id + 100} not found, sales_2025.csv skipped", output)
+        self.assertIn("4 imports created, 0 replaced", output)
+        # Split by file name
+        self.assertEqual(Counter(Import.objects.filter(branch=self.branch).values_list('import_type', flat=True)),
+                         {"sales_data": 2, "counter_data": 2})
+        self.assertEqual(self._amounts(), {date(2025, 3, 3): Decimal("1234.56"), date(2025, 3, 4): Decimal("99.90")})
+        self.assertEqual(dict(CounterFact.objects.filter(branch=self.branch).values_list('date', 'entrances')),
+                         {date(2025, 3, 3): 120, date(2025, 3, 4): 40})
+
+    def test_colliding_file_skipped(self):
+        store_imports(self.branch, "sales_data", {"2025-03-04": [_sales_record(self.employee.id, "1,00")]})
+
+        output = self._call()
+
+        self.assertIn(f"{self.branch.id}/sales_2025.csv skipped, 1 errors: Collision on 2025-03-04", output)
+        self.assertIn("2 imports created, 0 replaced", output)
+        self.assertEqual(self._amounts(), {date(2025, 3, 4): Decimal("1.00")})
+        self.assertEqual(Import.objects.filter(branch=self.branch, import_type="counter_data").count(), 2)
+
+    def test_upsert_replaces_days(self):
+        store_imports(self.branch, "sales_data", {"2025-03-04": [_sales_record(self.employee.id, "1,00")]})
+        import_id = Import.objects.get(branch=self.branch, import_type="sales_data").id
+
+        output = self._call('--upsert')
+
+        self.assertIn("3 imports created, 1 replaced", output)
+        self.assertEqual(Import.objects.get(branch=self.branch, import_type="sales_data", import_date="2025-03-04").id,
+                         import_id)
+        self.assertEqual(self._amounts(), {date(2025, 3, 3): Decimal("1234.56"), date(2025, 3, 4): Decimal("99.90")})
+
+
+class ImportHistoryViewTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        Import.objects.create(import_date="2025-03-01", branch=self.branch, import_type="sales_data", data=[])
+        Import.objects.create(import_date="2025-03-02", branch=self.branch, import_type="sales_data", data=[])
+        Import.objects.create(import_date="2025-03-02", branch=self.branch, import_type="counter_data", data=[])
+        Import.objects.create(import_date="2024-03-03", branch=self.branch, import_type="counter_data", data=[])
+
+    def test_coverage_per_import_type(self):
+        with mock.patch('api.views.v2.imports.datetime', wraps=datetime) as mocked_datetime:
+            mocked_datetime.now.return_value = datetime(2025, 3, 3, 12, 0)
+            # The branch and the imported days of the year
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('get_history', args=[2025, self.branch.id]))
+
+        history = response.json()
+        days = ["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04"]
+        self.assertEqual([history["imports"][day] for day in days], [1, 1, 0, -1])
+        self.assertEqual([history["coverage"]["sales_data"][day] for day in days], [1, 1, 0, -1])
+        self.assertEqual([history["coverage"]["counter_data"][day] for day in days], [0, 1, 0, -1])
+        # Every day of the year, the 2024 import left out
+        self.assertEqual(set(history["coverage"]), {"sales_data", "counter_data"})
+        for statuses in [history["imports"], *history["coverage"].values()]:
+            self.assertEqual(len(statuses), 365)
+        self.assertEqual(Counter(history["coverage"]["counter_data"].values()), {1: 1, 0: 61, -1: 303})
+
+
+class NormalizeDatesMigrationTests(SimpleTestCase):
+    migration = importlib.import_module('api.migrations.0011_normalize_dates')
+
+    def test_normalize_date(self):
+        self.assertEqual(self.migration._normalize_date("2025-08-01"), "2025-08-01")
+        self.assertEqual(self.migration._normalize_date(" 2025-08-01T10:30:00Z "), "2025-08-01")
+        for value in ("01/08/2025", "2025-13-01", ""):
+            with self.assertRaises(ValueError, msg=repr(value)):
+                self.migration._normalize_date(value)
+
+    def test_normalize_time(self):
+        self.assertEqual(self.migration._normalize_time("9:00"), "09:00:00")
+        self.assertEqual(self.migration._normalize_time("09:00:00"), "09:00:00")
+        self.assertEqual(self.migration._normalize_time("2025-08-01T17:30:00"), "17:30:00")
+        for value in ("9.00", "25:00", "09:00:00.000"):
+            with self.assertRaises(ValueError, msg=repr(value)):
+                self.migration._normalize_time(value)
+
+
+class ScheduleDateFieldsTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Biella", extra_data={"brand": "equivalenza"})
+        self.employee = Employee.objects.create(first_name="Elisa", last_name="1", branch=self.branch)
+        self.schedule = Schedule.objects.create(branch=self.branch, title="2025-08", start_date="2025-08-01",
+                                                end_date="2025-08-31", employees=[self.employee.id])
+
+    def _event(self, **fields):
+        return ScheduleEvent.objects.create(schedule=self.schedule, employee=self.employee, **fields)
+
+    def test_event_json_times(self):
+        event = self._event(date="2025-08-04", start_time="9:00", end_time="13:30:00")
+        event.refresh_from_db()
+
+        self.assertEqual(event.format_json(), {"id": event.id, "employeeId": self.employee.id, "date": "2025-08-04",
+                                               "startTime": "09:00", "endTime": "13:30", "color": ""})
+
+    def test_clean_rejects_overlaps_and_invalid_dates(self):
+        for start_date, end_date in [("2025-08-31", "2025-09-30"), ("2025-07-01", "2025-08-01")]:
+            with self.assertRaises(ValidationError, msg=(start_date, end_date)):
+                Schedule.objects.create(branch=self.branch, title="Overlap", start_date=start_date, end_date=end_date)
+        with self.assertRaises(ValidationError):
+            Schedule.objects.create(branch=self.branch, title="Invalid", start_date="2025-09-31", end_date="2025-10-31")
+        with self.assertRaises(ValidationError):
+            Schedule.objects.create(branch=self.branch, title="Reversed", start_date="2025-10-31", end_date="2025-10-01")
+
+        Schedule.objects.create(branch=self.branch, title="2025-09", start_date="2025-09-01", end_date="2025-09-30")
+        # Saving a schedule again doesn't overlap itself
+        self.schedule.save()
+
+    def test_backup_round_trip(self):
+        self._event(date="2025-08-04", start_time="09:00", end_time="13:00", color="#F44336")
+        backup_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(backup_dir.cleanup)
+
+        with override_settings(SCHEDULES_BACKUP_DIR=backup_dir.name), redirect_stdout(io.StringIO()):
+            backup_path = self.schedule.backup_to_json()
+            backup = json.loads(Path(backup_path).read_text())
+
+            Schedule.objects.filter(id=self.schedule.id).update(end_date="2025-08-15")
+            self.schedule.events.all().delete()
+            schedule = Schedule.objects.get(id=self.schedule.id)
+            schedule.restore_from_json()
+
+        self.assertEqual((backup["start_date"], backup["end_date"]), ("2025-08-01", "2025-08-31"))
+        self.assertEqual(backup["related_events_data"], [{"date": "2025-08-04", "start_time": "09:00:00",
+                                                          "end_time": "13:00:00", "employee": self.employee.id,
+                                                          "color": "#F44336"}])
+        schedule = Schedule.objects.get(id=self.schedule.id)
+        self.assertEqual((schedule.start_date, schedule.end_date), (date(2025, 8, 1), date(2025, 8, 31)))
+        self.assertEqual([event.format_json()["startTime"] for event in schedule.events.all()], ["09:00"])
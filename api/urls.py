@@ -10,7 +10,7 @@ from api.views.v2.employees import new_employee
 from api.views.v2.employees import update_employee
 from api.views.v2.report_branch import get_branch_report, get_branch_employees_report
 from api.views.v2.imports import getHistory
-from api.views.v2.imports import uploadImportData
+from api.views.v2.imports import uploadImportData, getImportJob
 from api.views.v2.dashboard import dashboard_data
 from api.views.v2.report_employees import get_employees_report
 from api.views.v2.schedules import get_branch_schedules, start_schedule, backup_schedule, rollback_schedule, \
@@ -42,6 +42,7 @@ urlpatterns = [
 
     path('import/getHistory/<int:year>/<int:branch_id>/', getHistory, name='get_history'),
     path('import/uploadImportData/', uploadImportData, name='upload_import_data'),
+    path('import/jobs/<int:job_id>/', getImportJob, name='get_import_job'),
     path('dashboard/<int:branch_id>/', dashboard_data, name='dashboard_data'),
 
     path('dipendenti/<int:branch_id>/<int:employee_id>/', single_employee_data, name='GET_EMPLOYEE_DATA'),
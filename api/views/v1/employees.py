@@ -4,6 +4,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from api.models import Employee, Branch
+from api.report_cache import invalidate_branch_reports
 
 
 def get_all_employees(request):
@@ -64,6 +65,7 @@ def manage_employee(request):
 
         try:
             employee = Employee.objects.get(id=employee_id)
+            previous_branch_id = employee.branch_id
             updated = False
 
             if first_name and employee.first_name != first_name:
@@ -84,6 +86,8 @@ def manage_employee(request):
 
             if updated:
                 employee.save()
+                invalidate_branch_reports(previous_branch_id)
+                invalidate_branch_reports(employee.branch_id)
                 return JsonResponse({'status': 'success'}, status=200)
             else:
                 return JsonResponse({'status': 'no change'}, status=203)
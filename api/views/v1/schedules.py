@@ -1,5 +1,4 @@
 import json
-from datetime import datetime
 
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
@@ -46,8 +45,8 @@ def new_schedule(request):
 def schedules(request,schedule_id):
     schedule = get_object_or_404(Schedule, id=schedule_id)
 
-    start_date_dt = datetime.strptime(schedule.start_date, "%Y-%m-%d").date().isoformat()
-    end_date_dt = datetime.strptime(schedule.end_date, "%Y-%m-%d").date().isoformat()
+    start_date_dt = schedule.start_date.isoformat()
+    end_date_dt = schedule.end_date.isoformat()
 
     data = {
         "start_date": start_date_dt,
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from django.views.decorators.csrf import csrf_exempt
 
 from api.models import Employee
+from api.report_cache import invalidate_branch_reports
 from api.formulas.receipts import get_scontrini_dipendente_date_range
 
 def single_employee_data(request, branch_id, employee_id):
@@ -87,6 +88,7 @@ def new_employee(request, branch_id):
             # Add other fields as necessary
         )
         new_employee_obj.save()
+        invalidate_branch_reports(new_employee_obj.branch_id)
 
         all_employees = list(
             Employee.objects.filter(branch_id=branch_id).values('id', 'branch__name', 'first_name', 'last_name')
@@ -102,6 +104,7 @@ def update_employee(request, branch_id, employee_id):
         employee_info = data.get('employeeInfo', {})
         try:
             employee = Employee.objects.get(id=employee_id)
+            previous_branch_id = employee.branch_id
             employee.first_name = employee_info.get('name')
             employee.last_name = employee_info.get('surname')
             employee.branch_id = branch_id  # Assuming branch_id is passed in the request
@@ -118,6 +121,8 @@ def update_employee(request, branch_id, employee_id):
             employee.hourly_cost = employee_info.get('hourlyCost')
             # Add other fields as necessary
             employee.save()
+            invalidate_branch_reports(previous_branch_id)
+            invalidate_branch_reports(employee.branch_id)
 
             return JsonResponse({'status': 'success', 'message': 'Employee updated successfully'}, status=200)
         except Employee.DoesNotExist:
@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta
-from io import BytesIO
 
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
-from openpyxl.reader.excel import load_workbook
 
-from api.models import Branch, Import, Employee
+from api.importers import IMPORT_TYPES
+from api.models import Branch, Import, ImportJob
+from api.tasks import async_process_import
 
 
 def getHistory(request, year, branch_id):
@@ -23,15 +23,16 @@ def getHistory(request, year, branch_id):
         except ValueError:
             return JsonResponse({'status': 'error', 'message': 'Invalid year'})
 
-        imports_objs_qs = Import.objects.filter(branch=branch)
-        imports_objs_qs_filtered = Import.objects.none()
+        # One query for every (day, type) imported in the year
+        imported_days = Import.objects.filter(branch=branch, import_date__year=int(year)).values_list(
+            'import_date', 'import_type').distinct()
 
-        # Filter for all import_obj containing the requested year
-        for import_obj in imports_objs_qs:
-            if import_obj.import_date.__contains__(year):
-                imports_objs_qs_filtered |= Import.objects.filter(import_date=import_obj.import_date)
+        dates_by_type = {import_type: set() for import_type in IMPORT_TYPES.values()}
+        for import_date, import_type in imported_days:
+            dates_by_type.setdefault(import_type, set()).add(import_date.isoformat())
+        imported_dates = set().union(*dates_by_type.values())
 
-        # Build dictionary of all days in the selected year
+        # Build all days in the selected year
         start_date = datetime(int(year), 1, 1)
         end_date = datetime(int(year), 12, 31)
         all_days_in_year = [
@@ -39,32 +40,23 @@ def getHistory(request, year, branch_id):
             for i in range((end_date - start_date).days + 1)
         ]
 
-        imports_report_mapped = {}
-
-        # Mark days with import as 1
-        for import_obj in imports_objs_qs_filtered:
-            imports_report_mapped[import_obj.import_date] = 1
-            if import_obj.import_date in all_days_in_year:
-                all_days_in_year.remove(import_obj.import_date)
-
-        # Remaining days get 0 for no import
-        for day in all_days_in_year:
-            imports_report_mapped[day] = 0
-
-        # Now mark FUTURE days as -1
+        # 1 = imported, 0 = no import, -1 = future day (ISO dates compare as strings)
         today_str = datetime.now().strftime('%Y-%m-%d')
-        today_date = datetime.strptime(today_str, '%Y-%m-%d').date()
 
-        for day_str in imports_report_mapped.keys():
-            day_date = datetime.strptime(day_str, '%Y-%m-%d').date()
-            if day_date > today_date:
-                imports_report_mapped[day_str] = -1
+        def day_status(day_str, dates):
+            if day_str > today_str:
+                return -1
+            return 1 if day_str in dates else 0
 
-        # Sort dictionary by date
-        imports_report_mapped = dict(sorted(imports_report_mapped.items()))
+        imports_report_mapped = {day_str: day_status(day_str, imported_dates) for day_str in all_days_in_year}
+        coverage = {
+            import_type: {day_str: day_status(day_str, dates) for day_str in all_days_in_year}
+            for import_type, dates in dates_by_type.items()
+        }
 
         context = {
-            'imports': imports_report_mapped,
+            'imports': imports_report_mapped,  # any import type
+            'coverage': coverage,  # same per import type (sales_data, counter_data)
             'branch': branch.id,
             'year': year,
         }
@@ -79,9 +71,8 @@ def uploadImportData(request):
         uploaded_file = request.FILES.get('file')
         selected_branch = request.POST.get('branchId')
         selected_type = request.POST.get('typeSelect')
+        selected_mode = request.POST.get('mode', ImportJob.MODE_INSERT)
 
-        print(type(selected_branch), type(selected_type))
-        print()
         # parse selected_type and selected_branch into ints
         try:
             selected_type = int(selected_type)
@@ -90,253 +81,59 @@ def uploadImportData(request):
             return JsonResponse({"status": "error", "errors": ["Error parsing ints"]}, status=200)
 
         # 0 = sales_data, 1 = counter_data
-        if selected_type == 0:
-            selected_type = "sales_data"
-        elif selected_type == 1:
-            selected_type = "counter_data"
+        if selected_type not in IMPORT_TYPES:
+            return JsonResponse({"status": "error", "errors": ["No typeSelect"]}, status=200)
+        selected_type = IMPORT_TYPES[selected_type]
 
-        try:
-            selected_branch = int(selected_branch)
-        except:
-            return JsonResponse({"status": "error", "errors": ["Branch not found"]}, status=200)
+        # insert = reject the file if a day is already imported, upsert = replace those days
+        if selected_mode not in ImportJob.MODES:
+            return JsonResponse({"status": "error", "errors": ["Invalid mode"]}, status=200)
 
         if not selected_branch:
             return JsonResponse({"status": "error", "errors": ["no branch selected"]}, status=200)
 
-        data_dict = dict
-
-        branch_obj = Branch.objects.get(id=selected_branch)
-
-        if branch_obj.get_brand() == "equivalenza":
-            if selected_type == "counter_data":
-                if uploaded_file:
-                    # Read the file as binary
-                    file_content = uploaded_file.read()
-
-                    # Load the workbook from the binary data
-                    workbook = load_workbook(filename=BytesIO(file_content))
-                    sheet = workbook.active  # You can specify sheet name if needed
-
-                    # Initialize the dictionary to hold the data
-                    data_dict = {}
-
-                    errors = []
-
-                    total_rows = sheet.max_row
-
-                    # Iterate through the rows, skipping the header
-                    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-                        date = row[0]  # assuming the date is in the second column
-                        record = {
-                            "(Ing) Ingressi": row[1] or 0,
-                            "(Est) Traffico Esterno": row[2] or 0,
-                            "(TA) Tasso di Attrazione": row[3] or 0,
-                        }
-
-                        # mar-19.11.24 to YYYY/MM/DD
-                        date = date.split("-")[1]
-                        date = datetime.strptime(date, "%d.%m.%y").strftime("%Y-%m-%d")
-
-                        # If the date is already a key, overwrite the current record
-                        if date in data_dict:
-
-                            data_dict[date] = record
-                        else:
-                            # Otherwise, create a new list with the record
-                            data_dict[date] = [record]
-
-                        data_dict[date] = [record]
-
-                    for date, records in data_dict.items():
-                        if Import.objects.filter(branch=branch_obj, import_date=date,
-                                                 import_type=selected_type).exists():
-                            errors.append(f"Collision on {date}")
-                            continue
-
-                    if errors:
-                        return JsonResponse({"status": "error", "errors": errors}, status=200)
-
-                    import_bulk_create_list = []
-                    for date, data in data_dict.items():
-                        i = Import(import_date=date, data=data, branch=branch_obj, import_type=selected_type)
-                        import_bulk_create_list.append(i)
-
-                    Import.objects.bulk_create(import_bulk_create_list)
-
-                    return JsonResponse({"status": "success"}, status=200)
-
-            ### START CONVERTING DATA
-            elif selected_type == "sales_data":
-                if uploaded_file:
-                    # Read the file as binary
-                    file_content = uploaded_file.read()
-
-                    # Load the workbook from the binary data
-                    workbook = load_workbook(filename=BytesIO(file_content))
-                    sheet = workbook.active  # You can specify sheet name if needed
-
-                    # Initialize the dictionary to hold the data
-                    data_dict = {}
-
-                    # Iterate through the rows, skipping the header
-                    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-                        date = row[1]  # assuming the date is in the second column
-                        record = {
-                            "Dipendente": row[0],
-                            "Qta. Vend.": row[2],
-                            "Sco.": row[3],
-                            "Importo": row[4],
-                            "Sco. Medio": row[5],
-                            "Qta Media": row[6]
-                        }
-
-                        # If the date is already a key, append the new record to its list
-                        if date in data_dict:
-                            data_dict[date].append(record)
-                        else:
-                            # Otherwise, create a new list with the record
-                            data_dict[date] = [record]
-
-                    import_qs = Import.objects.none()
-
-                    errors = []
-
-                    for date, records in data_dict.items():
-                        employees_day_id_list = []
-                        date = datetime.strptime(date, '%d/%m/%Y').strftime('%Y-%m-%d')
-                        for record in records:
-                            try:
-                                employees_day_id_list.append(record['Dipendente'])
-                            except:
-                                errors.append(f"Employee {record['Dipendente']} not found")
-                                continue
-
-                        employees_day_qs = Employee.objects.filter(id__in=employees_day_id_list)
-
-                        if employees_day_qs.count() != len(employees_day_id_list):
-                            errors.append(f"Employees on {date} not found")
-                            continue
-
-                        branch_check_value = list(employees_day_qs.values_list('branch', flat=True))
-                        normalized = list(dict.fromkeys(branch_check_value))
-                        if len(normalized) != 1:
-                            errors.append(f"Branch on {date} from different branch")
-                            continue
-
-                        if normalized[0] != selected_branch:
-                            errors.append(f"Branch on {date} from different branch")
-                            continue
-
-                        if Import.objects.filter(branch=branch_obj, import_date=date):
-                            errors.append(f"Collision on {date}")
-                            continue
-
-                    if errors:
-                        return JsonResponse({"status": "error", "errors": errors}, status=200)
-
-                    import_bulk_create_list = []
-                    for date, data in data_dict.items():
-                        date_obj = datetime.strptime(date, '%d/%m/%Y')
-                        date_str = date_obj.strftime('%Y-%m-%d')
-                        i = Import(import_date=date_str, data=data, branch=branch_obj,
-                                   import_type=selected_type)
-                        import_bulk_create_list.append(i)
-
-                    Import.objects.bulk_create(import_bulk_create_list)
-
-                return JsonResponse({"status": "success", "errors": []}, status=200)
-
-        elif branch_obj.get_brand() == "original":
-
-            if selected_type == "counter_data":
-                if uploaded_file:
-                    # Read the file as binary
-                    file_content = uploaded_file.read()
-
-                    # Load the workbook from the binary data
-                    workbook = load_workbook(filename=BytesIO(file_content))
-                    sheet = workbook.active  # You can specify sheet name if needed
-
-                    # Initialize the dictionary to hold the data
-                    data_dict = {}
-
-                    errors = []
-
-                    total_rows = sheet.max_row
-
-                    # Iterate through the rows, skipping the header
-                    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-
-                        date = row[0]  # assuming the date is in the second column
-                        record = {
-                            "(Ing) Ingressi": row[1],
-                            "(Est) Traffico Esterno": row[2],
-                            "(TA) Tasso di Attrazione": row[3],
-                        }
-
-                        data_dict[date] = [record]
-
-            ### START CONVERTING DATA
-            elif selected_type == "sales_data":
-
-                if uploaded_file:
-                    # Read the file as binary
-                    file_content = uploaded_file.read()
-
-                    # Load the workbook from the binary data
-                    workbook = load_workbook(filename=BytesIO(file_content))
-                    sheet = workbook.active  # You can specify sheet name if needed
-
-                    # Initialize the dictionary to hold the data
-                    data_dict = {}
-
-                    errors = []
-
-                    total_rows = sheet.max_row
-
-                    # Iterate through the rows, skipping the header
-                    for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-
-                        if row[1] in ["Totale generale", "Totali "]:
-                            continue
-
-                        date = row[1]  # assuming the date is in the second column
-                        record = {
-                            "Qta. Vend.": row[2],
-                            "Sco.": row[3],
-                            "Importo": row[4],
-                            "Sco. Medio": row[5],
-                            "Qta Media": row[6]
-                        }
-                        if Import.objects.filter(branch=branch_obj, import_date=date):
-                            errors.append(f"Collision on {date}")
-                            continue
-
-                        data_dict[date] = [record]
-
-                    import_qs = Import.objects.none()
-
-                    if errors:
-                        return JsonResponse({"status": "error", "errors": errors}, status=200)
-
-                    data_dict_formatted = {}
-
-                    data_dict = {k: v for k, v in data_dict.items() if k is not None}
+        try:
+            branch_obj = Branch.objects.get(id=selected_branch)
+        except Branch.DoesNotExist:
+            return JsonResponse({"status": "error", "errors": ["Branch not found"]}, status=200)
 
-                    for k, v in data_dict.items():
-                        unformatted = k
-                        date_strp = datetime.strptime(unformatted, '%d/%m/%Y')
-                        date_str = date_strp.strftime('%Y-%m-%d')
-                        data_dict_formatted[date_str] = v
+        if not uploaded_file:
+            return JsonResponse({"status": "error", "errors": ["No file uploaded"]}, status=200)
 
-                    import_bulk_create_list = []
-                    for date, data in data_dict_formatted.items():
-                        i = Import(import_date=date, data=data, branch=branch_obj, import_type=selected_type)
-                        import_bulk_create_list.append(i)
+        # Keep the upload in the job and let the worker parse/validate/store it
+        job = None
+        try:
+            job = ImportJob.objects.create(branch=branch_obj, import_type=selected_type, mode=selected_mode,
+                                           upload=uploaded_file.read())
+            async_process_import.defer(job_id=job.id)
+        except Exception as e:
+            print(f"IMPORT Error: Could not queue the import of branch {branch_obj.id}: {e}")
+            if job is not None:
+                # No worker will pick it up, don't keep the upload around
+                job.update_progress(status=ImportJob.STATUS_ERROR, errors=["Could not queue the import"], upload=None)
+            return JsonResponse({"status": "error", "errors": ["Could not queue the import"]}, status=200)
 
-                    Import.objects.bulk_create(import_bulk_create_list)
+        return JsonResponse({"status": "queued", "jobId": job.id, "errors": []}, status=200)
+    return JsonResponse({"status": "error", "errors": ["Invalid Method"]}, status=200)
 
-                return JsonResponse({"status": "success", "errors": []}, status=200)
 
-        return JsonResponse({"status": "error", "errors": ["No typeSelect"]}, status=200)
-    return JsonResponse({"status": "error", "errors": ["Invalid Method"]}, status=200)
\ No newline at end of file
+def getImportJob(request, job_id):
+    if request.method == 'GET':
+        try:
+            job = ImportJob.objects.get(id=job_id)
+        except ImportJob.DoesNotExist:
+            return JsonResponse({"status": "error", "errors": ["Import job not found"]}, status=404)
+
+        return JsonResponse({
+            "jobId": job.id,
+            "branch": job.branch_id,
+            "type": job.import_type,
+            "mode": job.mode,
+            "status": job.status,  # queued, running, success, error
+            "rowsParsed": job.rows_parsed,
+            "daysValidated": job.days_validated,
+            "importsCreated": job.imports_created,
+            "importsReplaced": job.imports_replaced,
+            "errors": job.errors,
+        }, status=200)
+    return JsonResponse({"status": "error", "errors": ["Invalid Method"]}, status=200)
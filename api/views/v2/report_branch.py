@@ -3,12 +3,10 @@ from django.http import JsonResponse
 from datetime import datetime, timedelta
 from django.views.decorators.csrf import csrf_exempt
 
-from api.formulas.averages import generate_medium_performance
-from api.formulas.counter import generate_ingressi_branch_report, generate_branch_report_conversion_rate
-from api.formulas.receipts import generate_branch_report_scontrini, generate_report_performance_scontrini
-from api.formulas.sales import generate_branch_report_sales, generate_report_performance_sales, \
-    generate_number_sales_performance
+from api.formulas.averages import generate_medium_performance_totals
+from api.formulas.report_engine import compute_branch_metrics, build_employee_matrix, employee_plane_report, employee_range_totals
 from api.models import Branch, Employee, Target
+from api.report_cache import cached_json_response
 
 # Constants
 TARGETS = {'sales': 200, 'scontrini': 100, 'ingressi': 100}
@@ -52,6 +50,14 @@ def get_branch(branch_id):
         return None
 
 
+def get_branch_metrics(branch_id, start_date, end_date, metrics):
+    """Compute the requested daily metrics as {metric: {date: value}} (empty dicts on invalid input)"""
+    result = compute_branch_metrics(branch_id, start_date, end_date, metrics)
+    if result is None:
+        return {metric: {} for metric in metrics}
+    return {metric: dict(zip(result["labels"], result[metric])) for metric in metrics}
+
+
 def build_chart_config(data, chart_type, target=None):
     """Build standardized chart configuration"""
     config = {
@@ -90,6 +96,64 @@ def build_employee_chart_config(employee_data, target=None, start_date=None, end
     return config
 
 
+def build_branch_page(branch, target, start_date, end_date):
+    """Build the branch report page (sales, receipts and entrances charts)"""
+    # All the series of the page come from one pass over the sales and counter facts
+    metrics = get_branch_metrics(branch.id, start_date, end_date,
+                                 ["sales", "receipts", "entrances", "conversion_rate"])
+    report_data = {
+        "sales": build_chart_config(
+            metrics["sales"],
+            "Incassi",
+            target.sales_target if target else None
+        ),
+        "receipts": build_chart_config(
+            metrics["receipts"],
+            "Scontrini"
+        ),
+        "entrances": {
+            "series": [
+                {"name": "Ingressi", "data": list(metrics["entrances"].values())},
+                {"name": "Tasso di Conversione", "data": list(metrics["conversion_rate"].values())}
+            ],
+            "labels": list(metrics["entrances"].keys())
+        }
+    }
+    return JsonResponse({"status": "success", "data": report_data})
+
+
+def build_branch_chart(branch, chart_type, start_date, end_date):
+    """Build a single branch chart"""
+    charts = {
+        BRANCH_CHART_TYPES['SALES']: ("sales", "Incassi", TARGETS['sales']),
+        BRANCH_CHART_TYPES['RECEIPTS']: ("receipts", "Scontrini", None),
+        BRANCH_CHART_TYPES['ENTRANCES']: ("entrances", "Ingressi", None)
+    }
+
+    if chart_type not in charts:
+        return JsonResponse(
+            {"status": "error", "errors": ["Invalid chart type"]},
+            status=400
+        )
+
+    metric, name, target = charts[chart_type]
+
+    if chart_type == BRANCH_CHART_TYPES['ENTRANCES']:
+        metrics = get_branch_metrics(branch.id, start_date, end_date, [metric, "conversion_rate"])
+        config = {
+            "series": [
+                {"name": name, "data": list(metrics[metric].values())},
+                {"name": "Tasso di Conversione", "data": list(metrics["conversion_rate"].values())}
+            ],
+            "labels": list(metrics[metric].keys())
+        }
+    else:
+        metrics = get_branch_metrics(branch.id, start_date, end_date, [metric])
+        config = build_chart_config(metrics[metric], name, target)
+
+    return JsonResponse(config)
+
+
 @csrf_exempt
 def get_branch_report(request, branch_id):
     """Handle branch report requests"""
@@ -108,30 +172,10 @@ def get_branch_report(request, branch_id):
 
     if request.method == 'GET':
         start_date, end_date = get_dates(request, 6)
-        report_data = {
-            "sales": build_chart_config(
-                generate_branch_report_sales(branch.id, start_date, end_date),
-                "Incassi",
-                target.sales_target
-            ),
-            "receipts": build_chart_config(
-                generate_branch_report_scontrini(branch.id, start_date, end_date),
-                "Scontrini"
-            ),
-            "entrances": {
-                "series": [
-                    {"name": "Ingressi", "data": list(generate_ingressi_branch_report(branch.id, start_date, end_date).values())
-                     },
-                    {"name": "Tasso di Conversione", "data": list(
-                        generate_branch_report_conversion_rate(
-                            branch.id, start_date, end_date).values())
-                     }
-                ],
-                "labels": list(generate_ingressi_branch_report(
-                    branch.id, start_date, end_date).keys())
-            }
-        }
-        return JsonResponse({"status": "success", "data": report_data})
+        return cached_json_response(
+            "branch_report", branch.id, start_date, end_date, "page",
+            lambda: build_branch_page(branch, target, start_date, end_date)
+        )
 
     if request.method == 'POST':
         try:
@@ -143,35 +187,10 @@ def get_branch_report(request, branch_id):
                 status=400
             )
 
-        generators = {
-            BRANCH_CHART_TYPES['SALES']: (generate_branch_report_sales, "Incassi", TARGETS['sales']),
-            BRANCH_CHART_TYPES['RECEIPTS']: (generate_branch_report_scontrini, "Scontrini", None),
-            BRANCH_CHART_TYPES['ENTRANCES']: (generate_ingressi_branch_report, "Ingressi", None)
-        }
-
-        if chart_type not in generators:
-            return JsonResponse(
-                {"status": "error", "errors": ["Invalid chart type"]},
-                status=400
-            )
-
-        generator, name, target = generators[chart_type]
-        data = generator(branch.id, start_date, end_date)
-
-        if chart_type == BRANCH_CHART_TYPES['ENTRANCES']:
-            conversion_data = generate_branch_report_conversion_rate(
-                branch.id, start_date, end_date)
-            config = {
-                "series": [
-                    {"name": name, "data": list(data.values())},
-                    {"name": "Tasso di Conversione", "data": list(conversion_data.values())}
-                ],
-                "labels": list(data.keys())
-            }
-        else:
-            config = build_chart_config(data, name, target)
-
-        return JsonResponse(config)
+        return cached_json_response(
+            "branch_report", branch.id, start_date, end_date, chart_type,
+            lambda: build_branch_chart(branch, chart_type, start_date, end_date)
+        )
 
     return JsonResponse(
         {"status": "error", "errors": ["Invalid request method"]},
@@ -179,55 +198,27 @@ def get_branch_report(request, branch_id):
     )
 
 
-@csrf_exempt
-def get_branch_employees_report(request, branch_id):
-    """Handle employee performance reports"""
-    branch = get_branch(branch_id)
-    if not branch:
-        return JsonResponse(
-            {"status": "error", "errors": ["Invalid branch ID"]},
-            status=400
-        )
-
-    employees = Employee.objects.filter(branch_id=branch.id)
-    if not employees.exists():
-        return JsonResponse(
-            {"status": "error", "errors": ["No employees found"]},
-            status=400
-        )
-
-    try:
-        start_date, end_date = get_dates(request)
-        print(start_date, end_date)
-    except (KeyError, json.JSONDecodeError, ValueError):
-        start_date_obj = datetime.now() - timedelta(days=365 + 6 + 1)
-        end_date_obj = datetime.now() - timedelta(days=365 + 1)
-        start_date = start_date_obj.strftime('%Y-%m-%d')
-        end_date = end_date_obj.strftime('%Y-%m-%d')
-        print('EXCEPTION')
-
-    # get chart type
-    try:
-        chart_type = json.loads(request.body.decode('utf-8')).get("chart")
-    except json.JSONDecodeError:
-        chart_type = None
+def build_branch_employees_report(branch, employees, chart_type, start_date, end_date):
+    """Build the employee performance report, or one of its charts if chart_type is set"""
+    # Sales, receipts and quantities of every employee come from one pass over the facts
+    matrix = build_employee_matrix(branch.id, start_date, end_date)
 
     if chart_type:
         print("Chart Type:", chart_type)
-        generators = {
-            EMPLOYEES_CHART_TYPES['SALES_PIECES']: (generate_report_performance_sales, "Pezzi venduti", None),
-            EMPLOYEES_CHART_TYPES['RECEIPTS_COUNT']: (generate_report_performance_scontrini, "Numero Scontrini", None),
-            EMPLOYEES_CHART_TYPES['RECEIPTS_AMOUNT']: (generate_number_sales_performance, "Valore Totale Vendite", None)
+        planes = {
+            EMPLOYEES_CHART_TYPES['SALES_PIECES']: ("sales", "Pezzi venduti", None),
+            EMPLOYEES_CHART_TYPES['RECEIPTS_COUNT']: ("receipts", "Numero Scontrini", None),
+            EMPLOYEES_CHART_TYPES['RECEIPTS_AMOUNT']: ("qty", "Valore Totale Vendite", None)
         }
 
-        if chart_type not in generators:
+        if chart_type not in planes:
             return JsonResponse(
                 {"status": "error", "errors": ["Invalid chart type"]},
                 status=400
             )
 
-        generator, name, target = generators[int(chart_type)]
-        data = generator(branch.id, start_date, end_date)
+        plane, name, target = planes[int(chart_type)]
+        data = employee_plane_report(matrix, plane)
 
         config = build_employee_chart_config(data, target, start_date, end_date)
         return JsonResponse(config)
@@ -235,16 +226,18 @@ def get_branch_employees_report(request, branch_id):
 
     # Generate report data
     report_data = {
-        'sales': generate_report_performance_sales(branch.id, start_date, end_date),
-        'scontrini': generate_report_performance_scontrini(branch.id, start_date, end_date),
-        'num_sales': generate_number_sales_performance(branch.id, start_date, end_date)
+        'sales': employee_plane_report(matrix, "sales"),
+        'scontrini': employee_plane_report(matrix, "receipts"),
+        'num_sales': employee_plane_report(matrix, "qty")
     }
 
-    # Process averages
+    # Process averages, from the range totals of the employee period rollups
+    employee_totals = employee_range_totals(branch.id, start_date, end_date)
+    num_days = len(matrix["labels"]) if matrix is not None else 0
     averages = {
-        'medium_sales': generate_medium_performance(report_data['sales']),
-        'medium_scontrini': generate_medium_performance(report_data['scontrini']),
-        'medium_num_sales': generate_medium_performance(report_data['num_sales'])
+        'medium_sales': generate_medium_performance_totals(employee_totals, "sales", num_days),
+        'medium_scontrini': generate_medium_performance_totals(employee_totals, "receipts", num_days),
+        'medium_num_sales': generate_medium_performance_totals(employee_totals, "qty", num_days)
     }
 
     # Build response structure
@@ -287,4 +280,43 @@ def get_branch_employees_report(request, branch_id):
 
     }
 
-    return JsonResponse({"status": "success", "data": response_data})
\ No newline at end of file
+    return JsonResponse({"status": "success", "data": response_data})
+
+
+@csrf_exempt
+def get_branch_employees_report(request, branch_id):
+    """Handle employee performance reports"""
+    branch = get_branch(branch_id)
+    if not branch:
+        return JsonResponse(
+            {"status": "error", "errors": ["Invalid branch ID"]},
+            status=400
+        )
+
+    employees = Employee.objects.filter(branch_id=branch.id)
+    if not employees.exists():
+        return JsonResponse(
+            {"status": "error", "errors": ["No employees found"]},
+            status=400
+        )
+
+    try:
+        start_date, end_date = get_dates(request)
+        print(start_date, end_date)
+    except (KeyError, json.JSONDecodeError, ValueError):
+        start_date_obj = datetime.now() - timedelta(days=365 + 6 + 1)
+        end_date_obj = datetime.now() - timedelta(days=365 + 1)
+        start_date = start_date_obj.strftime('%Y-%m-%d')
+        end_date = end_date_obj.strftime('%Y-%m-%d')
+        print('EXCEPTION')
+
+    # get chart type
+    try:
+        chart_type = json.loads(request.body.decode('utf-8')).get("chart")
+    except json.JSONDecodeError:
+        chart_type = None
+
+    return cached_json_response(
+        "branch_employees_report", branch.id, start_date, end_date, chart_type,
+        lambda: build_branch_employees_report(branch, employees, chart_type, start_date, end_date)
+    )
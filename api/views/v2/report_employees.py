@@ -1,10 +1,56 @@
 from django.http import JsonResponse
 from django.shortcuts import render
 
-from api.formulas.averages import generate_medium_performance, generate_medium_sales
-from api.formulas.receipts import generate_report_performance_scontrini
-from api.formulas.sales import generate_report_performance_sales
+from api.formulas.report_engine import build_employee_matrix, employee_plane_report, employee_range_totals
 from api.models import Branch
+from api.report_cache import cached_json_response
+
+
+def build_employees_report(branch_id, date_start, date_end):
+    matrix = build_employee_matrix(branch_id, date_start, date_end) # One pass for every employee and day
+
+    sc_performance = employee_plane_report(matrix, "receipts")
+
+    sales_performance = employee_plane_report(matrix, "sales")
+
+
+    # Range totals from the employee period rollups (daily facts only at the edges of the range)
+    employee_totals = employee_range_totals(branch_id, date_start, date_end)
+
+    zoom_enabled = "true"
+    graph_type = "area"
+
+    if date_start == date_end:
+        zoom_enabled = "false"
+        graph_type = "bar"
+
+    sales_totals = {key: totals["sales"] for key, totals in employee_totals.items()}
+    sc_totals = {key: totals["receipts"] for key, totals in employee_totals.items()}
+
+    total_sales = sum(sales_totals.values())
+    total_sc = sum(sc_totals.values())
+
+    # Calculate the percentage for each employee within each KPI
+    sales_percentage = {key: round((sales / total_sales) * 100, 2) if total_sales != 0 else 0
+                        for key, sales in sales_totals.items()}
+    sc_percentage = {key: round((sc / total_sc) * 100, 2) if total_sc != 0 else 0
+                     for key, sc in sc_totals.items()}
+
+
+    context = {
+        "sc_performance": sc_performance,
+        "branch": branch_id,
+        "date_start": date_start,
+        "date_end": date_end,
+        "sales_performance": sales_performance,
+        "sales_percentage": sales_percentage,
+        "sc_percentage": sc_percentage,
+        "zoom_enabled": zoom_enabled,
+        "type" : graph_type,
+    }
+
+    return JsonResponse(context, status=200)
+
 
 def get_employees_report(request, branch_id):
     if request.method == 'GET':
@@ -53,44 +99,7 @@ def get_employees_report(request, branch_id):
 
 
 
-        sc_performance = generate_report_performance_scontrini(branch_id, date_start, date_end)
-
-        sales_performance = generate_report_performance_sales(branch_id, date_start, date_end)
-
-
-        medium_sc_sales = generate_medium_performance(sc_performance) # Use the generic average function
-
-        medium_sales_performance = generate_medium_performance(sales_performance)
-
-        medium_number_sales_performance = generate_medium_sales(sales_performance)
-
-        zoom_enabled = "true"
-        graph_type = "area"
-
-        if date_start == date_end:
-            zoom_enabled = "false"
-            graph_type = "bar"
-
-        total_sales = sum([sum(sales) for sales in sales_performance.values()])
-        total_sc = sum([sum(sc) for sc in sc_performance.values()])
-
-        # Calculate the percentage for each employee within each KPI
-        sales_percentage = {key: round((sum(sales) / total_sales) * 100, 2) if total_sales != 0 else 0
-                            for key, sales in sales_performance.items()}
-        sc_percentage = {key: round((sum(sc) / total_sc) * 100, 2) if total_sc != 0 else 0
-                         for key, sc in sc_performance.items()}
-
-
-        context = {
-            "sc_performance": sc_performance,
-            "branch": branch_id,
-            "date_start": date_start,
-            "date_end": date_end,
-            "sales_performance": sales_performance,
-            "sales_percentage": sales_percentage,
-            "sc_percentage": sc_percentage,
-            "zoom_enabled": zoom_enabled,
-            "type" : graph_type,
-        }
-
-        return JsonResponse(context, status=200)
\ No newline at end of file
+        return cached_json_response(
+            "employees_report", branch_id, date_start, date_end, None,
+            lambda: build_employees_report(branch_id, date_start, date_end)
+        )
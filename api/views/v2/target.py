@@ -7,6 +7,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from api.models import Branch, Target
+from api.report_cache import invalidate_branch_reports
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +66,7 @@ def target_grid(request):
             target = Target.objects.get(branch_id=branch_id)
             target.sales_target = new_target
             target.save()
+            invalidate_branch_reports(target.branch_id)
 
             return JsonResponse({'status': 'success', 'message': 'Target updated successfully'}, status=200)
         except Target.DoesNotExist:
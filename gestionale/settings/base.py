@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.RequestCacheMiddleware',
 
 ]
 
@@ -133,6 +134,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MASTERPLAN_APP = '127.0.0.1'
 MASTERPLAN_PORT = '80'
 
+# Schedule generation backend (orario_creation.main.SCHEDULE_SOLVERS): "masterplan" drives the MasterPlan
+# autoplanner through its MySQL database, "native" (opt-in) solves in process without MasterPlan
+SCHEDULE_SOLVER = os.getenv('SCHEDULE_SOLVER', 'masterplan')
+
+# MasterPlan bridge connections (orario_creation.connections)
+MASTERPLAN_DB_POOL_SIZE = int(os.getenv('MASTERPLAN_DB_POOL_SIZE', '4'))
+MASTERPLAN_DB_RETRIES = 3
+MASTERPLAN_HTTP_RETRIES = 3
+MASTERPLAN_CONNECT_TIMEOUT = 5
+MASTERPLAN_READ_TIMEOUT = 300
+# Employees whose absences are submitted in parallel
+MASTERPLAN_ABSENCE_WORKERS = 4
+
+# Cache of the report endpoints (api.report_cache). It must be shared by every process: imports
+# invalidate it from the procrastinate worker while the gunicorn workers serve the reports, with the
+# default per-process memory cache they would keep serving stale reports. The table is created by
+# `manage.py createcachetable` (run by main.py at startup, after the migrations).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "report_cache",
+    }
+}
+
+# Seconds a report endpoint response stays in the cache (api.report_cache)
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Store new imports in the columnar Import.data format (api.import_data)
+IMPORT_DATA_COLUMNAR = os.getenv('IMPORT_DATA_COLUMNAR') == '1'
+
 LOGGING = {
     "version": 1,
     "formatters": {
@@ -57,6 +57,9 @@ if __name__ == '__main__':
     # Run Django migrations
     call_command('migrate')
     print("OK MIGRATION")
+    # Shared report cache table (settings.CACHES)
+    call_command('createcachetable')
+    print("OK CACHE TABLE")
     if os.getenv('DJANGO_SEED') == 'True':
         # Load initial data
         call_command('seed')
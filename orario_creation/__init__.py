@@ -1,56 +1,125 @@
+import hashlib
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-import mysql.connector
 
-conn = None
-cursor = None
-masterplan_app = None
+DATABASE_NAME = "masterplan"
+SCHEMA_PATH = Path(__file__).parent.parent / "utils_files" / "masterplan_base.sql"
 
-def initialize_database():
-    global conn, cursor, masterplan_app
-
-    # Connect to the database
-    conn = mysql.connector.connect(
-        host='localhost',
-        user="masterplan",
-        database="masterplan",
-        password="PASSWORD",
+# Checksum of the masterplan_base.sql the database was built from, the schema is rebuilt when it changes
+TEMPLATE_TABLE = "SchemaTemplate"
+
+# MySQL named lock held while a worker checks or builds the schema, and while a run creates its roster
+SCHEMA_LOCK = "masterplan_schema"
+SCHEMA_LOCK_TIMEOUT = 120
+
+
+@lru_cache(maxsize=1)
+def schema_script():
+    # (checksum, statements) of masterplan_base.sql, read once per worker
+    with open(str(SCHEMA_PATH), 'r', encoding='utf-8') as file:
+        sql_script = file.read()
+
+    statements = [statement.strip() for statement in sql_script.split(';') if statement.strip()]
+    return hashlib.sha256(sql_script.encode('utf-8')).hexdigest(), statements
+
+
+def _template_checksum(cursor):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+        (DATABASE_NAME, TEMPLATE_TABLE),
     )
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(f"SELECT checksum FROM {TEMPLATE_TABLE}")
+    row = cursor.fetchone()
+    return row[0] if row else None
 
-    cursor = conn.cursor()
 
-    database_name = "masterplan"
+def _active_rosters(cursor):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = 'Roster'",
+        (DATABASE_NAME,),
+    )
+    if not cursor.fetchone()[0]:
+        return 0
+    cursor.execute(f"SELECT COUNT(*) FROM {DATABASE_NAME}.Roster")
+    return cursor.fetchone()[0]
+
+
+# schema_lock: Holds SCHEMA_LOCK for the block. Raises TimeoutError if it isn't free within SCHEMA_LOCK_TIMEOUT.
+@contextmanager
+def schema_lock(cursor):
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (SCHEMA_LOCK, SCHEMA_LOCK_TIMEOUT))
+    if not cursor.fetchone()[0]:
+        raise TimeoutError(f"Could not lock the {DATABASE_NAME} schema within {SCHEMA_LOCK_TIMEOUT}s")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (SCHEMA_LOCK,))
+        cursor.fetchone()
+
+
+def _build_schema(conn, cursor, checksum, statements):
+    import mysql.connector
+    from orario_creation.admin import create_admin_user
+
+    # Runs create their roster under the schema lock and delete it when done: a roster left means a run
+    # is still using the database (or crashed without cleaning up) and dropping it would break that run
+    active_rosters = _active_rosters(cursor)
+    if active_rosters:
+        raise RuntimeError(f"masterplan_base.sql changed but {active_rosters} rosters are still in {DATABASE_NAME}, "
+                           f"not rebuilding it: retry when the running schedules are done")
+
     # Drop the database if it exists
-    cursor.execute(f"DROP DATABASE IF EXISTS {database_name}")
-    print(f"Dropped database {database_name} if it existed.")
+    cursor.execute(f"DROP DATABASE IF EXISTS {DATABASE_NAME}")
+    print(f"Dropped database {DATABASE_NAME} if it existed.")
 
     # Create a new database
-    cursor.execute(f"CREATE DATABASE {database_name}")
-    print(f"Created database {database_name}.")
+    cursor.execute(f"CREATE DATABASE {DATABASE_NAME}")
+    print(f"Created database {DATABASE_NAME}.")
 
     # Select the new database for further operations
-    conn.database = database_name
-    path = Path(__file__).parent.parent
-    utils_path = path / "utils_files"
-    schema = utils_path / "masterplan_base.sql"
+    conn.database = DATABASE_NAME
 
-    with open(str(schema), 'r', encoding='utf-8') as file:
-        sql_script = file.read()
+    for stmt in statements:
+        try:
+            cursor.execute(stmt)
+        except mysql.connector.Error as err:
+            print(f"Error executing statement: {stmt}")
+            print(f"MySQL Error: {err}")
+
+    # Shared by every run, each run logs in with it to drive the autoplanner of its own roster
+    create_admin_user(cursor)
 
-    statements = sql_script.split(';')
-    for statement in statements:
-        stmt = statement.strip()
-        if stmt:
-            try:
-                cursor.execute(stmt)
-            except mysql.connector.Error as err:
-                print(f"Error executing statement: {stmt}")
-                print(f"MySQL Error: {err}")
-
-    # Commit changes and close connections
+    cursor.execute(f"CREATE TABLE {TEMPLATE_TABLE} (checksum CHAR(64) NOT NULL)")
+    cursor.execute(f"INSERT INTO {TEMPLATE_TABLE} (checksum) VALUES (%s)", (checksum,))
     conn.commit()
 
+
+# initialize_database: Connects to the MasterPlan database, building the schema first if it is missing or
+# masterplan_base.sql changed. The database is shared by all the runs: each one works in its own roster
+# (orario_creation.bridge), created under schema_lock, and removes it when done, so several schedules can be
+# generated at once. The schema is only rebuilt when no roster is left (RuntimeError otherwise).
+# Output: (conn, cursor) owned by the caller, who closes conn
+def initialize_database():
+    from orario_creation.connections import mysql_connection
+
+    # Pooled connection, conn.close() gives it back to the pool
+    conn = mysql_connection()
+    cursor = conn.cursor()
+
+    checksum, statements = schema_script()
+    try:
+        # Workers starting together wait for the one building the schema
+        with schema_lock(cursor):
+            if _template_checksum(cursor) != checksum:
+                _build_schema(conn, cursor, checksum, statements)
+    except Exception:
+        conn.close()
+        raise
+
     return conn, cursor
 
 if __name__ == "__main__":
     initialize_database()
-
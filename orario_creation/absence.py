@@ -1,30 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from django.conf import settings
 
+from orario_creation.connections import PLANNER_TIMEOUT, planner_session
+
 masterplan_app = settings.MASTERPLAN_APP
 masterplan_port = settings.MASTERPLAN_PORT
 
-def insert_absence(session, free_day_data):
+
+def absence_ranges(dates):
+    # ["2025-08-05", "2025-08-06", "2025-08-12"] -> [("2025-08-05", "2025-08-06"), ("2025-08-12", "2025-08-12")]
+    days = sorted({datetime.strptime(date, "%Y-%m-%d").date() for date in dates})
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")) for start, end in ranges]
+
+
+def insert_absence(session, free_day_data, user_ids):
+    # user_ids: {employee_id: MasterPlan user id} of the run's roster (orario_creation.bridge.insert_roster_data)
     if not free_day_data['dates']:
         print(f"No free days for employee {free_day_data['employee_id']}")
         return
-    for date in free_day_data['dates']:
+    # One absence per run of consecutive free days
+    for start, end in absence_ranges(free_day_data['dates']):
         payload_data = {
             'action' : 'absence',
-            'user' : int(free_day_data['employee_id']) + 2,
+            'user' : user_ids[int(free_day_data['employee_id'])],
             'type' : 1,
-            'start' : date,
-            'end' : date,
+            'start' : start,
+            'end' : end,
             'comment' : ""
         }
 
         absence_request_url = f"http://{masterplan_app}:{masterplan_port}/masterplan/frontend/index.php?view=absenceLastMinute"
 
-        response = session.post(absence_request_url, data=payload_data)
+        response = session.post(absence_request_url, data=payload_data, timeout=PLANNER_TIMEOUT)
 
         if response.status_code != 200:
-            raise Exception(f"Failed to insert absence for employee {free_day_data['employee_id']} on date {date}")
+            raise Exception(f"Failed to insert absence for employee {free_day_data['employee_id']} from {start} to {end}")
+
+        print(f"Inserted absence for employee {free_day_data['employee_id']} from {start} to {end}")
 
-        print(f"Inserted absence for employee {free_day_data['employee_id']} on date {date}")
+    print(f"Finished inserting absences for employee {free_day_data['employee_id']}")
+
+
+def _insert_employee_absences(free_day_data, user_ids):
+    with planner_session() as session:
+        insert_absence(session, free_day_data, user_ids)
+
+
+# insert_absences: Bulk version of insert_absence for the free days of all the employees.
+# Employees are submitted in parallel (MASTERPLAN_ABSENCE_WORKERS), each on its own pooled keep-alive
+# session; the absences of one employee stay in order. Raises the first failed submission.
+def insert_absences(free_days, user_ids):
+    free_days = [free_day_data for free_day_data in free_days if free_day_data['dates']]
+    if not free_days:
+        return
 
-    print(f"Finished inserting absences for employee {free_day_data['employee_id']}")
\ No newline at end of file
+    with ThreadPoolExecutor(max_workers=min(settings.MASTERPLAN_ABSENCE_WORKERS, len(free_days))) as executor:
+        futures = [executor.submit(_insert_employee_absences, free_day_data, user_ids) for free_day_data in free_days]
+        for future in futures:
+            future.result()
@@ -1,10 +1,12 @@
-import requests
 from django.conf import settings
 
+from orario_creation.connections import PLANNER_TIMEOUT
+
 masterplan_app = settings.MASTERPLAN_APP
 masterplan_port = settings.MASTERPLAN_PORT
 
-def insert_admin(cursor, conn):
+def create_admin_user(cursor):
+    # The MasterPlan user the runs log in with, created with the schema (orario_creation.initialize_database)
     admin_data = {
         "superadmin": 1,
         "login": "masterplan",
@@ -66,18 +68,17 @@ def insert_admin(cursor, conn):
     # Execute the query
     cursor.execute(query, values)
 
-    # Commit the changes
-    conn.commit()
 
+def login_admin(session):
+    # Logs a planner session in (orario_creation.connections.planner_session)
     login_data = {
         "username": "masterplan",
         "password": "PASSWORD"
     }
-    session = requests.Session()
 
     login_request_url = f"http://{masterplan_app}:{masterplan_port}/masterplan/frontend/login.php"
 
-    session.post(login_request_url, data=login_data)
-
+    response = session.post(login_request_url, data=login_data, timeout=PLANNER_TIMEOUT)
+    response.raise_for_status()
 
     return session
@@ -0,0 +1,120 @@
+ROSTER_QUERY = """
+INSERT INTO Roster (title, autoplan_logic, ignore_working_hours, icsmail_sender_name, icsmail_sender_address)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+ROLE_QUERY = """
+INSERT INTO Role (title, max_hours_per_day, max_services_per_week, max_hours_per_week, max_hours_per_month)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+USER_QUERY = """
+INSERT INTO User (superadmin, login, firstname, lastname, fullname,
+                  birthday, start_date, password, ldap, locked,
+                  max_hours_per_day, max_services_per_week, max_hours_per_week,
+                  max_hours_per_month, color)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+USER_TO_ROSTER_QUERY = "INSERT INTO UserToRoster (user_id, roster_id) VALUES (%s, %s)"
+
+USER_TO_ROLE_QUERY = "INSERT INTO UserToRole (user_id, role_id) VALUES (%s, %s)"
+
+SERVICE_QUERY = """
+INSERT INTO Service (roster_id, shortname, title, location, employees, start, end, date_start, date_end, color, wd1, wd2, wd3, wd4, wd5, wd6, wd7)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _limits(employee_data):
+    return (
+        employee_data['max_hours_per_day'],
+        employee_data['max_services_per_week'],
+        employee_data['max_hours_per_week'],
+        employee_data['max_hours_per_month'],
+    )
+
+
+def _roster_key(roster_id, employee_id):
+    # Role title and user login, unique per roster since the database is shared by concurrent runs
+    return f"r{roster_id}_{employee_id}"
+
+
+def _generated_ids(cursor, table, column, keys):
+    # executemany may send one multi-row INSERT or one per row: read the ids back instead of trusting lastrowid
+    if not keys:
+        return {}
+    placeholders = ", ".join(["%s"] * len(keys))
+    cursor.execute(f"SELECT id, {column} FROM {table} WHERE {column} IN ({placeholders})", list(keys))
+    return {key: row_id for row_id, key in cursor.fetchall()}
+
+
+# insert_roster_data: Writes the MasterPlan data of a schedule run.
+# Inserts the roster, one role and one user (linked to the roster and the role) per employee and all the
+# services with executemany, in one transaction: nothing is committed if a statement fails.
+# The roster is the run's namespace in the shared database, drop it with drop_roster_data when done.
+# employees: schedule payload employees { employee_id: {"id", "max_hours_per_day", ...} }
+# services: [(name, min_employees, date_start, date_end, time_start, time_end), ...]
+# Output: dict { "roster_id": int, "role_ids": {employee_id: id}, "user_ids": {employee_id: id} }
+def insert_roster_data(conn, roster_title, employees, services):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(ROSTER_QUERY, (roster_title, 1, 0, "None", "None"))
+        roster_id = cursor.lastrowid
+
+        keys = {employee_data['id']: _roster_key(roster_id, employee_data['id']) for employee_data in employees.values()}
+        employee_ids = list(keys)
+
+        cursor.executemany(ROLE_QUERY, [
+            (keys[employee_data['id']], *_limits(employee_data)) for employee_data in employees.values()
+        ])
+        titles = _generated_ids(cursor, "Role", "title", list(keys.values()))
+        role_ids = {employee_id: titles[keys[employee_id]] for employee_id in employee_ids}
+
+        # firstname is the employee id, get_roster_data maps the planned services back with it
+        cursor.executemany(USER_QUERY, [
+            (0, keys[employee_data['id']], employee_data['id'], employee_data['id'],
+             f"{employee_data['id']} {employee_data['id']}", None, None, None, 0, 0,
+             *_limits(employee_data), '#FFFFFF')
+            for employee_data in employees.values()
+        ])
+        logins = _generated_ids(cursor, "User", "login", list(keys.values()))
+        user_ids = {employee_id: logins[keys[employee_id]] for employee_id in employee_ids}
+
+        cursor.executemany(USER_TO_ROSTER_QUERY, [(user_ids[employee_id], roster_id) for employee_id in employee_ids])
+        cursor.executemany(USER_TO_ROLE_QUERY, [(user_ids[employee_id], role_ids[employee_id]) for employee_id in employee_ids])
+
+        cursor.executemany(SERVICE_QUERY, [
+            (roster_id, name, name, "location", min_employees, time_start, time_end, date_start, date_end,
+             "FFFFFF", 1, 1, 1, 1, 1, 1, 1)
+            for name, min_employees, date_start, date_end, time_start, time_end in services
+        ])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    print(f"Inserted roster {roster_id} with {len(user_ids)} employees and {len(services)} services")
+    return {"roster_id": roster_id, "role_ids": role_ids, "user_ids": user_ids}
+
+
+# drop_roster_data: Deletes what insert_roster_data created for a run, once its plan has been read.
+# Services, planned services and user links go with the roster and the users (ON DELETE CASCADE).
+def drop_roster_data(conn, roster_data):
+    cursor = conn.cursor()
+    try:
+        for table, ids in (("Roster", [roster_data['roster_id']]),
+                           ("User", list(roster_data['user_ids'].values())),
+                           ("Role", list(roster_data['role_ids'].values()))):
+            if ids:
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,93 @@
+import queue
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MYSQL_CONFIG = {
+    "host": 'localhost',
+    "user": "masterplan",
+    "database": "masterplan",
+    "password": "PASSWORD",
+}
+
+# (connect, read) seconds of the MasterPlan HTTP requests, the autoplan of a month can take a while
+PLANNER_TIMEOUT = (settings.MASTERPLAN_CONNECT_TIMEOUT, settings.MASTERPLAN_READ_TIMEOUT)
+
+# Idle logged-in planner sessions of this worker, each keeps its connections to MasterPlan alive
+_sessions = queue.SimpleQueue()
+
+
+@lru_cache(maxsize=1)
+def _mysql_pool():
+    # One pool per worker process, created on first use (after the worker forked)
+    from mysql.connector import pooling
+
+    return pooling.MySQLConnectionPool(
+        pool_name="masterplan",
+        pool_size=settings.MASTERPLAN_DB_POOL_SIZE,
+        connection_timeout=settings.MASTERPLAN_CONNECT_TIMEOUT,
+        **MYSQL_CONFIG,
+    )
+
+
+# mysql_connection: Connection to the MasterPlan database from the worker's pool, conn.close() gives it back.
+# Waits for a free connection if the pool is exhausted and retries transient connection errors,
+# MASTERPLAN_DB_RETRIES times with an increasing delay.
+def mysql_connection():
+    from mysql.connector import errors
+
+    for attempt in range(settings.MASTERPLAN_DB_RETRIES + 1):
+        try:
+            return _mysql_pool().get_connection()
+        except (errors.PoolError, errors.InterfaceError, errors.OperationalError) as e:
+            if attempt == settings.MASTERPLAN_DB_RETRIES:
+                raise
+            print(f"MASTERPLAN Warning: MySQL connection failed ({e}), retrying")
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def planner_url(view=None):
+    url = f"http://{settings.MASTERPLAN_APP}:{settings.MASTERPLAN_PORT}/masterplan/frontend/index.php"
+    return f"{url}?view={view}" if view else url
+
+
+def _new_session():
+    # Connection errors are retried for every method (the request never reached MasterPlan),
+    # 502/503/504 answers only for GETs: a POST may have been applied already
+    retry = Retry(
+        total=settings.MASTERPLAN_HTTP_RETRIES,
+        read=0,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        backoff_factor=0.5,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# planner_session: Logged-in MasterPlan session, reused across the runs of the worker (keep-alive).
+# Sessions are handed to one caller at a time, concurrent callers get their own.
+@contextmanager
+def planner_session():
+    from orario_creation.admin import login_admin
+
+    try:
+        session = _sessions.get_nowait()
+    except queue.Empty:
+        session = _new_session()
+
+    # Logged in again on every checkout, the PHP session of an idle one may have expired
+    login_admin(session)
+    try:
+        yield session
+    finally:
+        _sessions.put(session)
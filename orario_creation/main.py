@@ -1,14 +1,12 @@
 from datetime import datetime, timedelta
 
-from orario_creation.absence import insert_absence
-from orario_creation.admin import insert_admin
-from orario_creation import initialize_database
-from orario_creation.employees import insert_employee
-from orario_creation.services import insert_shift
-from orario_creation.roles import insert_role
-from orario_creation.roster import create_roster, get_roster_data, start_planning
+from orario_creation.absence import insert_absences
+from orario_creation import initialize_database, schema_lock
+from orario_creation.bridge import drop_roster_data, insert_roster_data
+from orario_creation.connections import planner_session
+from orario_creation.roster import get_roster_data, start_planning
+from orario_creation.solver import solve_schedule
 from django.conf import settings
-import requests
 
 import logging
 masterplan_app = settings.MASTERPLAN_APP
@@ -16,62 +14,26 @@ masterplan_port = settings.MASTERPLAN_PORT
 
 logger = logging.getLogger('procrastinate')
 
-def fill_data_and_create_schedule(schedule_obj):
-
-    schedule_data = schedule_obj.create_payload()
-
-    logging.info("Creating schedule...")
-
-    logging.info("Initializing database...")
-    conn, cursor = initialize_database()
-    logging.info("Database initialized...")
-
-    logging.info('creating admin...')
-    session = insert_admin(cursor,conn)
-    logging.info('admin created...')
-
-    logging.info('creating roster...')
-    roster_id = create_roster(cursor, conn)
-    logging.info('roster created...')
-
-    logging.info('creating employees...')
-    for employee_id, employee_data in schedule_data['employees'].items():
-
-        role_mp_id = insert_role(
-            cursor,
-            conn,
-            employee_data['id'],
-            employee_data['max_hours_per_day'],
-            employee_data['max_services_per_week'],
-            employee_data['max_hours_per_week'],
-            employee_data['max_hours_per_month']
-        )
+def create_schedule_native(schedule_obj, schedule_data):
+    logging.info("Solving schedule in process...")
+    result = solve_schedule(schedule_data, schedule_obj.start_date, schedule_obj.end_date)
+    logging.info("Schedule created...")
+    return result
 
-        employee_mp_id = insert_employee(
-            cursor,
-            conn,
-            roster_id,
-            role_mp_id,
-            employee_data,
-            []
-        )
 
-    logging.info('employees created...')
+def create_schedule_masterplan(schedule_obj, schedule_data):
 
     # [{"2025-08-01": [2, "P"]}, {"2025-08-02": [1, "M"]}, {"2025-08-03": [1, "C"]}] example particular days
 
-    logging.info('inserting services...')
+    # (name, min_employees, date_start, date_end, time_start, time_end) rows, inserted in bulk with the roster
+    services = []
 
     # for days from start_date to end_date
     start_date = schedule_obj.start_date
     end_date = schedule_obj.end_date
 
-    try:
-        start_date_obj = datetime.strptime(schedule_obj.start_date, "%Y-%m-%d").date()
-        end_date_obj = datetime.strptime(schedule_obj.end_date, "%Y-%m-%d").date()
-    except ValueError as e:
-        logging.error(f"Invalid date format: {e}")
-        return
+    start_date_obj = schedule_obj.start_date
+    end_date_obj = schedule_obj.end_date
 
     if start_date_obj > end_date_obj:
         logging.warning(f"Start date {start_date_obj} is after end date {end_date_obj}. No shifts to process.")
@@ -104,11 +66,10 @@ def fill_data_and_create_schedule(schedule_obj):
             start_time = shift_details.get('start', '00:00')
             end_time = shift_details.get('end', '23:59')
 
-            insert_shift(cursor, conn, roster_id,
-                         shift_name, employees,
-                         period_start_date.strftime("%Y-%m-%d"),
-                         period_end_date.strftime("%Y-%m-%d"),
-                         start_time, end_time)
+            services.append((shift_name, employees,
+                             period_start_date.strftime("%Y-%m-%d"),
+                             period_end_date.strftime("%Y-%m-%d"),
+                             start_time, end_time))
 
     # --- Main processing logic ---
     current_segment_start_date = start_date_obj
@@ -146,10 +107,9 @@ def fill_data_and_create_schedule(schedule_obj):
                 logging.info(
                     f"  Augmenting shift '{shift_name}' with {pd_employees_to_add} employees. Total: {employees}")
 
-            insert_shift(cursor, conn, roster_id,
-                         shift_name, employees,
-                         pd_date_str, pd_date_str,  # Start and end on the same particular day
-                         start_time, end_time)
+            services.append((shift_name, employees,
+                             pd_date_str, pd_date_str,  # Start and end on the same particular day
+                             start_time, end_time))
 
         # Update the start for the next segment
         current_segment_start_date = pd_date_obj + timedelta(days=1)
@@ -162,22 +122,55 @@ def fill_data_and_create_schedule(schedule_obj):
             schedule_data.get('shifts_data', {})
         )
 
-    logging.info('services inserted...')
-    ### END INSERTING DATA IN DB
-
-    logging.info('starting planning...')
-    start_planning(session, roster_id, schedule_obj)
-    logging.info('planning finished...')
+    logging.info("Initializing database...")
+    conn, cursor = initialize_database()
+    logging.info("Database initialized...")
 
-    logging.info('setting absences for employees...')
-    for employee_free_days_data in schedule_data['free_days']:
-        insert_absence(session, employee_free_days_data)
-        print(f"Absence inserted for {employee_free_days_data['employee_id']} on {employee_free_days_data['dates']}")
+    try:
+        logging.info('inserting roster, employees and services...')
+        # Under the schema lock: the schema can't be rebuilt between its check and the roster that marks it in use
+        with schema_lock(cursor):
+            roster_data = insert_roster_data(conn, f"Roster {schedule_obj.id}", schedule_data['employees'], services)
+        roster_id = roster_data['roster_id']
+        logging.info('roster, employees and services inserted...')
+        ### END INSERTING DATA IN DB
+
+        try:
+            with planner_session() as session:
+                logging.info('starting planning...')
+                start_planning(session, roster_id, schedule_obj)
+                logging.info('planning finished...')
+
+            logging.info('setting absences for employees...')
+            insert_absences(schedule_data['free_days'], roster_data['user_ids'])
+
+            logging.info("Getting roster data...")
+            result = get_roster_data(cursor, conn, None, roster_id, schedule_obj)
+        finally:
+            # The database is shared with the other runs, only this run's roster is removed
+            drop_roster_data(conn, roster_data)
+    finally:
+        # Back to the pool
+        conn.close()
 
-    logging.info("Getting roster data...")
-    result = get_roster_data(cursor, conn,session, roster_id, schedule_obj)
     logging.info("Schedule created...")
     return result
 
 
+# Backends of settings.SCHEDULE_SOLVER, each takes (schedule_obj, schedule_obj.create_payload())
+SCHEDULE_SOLVERS = {
+    "native": create_schedule_native,
+    "masterplan": create_schedule_masterplan,
+}
+
+
+def fill_data_and_create_schedule(schedule_obj):
+
+    schedule_data = schedule_obj.create_payload()
+
+    solver_name = getattr(settings, "SCHEDULE_SOLVER", "masterplan")
+    if solver_name not in SCHEDULE_SOLVERS:
+        raise ValueError(f"Unknown schedule solver '{solver_name}'")
 
+    logging.info(f"Creating schedule with the {solver_name} solver...")
+    return SCHEDULE_SOLVERS[solver_name](schedule_obj, schedule_data)
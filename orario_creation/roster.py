@@ -1,61 +1,29 @@
 import logging
-from random import randint
 
 from django.conf import settings
 
+from orario_creation.connections import PLANNER_TIMEOUT
+
 masterplan_app = settings.MASTERPLAN_APP
 masterplan_port = settings.MASTERPLAN_PORT
 
 logger = logging.getLogger('procrastinate')
 
-def create_roster(cursor, conn):
-    # Query to create a new roster
-    r = randint(1, 100)
-    query = """
-    INSERT INTO Roster (title, autoplan_logic, ignore_working_hours, icsmail_sender_name, icsmail_sender_address)
-    VALUES (%s, %s, %s, %s, %s)
-    """
-
-    values = (
-        f"Roster {r}",
-        1,
-        0,
-        "None",
-        "None",
-    )
-
-    # Execute the query
-    cursor.execute(query, values)
-
-    # Commit the changes
-    conn.commit()
-
-    # Print the inserted row ID
-    print(f"Inserted roster with ID: {cursor.lastrowid}")
-
-    return cursor.lastrowid
-
 def get_roster_data(cursor, conn, session, roster_id, schedule):
 
-    # Execute query to retrieve services within date range
+    # Execute query to retrieve the planned services of this roster within date range,
+    # the database is shared with the rosters of the other runs
     query = """
-            SELECT *
+            SELECT PlannedService.day, Service.shortname, User.firstname
             FROM PlannedService
-            WHERE day BETWEEN %s AND %s;
+            JOIN Service ON Service.id = PlannedService.service_id
+            JOIN User ON User.id = PlannedService.user_id
+            WHERE Service.roster_id = %s AND PlannedService.day BETWEEN %s AND %s;
             """
     cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, (schedule.start_date, schedule.end_date))
+    cursor.execute(query, (roster_id, schedule.start_date, schedule.end_date))
     services = cursor.fetchall()
-
-    service_query = "SELECT id, shortname FROM Service;"
-    cursor.execute(service_query)
-    service_rows = cursor.fetchall()
-    shift_types = {item['id']: item['shortname'] for item in service_rows}
-
-    user_query = "SELECT * FROM User;"
-    cursor.execute(user_query)
-    users = cursor.fetchall()
-    users_crm = {item['id']: item['firstname'] for item in users}
+    cursor.close()
 
     services_data = {}
     for row in services:
@@ -66,10 +34,10 @@ def get_roster_data(cursor, conn, session, roster_id, schedule):
         if date_key not in services_data:
             services_data[date_key] = []
 
-        # Prepare the data entry for the current row
+        # Prepare the data entry for the current row, the user firstname is the employee id
         data = {
-            'service_name': shift_types[row['service_id']],
-            'employees': [users_crm[row['user_id']]]
+            'service_name': row['shortname'],
+            'employees': [row['firstname']]
         }
 
         # Append the data to the list for this date
@@ -88,7 +56,8 @@ def start_planning(session, roster_id, schedule):
         "timespan": "flex",
         "start": schedule.start_date,  # example start_date; use orarioschedulestart_date
         "end": schedule.end_date  # example end_date; use orarioscheduleend_date
-    })
+    }, timeout=PLANNER_TIMEOUT)
+    response.raise_for_status()
 
     # Define base URL and parameters for the next request
     base_url = f"http://{masterplan_app}:{masterplan_port}/masterplan/frontend/index.php"
@@ -110,12 +79,12 @@ def start_planning(session, roster_id, schedule):
     }
 
     # Use the same session to make the post request; cookies are automatically included
-    response = session.post(base_url, params=params, data=data)
+    response = session.post(base_url, params=params, data=data, timeout=PLANNER_TIMEOUT)
 
-    # Check response status or content
-    if response.status_code == 200:
-        print("Request successful")
-    else:
-        print("Request failed with status code:", response.status_code)
+    # A failed autoplan must fail the task, not leave an empty plan behind
+    if response.status_code != 200:
+        logger.error(f"Autoplan of roster {roster_id} failed with status code {response.status_code}")
+    response.raise_for_status()
+    logger.info(f"Autoplan of roster {roster_id} done")
 
 
@@ -0,0 +1,135 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('procrastinate')
+
+TIME_FORMAT = "%H:%M"
+
+
+def _limit(value):
+    # 0/None on the employee means no limit, like on MasterPlan
+    return value if value else None
+
+
+def _shift_interval(shift_details):
+    # (start, end) in minutes from midnight, end past 1440 for shifts crossing midnight
+    start = datetime.strptime(shift_details.get('start', '00:00'), TIME_FORMAT)
+    end = datetime.strptime(shift_details.get('end', '23:59'), TIME_FORMAT)
+    if end <= start:
+        end += timedelta(days=1)
+    start_minutes = start.hour * 60 + start.minute
+    return start_minutes, start_minutes + int((end - start).total_seconds() // 60)
+
+
+def _unavailable_days(free_days):
+    # free_days: [{"employee_id": 4, "dates": ["2025-08-03", ...] or None}, ...] -> {(employee_id, "YYYY-MM-DD")}
+    unavailable = set()
+    for employee_free_days in free_days or []:
+        for date_str in employee_free_days.get('dates') or []:
+            unavailable.add((int(employee_free_days['employee_id']), date_str))
+    return unavailable
+
+
+def _required_employees(shifts, particular_days, date_str):
+    # minEmployees per shift, plus the extra employees of a particular day on its target shift
+    extra_employees, target_shift = (particular_days or {}).get(date_str, [0, None])
+    return {
+        shift_name: int(shift_details.get('minEmployees', 0)) + (int(extra_employees or 0) if shift_name == target_shift else 0)
+        for shift_name, shift_details in shifts.items()
+    }
+
+
+class _Workload:
+    """Hours and services assigned to each employee so far, by day, ISO week and month."""
+
+    def __init__(self, employees):
+        self.employees = employees
+        self.day_hours = defaultdict(float)
+        self.day_intervals = defaultdict(list)
+        self.week_hours = defaultdict(float)
+        self.week_services = defaultdict(int)
+        self.month_hours = defaultdict(float)
+        self.total_hours = defaultdict(float)
+
+    @staticmethod
+    def _keys(employee_id, day):
+        week = day.isocalendar()[:2]
+        return (employee_id, day), (employee_id, week), (employee_id, day.year, day.month)
+
+    def can_work(self, employee_id, day, interval, hours):
+        employee_data = self.employees[employee_id]
+        day_key, week_key, month_key = self._keys(employee_id, day)
+
+        # One shift at a time
+        if any(interval[0] < other_end and other_start < interval[1] for other_start, other_end in self.day_intervals[day_key]):
+            return False
+
+        for used, limit in (
+            (self.day_hours[day_key], employee_data.get('max_hours_per_day')),
+            (self.week_hours[week_key], employee_data.get('max_hours_per_week')),
+            (self.month_hours[month_key], employee_data.get('max_hours_per_month')),
+        ):
+            if _limit(limit) is not None and used + hours > limit:
+                return False
+
+        max_services = _limit(employee_data.get('max_services_per_week'))
+        return max_services is None or self.week_services[week_key] < max_services
+
+    def assign(self, employee_id, day, interval, hours):
+        day_key, week_key, month_key = self._keys(employee_id, day)
+        self.day_intervals[day_key].append(interval)
+        self.day_hours[day_key] += hours
+        self.week_hours[week_key] += hours
+        self.week_services[week_key] += 1
+        self.month_hours[month_key] += hours
+        self.total_hours[employee_id] += hours
+
+    def priority(self, employee_id, day):
+        # Least loaded first, so the hours spread evenly over the period
+        _, week_key, _ = self._keys(employee_id, day)
+        return self.total_hours[employee_id], self.week_hours[week_key], employee_id
+
+
+# solve_schedule: In-process solver, the native alternative to the MasterPlan autoplanner.
+# Fills every shift of every day between start_date and end_date with its minEmployees (plus the particular
+# day extras) greedily, day by day, picking the least loaded employees that are not on a free day and still
+# within their max hours per day/week/month. Shifts that can't be covered are left short and logged.
+# Output: dict { "YYYY-MM-DD": [{"service_name": "M", "employees": [employee_id]}, ...] }, one entry per assignment
+def solve_schedule(schedule_data, start_date, end_date):
+    employees = {int(employee_id): employee_data for employee_id, employee_data in schedule_data['employees'].items()}
+    shifts = schedule_data.get('shifts_data', {})
+    particular_days = schedule_data.get('particular_days', {})
+    unavailable = _unavailable_days(schedule_data.get('free_days'))
+
+    shift_intervals = {shift_name: _shift_interval(shift_details) for shift_name, shift_details in shifts.items()}
+    shift_hours = {shift_name: (end - start) / 60 for shift_name, (start, end) in shift_intervals.items()}
+    # Earlier shifts are filled first on each day
+    shift_order = sorted(shifts, key=lambda shift_name: shift_intervals[shift_name])
+
+    workload = _Workload(employees)
+    services_data = {}
+
+    day = start_date
+    while day <= end_date:
+        date_str = day.strftime("%Y-%m-%d")
+        required = _required_employees(shifts, particular_days, date_str)
+        available = [employee_id for employee_id in employees if (employee_id, date_str) not in unavailable]
+
+        for shift_name in shift_order:
+            interval, hours = shift_intervals[shift_name], shift_hours[shift_name]
+            candidates = sorted(
+                (employee_id for employee_id in available if workload.can_work(employee_id, day, interval, hours)),
+                key=lambda employee_id: workload.priority(employee_id, day),
+            )
+            assigned = candidates[:required[shift_name]]
+            for employee_id in assigned:
+                workload.assign(employee_id, day, interval, hours)
+                services_data.setdefault(date_str, []).append({'service_name': shift_name, 'employees': [employee_id]})
+
+            if len(assigned) < required[shift_name]:
+                logger.warning(f"Shift '{shift_name}' on {date_str} covered by {len(assigned)} of {required[shift_name]} employees")
+
+        day += timedelta(days=1)
+
+    return services_data